@@ -1,5 +1,26 @@
 from django.apps import AppConfig
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.signals import user_logged_out
+from django.core.signals import request_started
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save
 
 
 class CoreConfig(AppConfig):
     name = 'core'
+
+    def ready(self):
+        from . import auth
+        from .db import check_connections, configure_sqlite
+        from .throttle import monitor_connection
+        connection_created.connect(configure_sqlite)
+        connection_created.connect(monitor_connection)
+        request_started.connect(check_connections)
+        user_model = get_user_model()
+        post_save.connect(auth.user_saved, sender=user_model)
+        post_delete.connect(auth.user_saved, sender=user_model)
+        user_logged_out.connect(auth.user_logged_out)
+        if settings.TEMPLATE_CACHE:
+            from .templates import warm_up
+            warm_up()
@@ -0,0 +1,64 @@
+"""Пользователь запроса из кэша.
+
+``CachedAuthenticationMiddleware`` заменяет стандартную и не читает
+пользователя из базы на каждом запросе: объект ``User`` лежит в кэше
+``USER_CACHE_TIMEOUT`` секунд. Подпись сессии (хэш пароля) проверяется
+и для пользователя из кэша, так что после смены пароля старые сессии
+разлогиниваются, как и без кэша. Запись удаляется при сохранении
+пользователя (в том числе при смене пароля) и при выходе.
+"""
+from django.conf import settings
+from django.contrib import auth
+from django.contrib.auth.middleware import AuthenticationMiddleware
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.utils.crypto import constant_time_compare
+from django.utils.functional import SimpleLazyObject
+
+USER_KEY = 'auth-user:{}'
+
+
+def user_key(user_id):
+    return USER_KEY.format(user_id)
+
+
+def invalidate(user_id):
+    cache.delete(user_key(user_id))
+
+
+def cached_user(request):
+    try:
+        user_id = auth._get_user_session_key(request)
+        backend_path = request.session[auth.BACKEND_SESSION_KEY]
+    except KeyError:
+        return AnonymousUser()
+    if backend_path not in settings.AUTHENTICATION_BACKENDS:
+        return AnonymousUser()
+    user = cache.get(user_key(user_id))
+    if user is None:
+        user = auth.get_user(request)
+        if user.is_authenticated:
+            cache.set(user_key(user_id), user, settings.USER_CACHE_TIMEOUT)
+        return user
+    session_hash = request.session.get(auth.HASH_SESSION_KEY)
+    if not (session_hash and constant_time_compare(
+            session_hash, user.get_session_auth_hash())):
+        request.session.flush()
+        return AnonymousUser()
+    return user
+
+
+class CachedAuthenticationMiddleware(AuthenticationMiddleware):
+    def process_request(self, request):
+        if not settings.USER_CACHE_TIMEOUT:
+            return super().process_request(request)
+        request.user = SimpleLazyObject(lambda: cached_user(request))
+
+
+def user_saved(sender, instance, **kwargs):
+    invalidate(instance.pk)
+
+
+def user_logged_out(sender, request, user, **kwargs):
+    if user is not None:
+        invalidate(user.pk)
@@ -0,0 +1,270 @@
+"""Двухуровневый кэш: LRU в памяти процесса перед общим бэкендом.
+
+Пример настройки::
+
+    CACHES = {
+        'default': {
+            'BACKEND': 'core.cache.TwoTierCache',
+            'OPTIONS': {'SHARED': 'shared', 'MAX_ENTRIES': 1000},
+        },
+        'shared': {
+            'BACKEND': 'django.core.cache.backends.memcached.MemcachedCache',
+            'LOCATION': '127.0.0.1:11211',
+        },
+    }
+
+Значения с конечным таймаутом лежат в общем кэше вместе с моментом
+истечения (``Entry``), и локальная копия в другом процессе живёт ровно
+столько же, сколько ключ в общем кэше.
+
+Ключи делятся на пространства по префиксу до первого ``:``, ``.`` или
+``|`` (``version:feed:index`` — ``version``). Запись увеличивает штамп
+только своего пространства. Каждый процесс сверяет штампы пространств,
+которые держит локально, одним get_many не чаще раза в CHECK_INTERVAL
+секунд и сбрасывает только те, что изменились, так что чужие записи
+видны с задержкой не больше CHECK_INTERVAL.
+
+incr атомарен для ключей без таймаута (счётчики версий); для ключей с
+таймаутом это чтение и запись.
+"""
+import pickle
+import re
+import threading
+import time
+from collections import OrderedDict
+
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+from .profiling import record_cache
+
+STAMP_KEY = 'two-tier:stamp:{}'
+
+_missing = object()
+
+
+class Entry:
+    """Значение в общем кэше вместе с моментом истечения."""
+
+    __slots__ = ('value', 'expires_at')
+
+    def __init__(self, value, expires_at):
+        self.value = value
+        self.expires_at = expires_at
+
+    def __getstate__(self):
+        return self.value, self.expires_at
+
+    def __setstate__(self, state):
+        self.value, self.expires_at = state
+
+
+def namespace(key):
+    return re.split(r'[:.|]', key, 1)[0]
+
+
+def stamp_key(name):
+    return STAMP_KEY.format(name)
+
+
+class TwoTierCache(BaseCache):
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self._shared_alias = options.get('SHARED', 'shared')
+        self._max_entries = int(options.get('MAX_ENTRIES', 1000))
+        self._check_interval = float(options.get('CHECK_INTERVAL', 1))
+        # Локальный ключ -> (pickle значения, момент истечения, пространство).
+        self._local = OrderedDict()
+        self._lock = threading.Lock()
+        # Пространство -> штамп, при котором заполнены его локальные ключи.
+        self._stamps = {}
+        self._checked_at = 0
+        self._stats = {
+            'local': {'hits': 0, 'misses': 0, 'evictions': 0},
+            'shared': {'hits': 0, 'misses': 0},
+        }
+
+    @property
+    def shared(self):
+        return caches[self._shared_alias]
+
+    def stats(self):
+        """Попадания, промахи и вытеснения по уровням."""
+        with self._lock:
+            return {tier: dict(values)
+                    for tier, values in self._stats.items()}
+
+    def _drop_namespace(self, name):
+        # Вызывается под self._lock.
+        for key in [key for key, entry in self._local.items()
+                    if entry[2] == name]:
+            del self._local[key]
+
+    def _sync_stamp(self, name, stamp):
+        """Сбрасывает локальные ключи пространства, если штамп сменился."""
+        with self._lock:
+            if name in self._stamps and self._stamps[name] != stamp:
+                self._drop_namespace(name)
+            self._stamps[name] = stamp
+
+    def _check_stamps(self):
+        now = time.monotonic()
+        if now - self._checked_at < self._check_interval:
+            return
+        self._checked_at = now
+        with self._lock:
+            names = {entry[2] for entry in self._local.values()}
+        if not names:
+            return
+        stamps = self.shared.get_many([stamp_key(name) for name in names])
+        for name in names:
+            self._sync_stamp(name, stamps.get(stamp_key(name)))
+
+    def _bump_stamp(self, name):
+        """Сдвигает штамп пространства.
+
+        Возвращает True, если между прошлой сверкой и этой записью штамп
+        никто не менял: только тогда своё значение можно держать локально.
+        """
+        key = stamp_key(name)
+        try:
+            stamp = self.shared.incr(key)
+        except ValueError:
+            self.shared.add(key, time.time_ns(), None)
+            stamp = self.shared.get(key)
+        with self._lock:
+            known = self._stamps.get(name)
+            own = known is not None and stamp == known + 1
+            if not own:
+                self._drop_namespace(name)
+            self._stamps[name] = stamp
+        return own
+
+    def _read_shared(self, key, version, name):
+        """Штамп пространства и значение; штамп читается раньше значения."""
+        if version is None:
+            found = self.shared.get_many([stamp_key(name), key])
+            return found.get(stamp_key(name)), found.get(key, _missing)
+        stamp = self.shared.get(stamp_key(name))
+        return stamp, self.shared.get(key, _missing, version=version)
+
+    def _local_get(self, key):
+        with self._lock:
+            entry = self._local.get(key)
+            if entry is not None:
+                pickled, expires_at, _ = entry
+                if expires_at is None or expires_at > time.time():
+                    self._local.move_to_end(key)
+                    self._stats['local']['hits'] += 1
+                    return pickle.loads(pickled)
+                del self._local[key]
+            self._stats['local']['misses'] += 1
+        return _missing
+
+    def _local_set(self, key, value, expires_at, name):
+        if expires_at is not None and expires_at <= time.time():
+            self._local_delete(key)
+            return
+        pickled = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        with self._lock:
+            self._local[key] = (pickled, expires_at, name)
+            self._local.move_to_end(key)
+            while len(self._local) > self._max_entries:
+                self._local.popitem(last=False)
+                self._stats['local']['evictions'] += 1
+
+    def _local_delete(self, key):
+        with self._lock:
+            self._local.pop(key, None)
+
+    def _wrap(self, value, timeout):
+        expires_at = self.get_backend_timeout(timeout)
+        if expires_at is None:
+            return value, None
+        return Entry(value, expires_at), expires_at
+
+    def get(self, key, default=None, version=None):
+        self._check_stamps()
+        local_key = self.make_key(key, version)
+        value = self._local_get(local_key)
+        if value is not _missing:
+            record_cache(hit=True)
+            return value
+        name = namespace(key)
+        stamp, value = self._read_shared(key, version, name)
+        expires_at = None
+        if isinstance(value, Entry):
+            value, expires_at = value.value, value.expires_at
+            if expires_at <= time.time():
+                value = _missing
+        if value is _missing:
+            self._stats['shared']['misses'] += 1
+            record_cache(hit=False)
+            return default
+        self._stats['shared']['hits'] += 1
+        record_cache(hit=True)
+        self._sync_stamp(name, stamp)
+        self._local_set(local_key, value, expires_at, name)
+        return value
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        stored, expires_at = self._wrap(value, timeout)
+        self.shared.set(key, stored, timeout, version=version)
+        name = namespace(key)
+        if self._bump_stamp(name):
+            self._local_set(
+                self.make_key(key, version), value, expires_at, name)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        stored, expires_at = self._wrap(value, timeout)
+        added = self.shared.add(key, stored, timeout, version=version)
+        if added:
+            name = namespace(key)
+            if self._bump_stamp(name):
+                self._local_set(
+                    self.make_key(key, version), value, expires_at, name)
+        return added
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        # Момент истечения хранится в самом значении, поэтому оно
+        # перезаписывается целиком.
+        value = self.shared.get(key, _missing, version=version)
+        if isinstance(value, Entry):
+            value = value.value
+        if value is _missing:
+            return False
+        self.set(key, value, timeout, version=version)
+        return True
+
+    def delete(self, key, version=None):
+        self.shared.delete(key, version=version)
+        self._local_delete(self.make_key(key, version))
+        self._bump_stamp(namespace(key))
+
+    def incr(self, key, delta=1, version=None):
+        try:
+            value = self.shared.incr(key, delta, version=version)
+        except (ValueError, TypeError):
+            value = self._incr_entry(key, delta, version)
+        self._local_delete(self.make_key(key, version))
+        self._bump_stamp(namespace(key))
+        return value
+
+    def _incr_entry(self, key, delta, version):
+        entry = self.shared.get(key, version=version)
+        if not isinstance(entry, Entry):
+            raise ValueError("Key '%s' not found" % key)
+        remaining = entry.expires_at - time.time()
+        if remaining <= 0:
+            raise ValueError("Key '%s' not found" % key)
+        entry.value += delta
+        self.shared.set(key, entry, remaining, version=version)
+        return entry.value
+
+    def clear(self):
+        self.shared.clear()
+        with self._lock:
+            self._local.clear()
+            self._stamps = {}
+        self._checked_at = 0
@@ -0,0 +1,83 @@
+"""Настройки соединений с базой данных.
+
+``database_from_env`` собирает ``DATABASES['default']`` из переменных
+окружения, ``replicas_from_env`` — реплики для чтения.
+``configure_sqlite`` включает WAL и прочие PRAGMA для каждого нового
+соединения с SQLite, ``check_connections`` перед запросом закрывает
+постоянные соединения, которые больше не отвечают.
+"""
+import os
+
+from django.conf import settings
+from django.db import connections
+
+ENGINES = {
+    'sqlite': 'django.db.backends.sqlite3',
+    'postgresql': 'django.db.backends.postgresql',
+    'mysql': 'django.db.backends.mysql',
+}
+
+
+def database_from_env(default_name):
+    """Настройки базы из переменных DB_*; по умолчанию — SQLite."""
+    engine = os.environ.get('DB_ENGINE', 'sqlite')
+    database = {
+        'ENGINE': ENGINES.get(engine, engine),
+        'NAME': os.environ.get('DB_NAME', default_name),
+        'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', 0)),
+    }
+    if engine == 'sqlite':
+        # Сколько секунд ждать снятия блокировки записи.
+        database['OPTIONS'] = {
+            'timeout': int(os.environ.get('DB_TIMEOUT', 20)),
+        }
+        return database
+    database.update({
+        'USER': os.environ.get('DB_USER', ''),
+        'PASSWORD': os.environ.get('DB_PASSWORD', ''),
+        'HOST': os.environ.get('DB_HOST', ''),
+        'PORT': os.environ.get('DB_PORT', ''),
+        # PgBouncer в режиме транзакций не поддерживает серверные курсоры.
+        'DISABLE_SERVER_SIDE_CURSORS': (
+            os.environ.get('DB_POOLER') == 'transaction'),
+    })
+    return database
+
+
+def replicas_from_env(primary):
+    """Реплики из DB_REPLICAS: хосты через запятую, для SQLite — файлы.
+
+    Реплика отличается от основной базы только хостом (или файлом).
+    В тестах реплики смотрят в тестовую основную базу.
+    """
+    replicas = {}
+    locations = filter(None, os.environ.get('DB_REPLICAS', '').split(','))
+    for number, location in enumerate(locations, start=1):
+        replica = dict(primary, TEST={'MIRROR': 'default'})
+        if primary['ENGINE'] == ENGINES['sqlite']:
+            replica['NAME'] = location.strip()
+        else:
+            replica['HOST'] = location.strip()
+        replicas[f'replica_{number}'] = replica
+    return replicas
+
+
+def configure_sqlite(sender, connection, **kwargs):
+    """Применяет SQLITE_PRAGMAS к новому соединению с SQLite.
+
+    PRAGMA выполняются напрямую через sqlite3, мимо обёрток Django,
+    чтобы не попадать в счётчики запросов.
+    """
+    if connection.vendor != 'sqlite':
+        return
+    for name, value in settings.SQLITE_PRAGMAS.items():
+        connection.connection.execute(f'PRAGMA {name} = {value}')
+
+
+def check_connections(**kwargs):
+    """Закрывает постоянные соединения, которые перестали отвечать."""
+    if not settings.DB_CONN_HEALTH_CHECKS:
+        return
+    for conn in connections.all():
+        if conn.connection is not None and not conn.is_usable():
+            conn.close()
@@ -0,0 +1,43 @@
+import statistics
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand
+from django.test import RequestFactory
+
+from core.templates import parse_cost, project_templates, render_cost
+
+
+class Command(BaseCommand):
+    help = ('Показывает время разбора и рендера каждого шаблона '
+            'из TEMPLATES_DIR, в миллисекундах.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=20,
+            help='Сколько раз замерять каждый шаблон (берётся медиана).',
+        )
+
+    def handle(self, *args, **options):
+        request = RequestFactory().get('/')
+        request.user = AnonymousUser()
+        repeat = max(options['repeat'], 1)
+        rows = []
+        for name in project_templates():
+            parse = statistics.median(
+                parse_cost(name) for _ in range(repeat))
+            try:
+                render = statistics.median(
+                    render_cost(name, request) for _ in range(repeat))
+            except Exception as error:
+                # Без контекста view часть шаблонов не рендерится.
+                render = None
+                self.stderr.write(f'{name}: {error.__class__.__name__}')
+            rows.append((name, parse * 1000,
+                         None if render is None else render * 1000))
+        rows.sort(key=lambda row: row[1] + (row[2] or 0), reverse=True)
+        self.stdout.write(f'{"шаблон":<40}{"разбор":>10}{"рендер":>10}')
+        for name, parse, render in rows:
+            render = '—' if render is None else f'{render:.3f}'
+            self.stdout.write(f'{name:<40}{parse:>10.3f}{render:>10}')
@@ -0,0 +1,69 @@
+from django.db import migrations, models
+
+
+class AddIndexConcurrently(migrations.AddIndex):
+    """AddIndex, не блокирующий запись в таблицу на PostgreSQL.
+
+    Миграция с этой операцией должна быть объявлена с atomic = False.
+    На остальных СУБД работает как обычный AddIndex.
+    """
+
+    def database_forwards(self, app_label, schema_editor, from_state,
+                          to_state):
+        if schema_editor.connection.vendor != 'postgresql':
+            return super().database_forwards(
+                app_label, schema_editor, from_state, to_state)
+        model = to_state.apps.get_model(app_label, self.model_name)
+        if self.allow_migrate_model(schema_editor.connection.alias, model):
+            sql = str(self.index.create_sql(model, schema_editor))
+            schema_editor.execute(sql.replace(
+                'CREATE INDEX', 'CREATE INDEX CONCURRENTLY IF NOT EXISTS', 1))
+
+    def describe(self):
+        return super().describe() + ' concurrently'
+
+
+class AddConstraintConcurrently(migrations.AddConstraint):
+    """AddConstraint, не блокирующий запись в таблицу на PostgreSQL.
+
+    Уникальный индекс строится CREATE UNIQUE INDEX CONCURRENTLY и затем
+    становится ограничением (UNIQUE USING INDEX). Проверка добавляется с
+    NOT VALID и проверяется отдельно, под блокировкой, не мешающей записи.
+    Миграция с этой операцией должна быть объявлена с atomic = False.
+    На остальных СУБД работает как обычный AddConstraint.
+    """
+
+    def database_forwards(self, app_label, schema_editor, from_state,
+                          to_state):
+        model = to_state.apps.get_model(app_label, self.model_name)
+        constraint = self.constraint
+        if (schema_editor.connection.vendor != 'postgresql'
+                or getattr(constraint, 'condition', None) is not None):
+            return super().database_forwards(
+                app_label, schema_editor, from_state, to_state)
+        if not self.allow_migrate_model(schema_editor.connection.alias,
+                                        model):
+            return
+        table = schema_editor.quote_name(model._meta.db_table)
+        name = schema_editor.quote_name(constraint.name)
+        if isinstance(constraint, models.UniqueConstraint):
+            columns = ', '.join(
+                schema_editor.quote_name(model._meta.get_field(field).column)
+                for field in constraint.fields)
+            # Индекс от прерванной попытки остаётся INVALID.
+            schema_editor.execute(
+                f'DROP INDEX CONCURRENTLY IF EXISTS {name}')
+            schema_editor.execute(
+                f'CREATE UNIQUE INDEX CONCURRENTLY {name} '
+                f'ON {table} ({columns})')
+            schema_editor.execute(
+                f'ALTER TABLE {table} ADD CONSTRAINT {name} '
+                f'UNIQUE USING INDEX {name}')
+        else:
+            sql = str(constraint.create_sql(model, schema_editor))
+            schema_editor.execute(f'{sql} NOT VALID')
+            schema_editor.execute(
+                f'ALTER TABLE {table} VALIDATE CONSTRAINT {name}')
+
+    def describe(self):
+        return super().describe() + ' concurrently'
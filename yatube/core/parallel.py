@@ -0,0 +1,57 @@
+"""Параллельное выполнение независимых запросов к базе.
+
+Django 2.2 не умеет ни ASGI, ни асинхронных view, поэтому запросы, которые
+не зависят друг от друга, view может отдать ``run_parallel``: первый
+выполняется в потоке запроса, остальные — в общем пуле потоков, у каждого
+из которых своё соединение с базой. Включается ``PARALLEL_QUERIES``;
+выигрыш есть только у серверной СУБД, SQLite всё равно выполняет запросы
+по одному.
+"""
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections
+
+from .query_budget import counting_queries, current_counter
+from .routers import replica_reads, replica_reads_enabled
+
+_executor = None
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.PARALLEL_QUERY_WORKERS,
+            thread_name_prefix='queries')
+    return _executor
+
+
+def _call(func, replica, counter):
+    # Соединения потоков пула живут по тем же правилам CONN_MAX_AGE,
+    # что и соединения потоков запросов.
+    close_old_connections()
+    try:
+        with counting_queries(counter):
+            if replica:
+                with replica_reads():
+                    return func()
+            return func()
+    finally:
+        close_old_connections()
+
+
+def run_parallel(*funcs):
+    """Вызывает функции без аргументов и возвращает их результаты.
+
+    Функции должны сами выполнять свои запросы (например, через list()),
+    а не возвращать ленивый queryset.
+    """
+    if not settings.PARALLEL_QUERIES or len(funcs) < 2:
+        return [func() for func in funcs]
+    replica = replica_reads_enabled()
+    counter = current_counter()
+    futures = [get_executor().submit(_call, func, replica, counter)
+               for func in funcs[1:]]
+    first = funcs[0]()
+    return [first] + [future.result() for future in futures]
@@ -0,0 +1,199 @@
+"""Выборочное профилирование запросов.
+
+``ProfilingMiddleware`` для доли запросов ``PROFILING_SAMPLE_RATE``
+собирает время ответа, время и число SQL-запросов, время рендера каждого
+шаблона, попадания и промахи кэша и время построения миниатюр. Профиль
+пишется в лог ``core.profiling`` одной JSON-строкой и добавляется в
+агрегат процесса, который отдаёт ``/metrics`` в текстовом формате
+Prometheus.
+"""
+import json
+import logging
+import random
+import threading
+import time
+from collections import defaultdict
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.template.base import Template
+
+logger = logging.getLogger(__name__)
+
+_local = threading.local()
+
+
+class Profile:
+    def __init__(self):
+        self.db_seconds = 0.0
+        self.db_queries = 0
+        self.templates = defaultdict(float)
+        self.cache = {'hit': 0, 'miss': 0}
+        self.thumbnail_seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_seconds += time.perf_counter() - started
+            self.db_queries += 1
+
+
+def current():
+    """Профиль текущего запроса или None, если запрос не попал в выборку."""
+    return getattr(_local, 'profile', None)
+
+
+def record_cache(hit):
+    profile = current()
+    if profile is not None:
+        profile.cache['hit' if hit else 'miss'] += 1
+
+
+@contextmanager
+def thumbnail_timer():
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        profile = current()
+        if profile is not None:
+            profile.thumbnail_seconds += time.perf_counter() - started
+
+
+def _instrument_templates():
+    """Оборачивает Template._render, чтобы засекать время шаблонов."""
+    original = Template._render
+    if getattr(original, 'profiled', False):
+        return
+
+    def _render(self, context):
+        profile = current()
+        if profile is None:
+            return original(self, context)
+        started = time.perf_counter()
+        try:
+            return original(self, context)
+        finally:
+            profile.templates[self.name or '<string>'] += (
+                time.perf_counter() - started)
+
+    _render.profiled = True
+    Template._render = _render
+
+
+class Metrics:
+    """Агрегат профилей процесса: суммы и счётчики по view."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.requests = defaultdict(int)
+        self.seconds = defaultdict(float)
+        self.db_seconds = defaultdict(float)
+        self.db_queries = defaultdict(int)
+        self.templates = defaultdict(float)
+        self.cache = defaultdict(int)
+        self.thumbnail_seconds = defaultdict(float)
+
+    def add(self, view, seconds, profile):
+        with self._lock:
+            self.requests[view] += 1
+            self.seconds[view] += seconds
+            self.db_seconds[view] += profile.db_seconds
+            self.db_queries[view] += profile.db_queries
+            self.thumbnail_seconds[view] += profile.thumbnail_seconds
+            for name, template_seconds in profile.templates.items():
+                self.templates[name] += template_seconds
+            for result, count in profile.cache.items():
+                self.cache[view, result] += count
+
+    def render(self):
+        """Метрики в текстовом формате Prometheus."""
+        lines = []
+
+        def family(name, kind, help_text, samples):
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {kind}')
+            for labels, value in sorted(samples):
+                label_text = ','.join(
+                    f'{key}="{_escape(label)}"' for key, label in labels)
+                lines.append(f'{name}{{{label_text}}} {value}')
+
+        with self._lock:
+            family('yatube_requests_total', 'counter',
+                   'Profiled requests.',
+                   [((('view', v),), n) for v, n in self.requests.items()])
+            family('yatube_request_seconds_total', 'counter',
+                   'Time spent in profiled requests.',
+                   [((('view', v),), s) for v, s in self.seconds.items()])
+            family('yatube_db_seconds_total', 'counter',
+                   'Time spent in SQL queries.',
+                   [((('view', v),), s) for v, s in self.db_seconds.items()])
+            family('yatube_db_queries_total', 'counter',
+                   'SQL queries executed.',
+                   [((('view', v),), n) for v, n in self.db_queries.items()])
+            family('yatube_template_seconds_total', 'counter',
+                   'Template render time including nested templates.',
+                   [((('template', t),), s)
+                    for t, s in self.templates.items()])
+            family('yatube_cache_requests_total', 'counter',
+                   'Cache lookups by result.',
+                   [((('view', v), ('result', r)), n)
+                    for (v, r), n in self.cache.items()])
+            family('yatube_thumbnail_seconds_total', 'counter',
+                   'Time spent building thumbnails inside requests.',
+                   [((('view', v),), s)
+                    for v, s in self.thumbnail_seconds.items()])
+        return '\n'.join(lines) + '\n'
+
+
+def _escape(value):
+    return (str(value).replace('\\', '\\\\').replace('"', '\\"')
+            .replace('\n', '\\n'))
+
+
+metrics = Metrics()
+
+
+class ProfilingMiddleware:
+    def __init__(self, get_response):
+        if not settings.PROFILING_SAMPLE_RATE:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        _instrument_templates()
+
+    def __call__(self, request):
+        if random.random() >= settings.PROFILING_SAMPLE_RATE:
+            return self.get_response(request)
+        profile = _local.profile = Profile()
+        started = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for conn in connections.all():
+                    stack.enter_context(conn.execute_wrapper(profile))
+                response = self.get_response(request)
+        finally:
+            _local.profile = None
+        seconds = time.perf_counter() - started
+        match = request.resolver_match
+        view = match.view_name if match else '<unresolved>'
+        metrics.add(view, seconds, profile)
+        logger.info(json.dumps({
+            'view': view,
+            'path': request.path,
+            'status': response.status_code,
+            'seconds': round(seconds, 6),
+            'db_seconds': round(profile.db_seconds, 6),
+            'db_queries': profile.db_queries,
+            'templates': {name: round(value, 6)
+                          for name, value in profile.templates.items()},
+            'cache': profile.cache,
+            'thumbnail_seconds': round(profile.thumbnail_seconds, 6),
+        }, ensure_ascii=False))
+        return response
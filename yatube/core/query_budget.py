@@ -0,0 +1,126 @@
+"""Бюджет SQL-запросов на view.
+
+View объявляет бюджет декоратором ``query_budget``. Только для таких view
+middleware считает запросы от process_view до конца ответа, включая
+шаблон, и пишет предупреждение в лог (или падает при
+``QUERY_BUDGET_STRICT = True``); остальные запросы не оборачиваются.
+``QueryBudgetTestMixin`` позволяет проверить бюджет в тестах.
+
+Запросы потоков ``core.parallel.run_parallel`` идут через их собственные
+соединения; пул подключает к ним счётчик запроса через
+``counting_queries(current_counter())``.
+
+Бюджет — число запросов на холодном пути: пустой кэш пользователя и
+сессии, ещё не созданные строки счётчиков.
+"""
+import logging
+import threading
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.db import connections
+from django.urls import resolve
+
+logger = logging.getLogger(__name__)
+
+_local = threading.local()
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+def query_budget(limit):
+    """Объявляет, сколько SQL-запросов может сделать view."""
+    def decorator(view_func):
+        view_func.query_budget = limit
+        return view_func
+    return decorator
+
+
+class QueryCounter:
+    """Считает запросы из всех потоков, к соединениям которых подключён."""
+
+    def __init__(self):
+        self.queries = []
+        self._lock = threading.Lock()
+
+    @property
+    def count(self):
+        return len(self.queries)
+
+    def __call__(self, execute, sql, params, many, context):
+        with self._lock:
+            self.queries.append(sql)
+        return execute(sql, params, many, context)
+
+
+def current_counter():
+    """Счётчик запроса, обрабатываемого в этом потоке, или None."""
+    return getattr(_local, 'counter', None)
+
+
+@contextmanager
+def counting_queries(counter):
+    """Подключает счётчик ко всем соединениям текущего потока."""
+    if counter is None:
+        yield
+        return
+    previous = current_counter()
+    _local.counter = counter
+    try:
+        with ExitStack() as stack:
+            for conn in connections.all():
+                stack.enter_context(conn.execute_wrapper(counter))
+            yield
+    finally:
+        _local.counter = previous
+
+
+class QueryBudgetMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.query_budget = None
+        with ExitStack() as stack:
+            request.query_counting = stack
+            response = self.get_response(request)
+        counter = getattr(request, 'query_counter', None)
+        if counter is not None and counter.count > request.query_budget:
+            message = (
+                f'{request.resolver_match.view_name}: '
+                f'{counter.count} SQL-запросов при бюджете '
+                f'{request.query_budget}'
+            )
+            if settings.QUERY_BUDGET_STRICT:
+                raise QueryBudgetExceeded(message)
+            logger.warning(message)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        budget = getattr(view_func, 'query_budget', None)
+        if budget is None:
+            return None
+        request.query_budget = budget
+        request.query_counter = QueryCounter()
+        # Счётчик снимается в __call__, когда ответ уже построен.
+        request.query_counting.enter_context(
+            counting_queries(request.query_counter))
+        return None
+
+
+class QueryBudgetTestMixin:
+    """Проверка бюджета запросов view для TestCase."""
+
+    def assertWithinQueryBudget(self, client, url):
+        budget = resolve(url).func.query_budget
+        counter = QueryCounter()
+        with counting_queries(counter):
+            response = client.get(url)
+        self.assertLessEqual(
+            counter.count, budget,
+            f'{url}: {counter.count} SQL-запросов при бюджете {budget}\n'
+            + '\n'.join(counter.queries)
+        )
+        return response
@@ -0,0 +1,83 @@
+"""Чтение с реплик для лент.
+
+View, помеченные ``read_replica``, читают с одной из баз
+``DATABASE_REPLICAS``, всё остальное идёт в основную базу. После любого
+изменяющего запроса ``ReplicaPinMiddleware`` на ``REPLICA_PIN_SECONDS``
+закрепляет пользователя за основной базой, чтобы он сразу видел свои
+посты и комментарии, пока реплика догоняет.
+"""
+import random
+import threading
+from contextlib import contextmanager
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+
+PRIMARY = 'default'
+PIN_KEY = 'replica-pin:{}'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+_local = threading.local()
+
+
+@contextmanager
+def replica_reads():
+    previous = getattr(_local, 'enabled', False)
+    _local.enabled = True
+    try:
+        yield
+    finally:
+        _local.enabled = previous
+
+
+def replica_reads_enabled():
+    return getattr(_local, 'enabled', False)
+
+
+def is_pinned(user):
+    return user.is_authenticated and bool(cache.get(PIN_KEY.format(user.pk)))
+
+
+def pin(user):
+    cache.set(PIN_KEY.format(user.pk), 1, settings.REPLICA_PIN_SECONDS)
+
+
+def read_replica(view_func):
+    """Разрешает view читать с реплики, если пользователь не закреплён."""
+    @wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        if not settings.DATABASE_REPLICAS or is_pinned(request.user):
+            return view_func(request, *args, **kwargs)
+        with replica_reads():
+            return view_func(request, *args, **kwargs)
+    return wrapper
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if replica_reads_enabled() and settings.DATABASE_REPLICAS:
+            return random.choice(settings.DATABASE_REPLICAS)
+        return PRIMARY
+
+    def db_for_write(self, model, **hints):
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == PRIMARY
+
+
+class ReplicaPinMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if (request.method not in SAFE_METHODS
+                and request.user.is_authenticated
+                and response.status_code < 400):
+            pin(request.user)
+        return response
@@ -0,0 +1,59 @@
+"""Предварительная компиляция шаблонов и замер их стоимости.
+
+При включённом ``TEMPLATE_CACHE`` кэширующий загрузчик держит
+скомпилированные шаблоны в памяти процесса, но заполняется только по
+первому запросу к каждой странице. ``warm_up`` из ``CoreConfig.ready``
+компилирует все шаблоны из ``TEMPLATES_DIR`` заранее, и первый запрос
+к свежему воркеру не платит за чтение и разбор файлов.
+"""
+import logging
+import os
+import time
+
+from django.conf import settings
+from django.template import Template, TemplateSyntaxError, engines
+
+logger = logging.getLogger(__name__)
+
+
+def project_templates():
+    """Имена всех шаблонов из TEMPLATES_DIR, например 'posts/index.html'."""
+    names = []
+    for root, _, files in os.walk(settings.TEMPLATES_DIR):
+        for filename in files:
+            path = os.path.relpath(os.path.join(root, filename),
+                                   settings.TEMPLATES_DIR)
+            names.append(path.replace(os.sep, '/'))
+    return sorted(names)
+
+
+def warm_up():
+    """Компилирует шаблоны в кэш загрузчика; возвращает их число."""
+    engine = engines['django']
+    compiled = 0
+    for name in project_templates():
+        try:
+            engine.get_template(name)
+        except TemplateSyntaxError:
+            logger.exception('Не удалось скомпилировать шаблон %s', name)
+            continue
+        compiled += 1
+    return compiled
+
+
+def parse_cost(name):
+    """Время чтения и разбора шаблона в секундах, в обход кэша."""
+    engine = engines['django'].engine
+    _, origin = engine.find_template(name)
+    started = time.perf_counter()
+    contents = origin.loader.get_contents(origin)
+    Template(contents, origin, name, engine)
+    return time.perf_counter() - started
+
+
+def render_cost(name, request=None, context=None):
+    """Время рендера уже скомпилированного шаблона в секундах."""
+    template = engines['django'].get_template(name)
+    started = time.perf_counter()
+    template.render(context or {}, request)
+    return time.perf_counter() - started
@@ -0,0 +1,15 @@
+from django.conf import settings
+from django.core.cache import caches
+from django.test.runner import DiscoverRunner
+
+
+class StrictQueryBudgetRunner(DiscoverRunner):
+    """Тесты с QUERY_BUDGET_STRICT = True: перерасход бюджета — ошибка."""
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        settings.QUERY_BUDGET_STRICT = True
+        # Общий кэш лежит в файлах и переживает прошлые запуски: версии
+        # и страницы оттуда не должны попасть в тесты на свежей базе.
+        for alias in settings.CACHES:
+            caches[alias].clear()
@@ -0,0 +1,50 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..auth import user_key
+
+User = get_user_model()
+
+
+class CachedUserTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username='HasNoName', password='old-password-42')
+        self.client = Client()
+        self.client.login(username='HasNoName', password='old-password-42')
+
+    def queries(self, url):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return [query['sql'] for query in context.captured_queries]
+
+    def test_user_and_session_served_from_cache(self):
+        url = reverse('about:author')
+        self.queries(url)
+        self.assertEqual(cache.get(user_key(self.user.pk)), self.user)
+        self.assertEqual(self.queries(url), [])
+
+    def test_password_change_logs_out_other_sessions(self):
+        other = Client()
+        other.login(username='HasNoName', password='old-password-42')
+        url = reverse('about:author')
+        other.get(url)
+        self.client.post(reverse('users:password_change_form'), {
+            'old_password': 'old-password-42',
+            'new_password1': 'new-password-42',
+            'new_password2': 'new-password-42',
+        })
+        self.assertTrue(
+            self.client.get(url).context['user'].is_authenticated)
+        self.assertFalse(other.get(url).context['user'].is_authenticated)
+
+    def test_logout_drops_cached_user(self):
+        self.client.get(reverse('about:author'))
+        self.client.get(reverse('users:logout'))
+        self.assertIsNone(cache.get(user_key(self.user.pk)))
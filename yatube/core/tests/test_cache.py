@@ -0,0 +1,135 @@
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.test import SimpleTestCase, override_settings
+
+from ..cache import Entry
+
+TEMP_CACHE_DIR = tempfile.mkdtemp()
+
+TWO_TIER_CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'shared': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': TEMP_CACHE_DIR,
+    },
+    'worker_1': {
+        'BACKEND': 'core.cache.TwoTierCache',
+        'OPTIONS': {'SHARED': 'shared', 'MAX_ENTRIES': 2,
+                    'CHECK_INTERVAL': 0},
+    },
+    'worker_2': {
+        'BACKEND': 'core.cache.TwoTierCache',
+        'OPTIONS': {'SHARED': 'shared', 'MAX_ENTRIES': 2,
+                    'CHECK_INTERVAL': 0},
+    },
+}
+
+
+@override_settings(CACHES=TWO_TIER_CACHES)
+class TwoTierCacheTest(SimpleTestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_CACHE_DIR, ignore_errors=True)
+
+    def setUp(self):
+        self.worker_1 = caches['worker_1']
+        self.worker_2 = caches['worker_2']
+        self.worker_1.clear()
+        self.worker_2.clear()
+        self.before = {'worker_1': self.worker_1.stats(),
+                       'worker_2': self.worker_2.stats()}
+
+    def stats(self, worker):
+        """Счётчики воркера за время теста."""
+        before = self.before[worker]
+        return {tier: {name: value - before[tier][name]
+                       for name, value in values.items()}
+                for tier, values in caches[worker].stats().items()}
+
+    def test_local_tier_serves_repeated_reads(self):
+        self.worker_1.set('key', 'value')
+        self.assertEqual(self.worker_1.get('key'), 'value')
+        self.assertEqual(self.worker_1.get('key'), 'value')
+        self.assertEqual(self.stats('worker_1')['local']['hits'], 1)
+
+    def test_shared_tier_fills_other_worker(self):
+        self.worker_1.set('key', 'value')
+        self.assertEqual(self.worker_2.get('key'), 'value')
+        self.assertEqual(self.worker_2.get('key'), 'value')
+        stats = self.stats('worker_2')
+        self.assertEqual(stats['shared']['hits'], 1)
+        self.assertEqual(stats['local']['hits'], 1)
+
+    def test_write_invalidates_other_worker_local_tier(self):
+        self.worker_1.set('key', 'old')
+        self.assertEqual(self.worker_2.get('key'), 'old')
+        self.worker_1.set('key', 'new')
+        self.assertEqual(self.worker_2.get('key'), 'new')
+        self.worker_1.delete('key')
+        self.assertIsNone(self.worker_2.get('key'))
+
+    def test_incr_and_lru_eviction(self):
+        self.worker_1.set('counter', 1)
+        self.assertEqual(self.worker_1.incr('counter'), 2)
+        self.assertEqual(self.worker_1.get('counter'), 2)
+        self.assertEqual(self.worker_2.get('counter'), 2)
+        for key in ('a', 'b', 'c'):
+            self.worker_1.set(key, key)
+        for key in ('a', 'b', 'c'):
+            self.worker_2.get(key)
+        self.assertEqual(self.stats('worker_2')['local']['evictions'], 2)
+        self.assertEqual(self.worker_2.get('a'), 'a')
+
+    def test_value_without_timeout_stored_as_is(self):
+        # Такие ключи увеличивает incr самого общего бэкенда.
+        self.worker_1.set('version:feed', 1, None)
+        self.assertEqual(self.worker_1.incr('version:feed'), 2)
+        self.assertEqual(self.worker_1.shared.get('version:feed'), 2)
+        self.worker_1.set('short', 1, 10)
+        self.assertIsInstance(self.worker_1.shared.get('short'), Entry)
+        self.assertEqual(self.worker_1.incr('short'), 2)
+        self.assertEqual(self.worker_2.get('short'), 2)
+
+    def test_local_copy_keeps_remaining_ttl(self):
+        self.worker_1.set('short', 'value', 10)
+        self.assertEqual(self.worker_2.get('short'), 'value')
+        later = time.time() + 11
+        with mock.patch('time.time', return_value=later):
+            self.assertIsNone(self.worker_2.get('short'))
+        self.assertEqual(self.stats('worker_2')['local']['hits'], 0)
+
+    def test_write_flushes_only_its_namespace(self):
+        self.worker_1.set('feed:index', 'old')
+        self.worker_1.set('user:1', 'user')
+        self.assertEqual(self.worker_2.get('feed:index'), 'old')
+        self.assertEqual(self.worker_2.get('user:1'), 'user')
+        self.worker_1.set('feed:index', 'new')
+        self.assertEqual(self.worker_2.get('user:1'), 'user')
+        self.assertEqual(self.stats('worker_2')['local']['hits'], 1)
+        self.assertEqual(self.worker_2.get('feed:index'), 'new')
+
+
+class SharedTierSettingsTest(SimpleTestCase):
+    def test_shared_tier_visible_to_other_process(self):
+        cache.set('version:feed:test', 1, None)
+        cache.incr('version:feed:test')
+        code = ('import django; django.setup(); '
+                'from django.core.cache import caches; '
+                "print(caches['shared'].get('version:feed:test'))")
+        other_process = subprocess.run(
+            [sys.executable, '-c', code], cwd=settings.BASE_DIR,
+            env={**os.environ, 'DJANGO_SETTINGS_MODULE': 'yatube.settings'},
+            capture_output=True, text=True, check=True)
+        cache.delete('version:feed:test')
+        self.assertEqual(other_process.stdout.strip(), '2')
@@ -0,0 +1,40 @@
+import os
+from unittest import mock
+
+from django.db import connection
+from django.test import SimpleTestCase, TestCase
+
+from ..db import database_from_env
+
+
+class DatabaseFromEnvTest(SimpleTestCase):
+    def test_sqlite_by_default(self):
+        with mock.patch.dict(os.environ, {}, clear=True):
+            database = database_from_env('db.sqlite3')
+        self.assertEqual(database['ENGINE'], 'django.db.backends.sqlite3')
+        self.assertEqual(database['NAME'], 'db.sqlite3')
+        self.assertEqual(database['CONN_MAX_AGE'], 0)
+
+    def test_postgresql_behind_pooler(self):
+        environ = {
+            'DB_ENGINE': 'postgresql', 'DB_NAME': 'yatube',
+            'DB_HOST': 'pgbouncer', 'DB_PORT': '6432',
+            'DB_CONN_MAX_AGE': '60', 'DB_POOLER': 'transaction',
+        }
+        with mock.patch.dict(os.environ, environ, clear=True):
+            database = database_from_env('db.sqlite3')
+        self.assertEqual(database['ENGINE'], 'django.db.backends.postgresql')
+        self.assertEqual(database['HOST'], 'pgbouncer')
+        self.assertEqual(database['CONN_MAX_AGE'], 60)
+        self.assertTrue(database['DISABLE_SERVER_SIDE_CURSORS'])
+
+
+class SqlitePragmasTest(TestCase):
+    def pragma(self, name):
+        with connection.cursor() as cursor:
+            cursor.execute(f'PRAGMA {name}')
+            return cursor.fetchone()[0]
+
+    def test_pragmas_applied(self):
+        self.assertEqual(self.pragma('synchronous'), 1)
+        self.assertEqual(self.pragma('busy_timeout'), 20000)
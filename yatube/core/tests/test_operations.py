@@ -0,0 +1,50 @@
+from unittest import mock
+
+from django.db.migrations.loader import MigrationLoader
+from django.test import SimpleTestCase
+
+from ..operations import AddConstraintConcurrently
+
+
+class AddConstraintConcurrentlyTest(SimpleTestCase):
+    def setUp(self):
+        loader = MigrationLoader(None, ignore_no_migrations=True)
+        self.migration = loader.get_migration(
+            'posts', '0009_follow_constraints')
+        self.from_state = loader.project_state(('posts', '0008_indexes'))
+        self.statements = []
+        self.editor = mock.Mock()
+        self.editor.connection.vendor = 'postgresql'
+        self.editor.connection.alias = 'default'
+        self.editor.quote_name = lambda name: f'"{name}"'
+        self.editor.execute = self.statements.append
+
+    def apply(self, operation):
+        to_state = self.from_state.clone()
+        operation.state_forwards('posts', to_state)
+        operation.database_forwards(
+            'posts', self.editor, self.from_state, to_state)
+
+    def test_unique_index_built_concurrently(self):
+        self.assertFalse(self.migration.atomic)
+        operation = self.migration.operations[1]
+        self.assertIsInstance(operation, AddConstraintConcurrently)
+        self.apply(operation)
+        self.assertEqual(self.statements, [
+            'DROP INDEX CONCURRENTLY IF EXISTS "unique_follow"',
+            'CREATE UNIQUE INDEX CONCURRENTLY "unique_follow" '
+            'ON "posts_follow" ("user_id", "author_id")',
+            'ALTER TABLE "posts_follow" ADD CONSTRAINT "unique_follow" '
+            'UNIQUE USING INDEX "unique_follow"',
+        ])
+
+    def test_check_added_not_valid_then_validated(self):
+        operation = self.migration.operations[2]
+        sql = 'ALTER TABLE "posts_follow" ADD CONSTRAINT "no_self_follow" ...'
+        with mock.patch.object(type(operation.constraint), 'create_sql',
+                               return_value=sql):
+            self.apply(operation)
+        self.assertEqual(self.statements, [
+            f'{sql} NOT VALID',
+            'ALTER TABLE "posts_follow" VALIDATE CONSTRAINT "no_self_follow"',
+        ])
@@ -0,0 +1,69 @@
+import threading
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TransactionTestCase, override_settings
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Post
+
+from ..parallel import run_parallel
+from ..query_budget import QueryCounter, counting_queries
+from ..routers import replica_reads, replica_reads_enabled
+
+User = get_user_model()
+
+
+# Потоки пула работают через свои соединения и видят только
+# закоммиченные данные, поэтому здесь TransactionTestCase.
+@override_settings(PARALLEL_QUERIES=True)
+class ParallelQueriesTest(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='HasNoName')
+        self.author = User.objects.create_user(username='Author')
+        self.post = Post.objects.create(author=self.author, text='Пост')
+        Comment.objects.create(post=self.post, author=self.user,
+                               text='Комментарий')
+        Follow.objects.create(user=self.user, author=self.author)
+
+    def test_results_in_order_from_pool(self):
+        results = run_parallel(
+            lambda: threading.current_thread().name,
+            lambda: threading.current_thread().name,
+            lambda: Post.objects.get().text,
+        )
+        self.assertEqual(results[0], threading.current_thread().name)
+        self.assertTrue(results[1].startswith('queries'))
+        self.assertEqual(results[2], 'Пост')
+
+    def test_pool_queries_counted_in_request_budget(self):
+        counter = QueryCounter()
+        with counting_queries(counter):
+            run_parallel(
+                lambda: Post.objects.count(),
+                lambda: Comment.objects.count(),
+                lambda: Follow.objects.count(),
+            )
+        self.assertEqual(counter.count, 3)
+
+    def test_replica_flag_passed_to_pool(self):
+        with replica_reads():
+            results = run_parallel(lambda: None, replica_reads_enabled)
+        self.assertTrue(results[1])
+
+    def test_views(self):
+        client = Client()
+        client.force_login(self.user)
+        response = client.get(
+            reverse('posts:profile', kwargs={'username': 'Author'}))
+        self.assertTrue(response.context['following'])
+        self.assertEqual(response.context['posts_count'], 1)
+        self.assertEqual(len(response.context['page_obj']), 1)
+        response = client.get(
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk}))
+        self.assertEqual(response.context['post'], self.post)
+        self.assertEqual(response.context['comments'][0].text, 'Комментарий')
+        response = client.get(
+            reverse('posts:post_detail', kwargs={'post_id': 0}))
+        self.assertEqual(response.status_code, 404)
@@ -0,0 +1,52 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from ..profiling import metrics
+
+User = get_user_model()
+
+
+@override_settings(PROFILING_SAMPLE_RATE=1)
+class ProfilingTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.admin = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='pass')
+        cls.user = User.objects.create_user(username='HasNoName')
+
+    def setUp(self):
+        cache.clear()
+        metrics.reset()
+        self.admin_client = Client()
+        self.admin_client.force_login(self.admin)
+
+    def test_request_is_profiled(self):
+        with self.assertLogs('core.profiling', 'INFO') as logs:
+            Client().get(reverse('posts:index'))
+        self.assertIn('"view": "yatube:index"', logs.output[0])
+        self.assertEqual(metrics.requests['yatube:index'], 1)
+        self.assertGreater(metrics.db_queries['yatube:index'], 0)
+        self.assertIn('posts/index.html', metrics.templates)
+        self.assertGreater(metrics.cache['yatube:index', 'miss'], 0)
+
+    def test_metrics_format(self):
+        Client().get(reverse('posts:index'))
+        response = self.admin_client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, 200)
+        content = response.content.decode()
+        self.assertIn('# TYPE yatube_requests_total counter', content)
+        self.assertIn('yatube_requests_total{view="yatube:index"} 1', content)
+
+    def test_metrics_admin_only(self):
+        client = Client()
+        client.force_login(self.user)
+        response = client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, 302)
+
+    @override_settings(PROFILING_SAMPLE_RATE=0)
+    def test_disabled_by_default(self):
+        Client().get(reverse('posts:index'))
+        self.assertEqual(metrics.requests, {})
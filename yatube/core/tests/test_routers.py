@@ -0,0 +1,75 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from posts.models import Post
+
+from ..routers import PRIMARY, ReplicaRouter, is_pinned, replica_reads
+
+User = get_user_model()
+
+
+@override_settings(DATABASE_REPLICAS=['replica_1'])
+class ReplicaRouterTest(TestCase):
+    def setUp(self):
+        self.router = ReplicaRouter()
+
+    def test_reads_go_to_primary_by_default(self):
+        self.assertEqual(self.router.db_for_read(Post), PRIMARY)
+
+    def test_replica_reads(self):
+        with replica_reads():
+            self.assertEqual(self.router.db_for_read(Post), 'replica_1')
+            self.assertEqual(self.router.db_for_write(Post), PRIMARY)
+        self.assertEqual(self.router.db_for_read(Post), PRIMARY)
+
+    def test_migrations_only_on_primary(self):
+        self.assertTrue(self.router.allow_migrate(PRIMARY, 'posts'))
+        self.assertFalse(self.router.allow_migrate('replica_1', 'posts'))
+
+
+# В тестах реплика — та же база, важно лишь, куда решил пойти роутер.
+@override_settings(DATABASE_REPLICAS=['replica_1'])
+@mock.patch('core.routers.random.choice', return_value=PRIMARY)
+class ReadYourWritesTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='HasNoName')
+        cls.post = Post.objects.create(author=cls.user, text='Тестовый пост')
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def test_feed_reads_from_replica(self, choice):
+        self.client.get(reverse('posts:index'))
+        self.assertTrue(choice.called)
+
+    def test_write_views_use_primary(self, choice):
+        self.client.get(reverse('posts:post_create'))
+        self.assertFalse(choice.called)
+
+    def test_user_pinned_after_write(self, choice):
+        self.client.post(
+            reverse('posts:add_comment', kwargs={'post_id': self.post.pk}),
+            {'text': 'Комментарий'})
+        self.assertTrue(is_pinned(self.user))
+        self.client.get(reverse('posts:index'))
+        self.assertFalse(choice.called)
+
+    def test_follow_pins_user(self, choice):
+        author = User.objects.create_user(username='Author')
+        for name in ('profile_follow', 'profile_unfollow'):
+            with self.subTest(view=name):
+                cache.clear()
+                self.client.get(
+                    reverse(f'posts:{name}',
+                            kwargs={'username': author.username}),
+                    follow=True)
+                self.assertTrue(is_pinned(self.user))
+                self.assertFalse(choice.called)
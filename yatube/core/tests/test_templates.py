@@ -0,0 +1,41 @@
+from io import StringIO
+
+from django.conf import settings
+from django.core.management import call_command
+from django.template import engines
+from django.test import SimpleTestCase, override_settings
+
+from ..templates import project_templates, warm_up
+
+CACHED_TEMPLATES = [{
+    **settings.TEMPLATES[0],
+    'OPTIONS': {
+        **settings.TEMPLATES[0]['OPTIONS'],
+        'loaders': [('django.template.loaders.cached.Loader', [
+            'django.template.loaders.filesystem.Loader',
+            'django.template.loaders.app_directories.Loader',
+        ])],
+    },
+}]
+
+
+class TemplateWarmUpTest(SimpleTestCase):
+    def test_project_templates(self):
+        names = project_templates()
+        self.assertIn('base.html', names)
+        self.assertIn('includes/header.html', names)
+        self.assertIn('posts/index.html', names)
+
+    @override_settings(TEMPLATES=CACHED_TEMPLATES)
+    def test_warm_up_fills_loader_cache(self):
+        loader = engines['django'].engine.template_loaders[0]
+        self.assertEqual(warm_up(), len(project_templates()))
+        cached = {template.origin.template_name
+                  for template in loader.get_template_cache.values()}
+        self.assertTrue(set(project_templates()) <= cached)
+
+    def test_template_cost_command(self):
+        out = StringIO()
+        call_command('template_cost', '--repeat=1', stdout=out,
+                     stderr=StringIO())
+        self.assertIn('includes/header.html', out.getvalue())
@@ -0,0 +1,127 @@
+import math
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from posts.models import Comment, Post
+
+from ..throttle import LatencyMonitor, parse_rate, too_many_requests
+
+User = get_user_model()
+
+
+class ParseRateTest(SimpleTestCase):
+    def test_parse_rate(self):
+        self.assertEqual(parse_rate('5/m'), (5, 60))
+        self.assertEqual(parse_rate('100/hour'), (100, 3600))
+
+
+@override_settings(THROTTLE_RATES={'add_comment': '2/m'})
+class ThrottleTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='HasNoName')
+        cls.post = Post.objects.create(author=cls.user, text='Пост')
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+        self.url = reverse('posts:add_comment',
+                           kwargs={'post_id': self.post.pk})
+
+    def comment(self, client=None, text='Комментарий'):
+        client = client or self.authorized_client
+        return client.post(self.url, {'text': text})
+
+    def test_burst_is_limited(self):
+        self.assertEqual(self.comment().status_code, 302)
+        self.assertEqual(self.comment().status_code, 302)
+        response = self.comment()
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '30')
+        self.assertEqual(Comment.objects.count(), 2)
+
+    def test_bucket_refills(self):
+        with mock.patch('core.throttle.time.time', return_value=1000.0):
+            self.comment()
+            self.comment()
+            self.assertEqual(self.comment().status_code, 429)
+        with mock.patch('core.throttle.time.time', return_value=1030.0):
+            self.assertEqual(self.comment().status_code, 302)
+
+    def test_ip_bucket_shared_between_users(self):
+        other = User.objects.create_user(username='Other')
+        other_client = Client()
+        other_client.force_login(other)
+        self.comment()
+        self.comment()
+        self.assertEqual(self.comment(other_client).status_code, 429)
+        self.assertEqual(
+            self.comment(Client(REMOTE_ADDR='10.0.0.2')).status_code, 302)
+
+    def test_rejected_request_spends_no_tokens(self):
+        other = User.objects.create_user(username='Other')
+        self.comment()
+        self.comment()
+        other_client = Client()
+        other_client.force_login(other)
+        self.assertEqual(self.comment(other_client).status_code, 429)
+        other_client = Client(REMOTE_ADDR='10.0.0.2')
+        other_client.force_login(other)
+        self.assertEqual(self.comment(other_client).status_code, 302)
+        self.assertEqual(self.comment(other_client).status_code, 302)
+
+    def test_reads_not_throttled(self):
+        self.comment()
+        self.comment()
+        response = self.client.get(
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk}))
+        self.assertEqual(response.status_code, 200)
+
+
+class AdmissionControlTest(TestCase):
+    @mock.patch('core.throttle.time.monotonic', return_value=100.0)
+    def test_monitor_average(self, monotonic):
+        monitor = LatencyMonitor(weight=0.5)
+        monitor.observe(0.2)
+        monitor.observe(0.2)
+        self.assertAlmostEqual(monitor.average, 0.15)
+        with override_settings(ADMISSION_DB_LATENCY_MS=100):
+            self.assertTrue(monitor.overloaded())
+        with override_settings(ADMISSION_DB_LATENCY_MS=0):
+            self.assertFalse(monitor.overloaded())
+
+    @override_settings(ADMISSION_DB_LATENCY_MS=100)
+    def test_monitor_average_decays_without_queries(self):
+        with mock.patch('core.throttle.time.monotonic', return_value=100.0):
+            monitor = LatencyMonitor(weight=1, window=10)
+            monitor.observe(0.5)
+            self.assertTrue(monitor.overloaded())
+        with mock.patch('core.throttle.time.monotonic', return_value=110.0):
+            self.assertAlmostEqual(monitor.average, 0.5 / math.e)
+            monitor.observe(0.0)
+        with mock.patch('core.throttle.time.monotonic', return_value=130.0):
+            self.assertFalse(monitor.overloaded())
+
+    @override_settings(ADMISSION_DB_LATENCY_MS=100)
+    def test_writes_shed_while_reads_served(self):
+        user = User.objects.create_user(username='HasNoName')
+        client = Client()
+        client.force_login(user)
+        with mock.patch.object(LatencyMonitor, 'average',
+                               new_callable=mock.PropertyMock,
+                               return_value=0.5):
+            response = client.post(reverse('posts:post_create'),
+                                   {'text': 'Пост'})
+            self.assertEqual(response.status_code, 503)
+            self.assertEqual(response['Retry-After'], '5')
+            self.assertNotEqual(response.content,
+                                too_many_requests(5).content)
+            self.assertEqual(
+                client.get(reverse('posts:index')).status_code, 200)
+        self.assertFalse(Post.objects.exists())
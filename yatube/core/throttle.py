@@ -0,0 +1,149 @@
+"""Ограничение частоты записей и отказ в записи при перегрузке базы.
+
+``throttle(scope)`` ставит на изменяющие запросы view корзину токенов
+с лимитом из ``THROTTLE_RATES[scope]``, например ``'5/m'``: пять
+запросов подряд, дальше по одному раз в 12 секунд. Отдельные корзины
+ведутся для пользователя и для IP, их состояние хранится в кэше. Токен
+берётся сразу из всех корзин запроса, только если он есть в каждой;
+иначе view отвечает 429 с заголовком Retry-After.
+
+Если задан ``ADMISSION_DB_LATENCY_MS``, каждое соединение с базой
+замеряет время запросов, и пока скользящее среднее выше порога, те же
+view отвечают 503: база успевает обслуживать чтение ленты. Без новых
+запросов среднее затухает, так что отказ не застревает.
+"""
+import math
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+
+BUCKET_KEY = 'throttle:{}:{}'
+PERIODS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+def parse_rate(rate):
+    """'5/m' -> (5, 60): ёмкость корзины и период её наполнения."""
+    count, period = rate.split('/')
+    return int(count), PERIODS[period[0]]
+
+
+def take_tokens(keys, capacity, period):
+    """Берёт по токену из каждой корзины keys, только если есть во всех.
+
+    Возвращает 0 или сколько секунд ждать, пока токен появится во всех
+    корзинах. Чтение и запись состояния не атомарны, так что при гонке
+    несколько параллельных запросов могут пройти сверх лимита.
+    """
+    now = time.time()
+    states = cache.get_many(keys)
+    tokens = {}
+    for key in keys:
+        left, updated = states.get(key, (capacity, now))
+        tokens[key] = min(capacity, left + (now - updated) * capacity / period)
+    wait = max((1 - left) * period / capacity for left in tokens.values())
+    if wait > 0:
+        return wait
+    cache.set_many(
+        {key: (left - 1, now) for key, left in tokens.items()}, period)
+    return 0
+
+
+def client_ip(request):
+    return request.META.get('REMOTE_ADDR', '')
+
+
+def identities(request):
+    if request.user.is_authenticated:
+        yield f'user:{request.user.pk}'
+    yield f'ip:{client_ip(request)}'
+
+
+class LatencyMonitor:
+    """Скользящее среднее времени SQL-запросов процесса, в секундах.
+
+    Каждый запрос сдвигает среднее с весом weight, а без запросов оно
+    затухает к нулю с постоянной времени window секунд: иначе после
+    всплеска, пока записи отклоняются, среднее так и оставалось бы выше
+    порога.
+    """
+
+    def __init__(self, weight=0.1, window=10):
+        self.weight = weight
+        self.window = window
+        self._average = 0.0
+        self._updated = time.monotonic()
+
+    def _decayed(self, now):
+        elapsed = max(0.0, now - self._updated)
+        return self._average * math.exp(-elapsed / self.window)
+
+    @property
+    def average(self):
+        return self._decayed(time.monotonic())
+
+    def observe(self, seconds):
+        now = time.monotonic()
+        average = self._decayed(now)
+        self._average = average + self.weight * (seconds - average)
+        self._updated = now
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.observe(time.perf_counter() - started)
+
+    def overloaded(self):
+        threshold = settings.ADMISSION_DB_LATENCY_MS
+        return bool(threshold) and self.average * 1000 > threshold
+
+
+monitor = LatencyMonitor()
+
+
+def monitor_connection(sender, connection, **kwargs):
+    if settings.ADMISSION_DB_LATENCY_MS:
+        connection.execute_wrappers.append(monitor)
+
+
+def retry_later(message, retry_after, status):
+    response = HttpResponse(message, status=status)
+    response['Retry-After'] = max(1, math.ceil(retry_after))
+    return response
+
+
+def too_many_requests(retry_after):
+    return retry_later('Слишком много запросов, попробуйте позже.',
+                       retry_after, status=429)
+
+
+def service_overloaded(retry_after):
+    return retry_later('Сервер перегружен, повторите запрос позже.',
+                       retry_after, status=503)
+
+
+def throttle(scope):
+    """Лимит THROTTLE_RATES[scope] на изменяющие запросы view."""
+    def decorator(view_func):
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            if request.method in SAFE_METHODS:
+                return view_func(request, *args, **kwargs)
+            if monitor.overloaded():
+                return service_overloaded(settings.ADMISSION_RETRY_AFTER)
+            rate = settings.THROTTLE_RATES.get(scope)
+            if rate:
+                capacity, period = parse_rate(rate)
+                keys = [BUCKET_KEY.format(scope, identity)
+                        for identity in identities(request)]
+                wait = take_tokens(keys, capacity, period)
+                if wait:
+                    return too_many_requests(wait)
+            return view_func(request, *args, **kwargs)
+        return wrapper
+    return decorator
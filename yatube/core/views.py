@@ -1,7 +1,11 @@
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import HttpResponse
 from django.shortcuts import render
 
 from http import HTTPStatus
 
+from .profiling import metrics as profiling_metrics
+
 
 def page_not_found(request, exception):
     return render(request, 'core/404.html', {'path': request.path},
@@ -15,3 +19,9 @@ def forbidden(request, reason=''):
 def internal_server_eror(request, ):
     return render(request, 'core/500.html',
                   status=HTTPStatus.INTERNAL_SERVER_ERROR)
+
+
+@staff_member_required
+def metrics(request):
+    return HttpResponse(profiling_metrics.render(),
+                        content_type='text/plain; version=0.0.4')
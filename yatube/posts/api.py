@@ -0,0 +1,254 @@
+"""JSON API v1: посты, группы, профили, комментарии и лента подписок.
+
+Списки листаются курсором (?after=/?before=), набор полей задаётся
+?fields=id,text. Строки читаются через values(), экземпляры моделей не
+создаются. ETag строится из версии ленты в кэше, Last-Modified — из
+самой свежей даты ленты, поэтому повторный запрос без изменений
+отвечает 304, не обращаясь к базе.
+"""
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Max
+from django.http import JsonResponse
+from django.views.decorators.http import condition, require_safe
+
+from core.routers import read_replica
+
+from . import cache_versions, counters
+from .models import Comment, Group, Post, User
+from .paginators import CursorPaginator
+from .timeline import timeline_posts
+
+API_PAGE_SIZE = 20
+LAST_MODIFIED_KEY = 'api:last-modified:{}:{}'
+
+POST_FIELDS = {
+    'id': 'id',
+    'text': 'text',
+    'pub_date': 'pub_date',
+    'author': 'author__username',
+    'group': 'group__slug',
+    'image': 'image',
+    'thumbnail': 'thumbnail',
+}
+COMMENT_FIELDS = {
+    'id': 'id',
+    'post': 'post_id',
+    'author': 'author__username',
+    'text': 'text',
+    'created': 'created',
+}
+GROUP_FIELDS = {
+    'id': 'id',
+    'title': 'title',
+    'slug': 'slug',
+    'description': 'description',
+}
+
+
+class Source:
+    """Данные ресурса: queryset, имя версии в cache_versions и сама версия."""
+
+    def __init__(self, queryset, version_name, date_field=None,
+                 version=None):
+        self.queryset = queryset
+        self.version_name = version_name
+        self.date_field = date_field
+        self.version = version or cache_versions.get_version(version_name)
+
+    def last_modified(self):
+        """Самая свежая дата ленты; считается один раз на версию."""
+        if self.date_field is None:
+            return None
+        key = LAST_MODIFIED_KEY.format(self.version_name, self.version)
+        newest = cache.get(key)
+        if newest is None:
+            newest = self.queryset.aggregate(
+                newest=Max(self.date_field))['newest']
+            if newest is not None:
+                cache.set(key, newest)
+        return newest
+
+
+def posts_source(request):
+    return Source(Post.objects.all(), cache_versions.INDEX, 'pub_date')
+
+
+def post_source(request, post_id):
+    return Source(Post.objects.filter(pk=post_id),
+                  cache_versions.post_key(post_id), 'pub_date')
+
+
+def comments_source(request, post_id):
+    return Source(Comment.objects.filter(post_id=post_id),
+                  cache_versions.comments_key(post_id), 'created')
+
+
+def groups_source(request):
+    return Source(Group.objects.all(), cache_versions.GROUPS)
+
+
+def group_posts_source(request, slug):
+    group_id = Group.objects.filter(slug=slug).values_list(
+        'pk', flat=True).first()
+    if group_id is None:
+        return None
+    return Source(Post.objects.filter(group_id=group_id),
+                  cache_versions.group_key(group_id), 'pub_date')
+
+
+def profile_source(request, username):
+    author_id = User.objects.filter(username=username).values_list(
+        'pk', flat=True).first()
+    if author_id is None:
+        return None
+    return Source(Post.objects.filter(author_id=author_id),
+                  cache_versions.profile_key(author_id), 'pub_date')
+
+
+def follow_source(request):
+    if not request.user.is_authenticated:
+        return None
+    return Source(
+        timeline_posts(request.user),
+        cache_versions.follow_key(request.user.pk), 'pub_date',
+        version=cache_versions.follow_feed_version(request.user.pk))
+
+
+def conditional(source_func):
+    """ETag и Last-Modified по версии ресурса, 304 для неизменившихся.
+
+    Источник вычисляется один раз и сохраняется в request.api_source.
+    """
+    def get_source(request, **kwargs):
+        if not hasattr(request, 'api_source'):
+            request.api_source = source_func(request, **kwargs)
+        return request.api_source
+
+    def etag(request, **kwargs):
+        source = get_source(request, **kwargs)
+        if source is None:
+            return None
+        raw = f'{source.version}|{request.get_full_path()}'
+        return hashlib.md5(raw.encode()).hexdigest()
+
+    def last_modified(request, **kwargs):
+        source = get_source(request, **kwargs)
+        if source is None:
+            return None
+        return source.last_modified()
+
+    def decorator(view_func):
+        return require_safe(read_replica(condition(
+            etag_func=etag, last_modified_func=last_modified)(view_func)))
+    return decorator
+
+
+def error(message, status):
+    return JsonResponse({'detail': message}, status=status)
+
+
+def select_fields(request, schema):
+    """Поля из ?fields=; None, если запрошено неизвестное поле."""
+    requested = request.GET.get('fields')
+    if not requested:
+        return schema
+    names = [name.strip() for name in requested.split(',') if name.strip()]
+    if not names or not set(names) <= set(schema):
+        return None
+    return {name: schema[name] for name in names}
+
+
+def to_json(row, fields):
+    data = {name: row[lookup] for name, lookup in fields.items()}
+    if data.get('image'):
+        data['image'] = settings.MEDIA_URL + data['image']
+    return data
+
+
+def rows(request, queryset, schema, field):
+    """Страница queryset по курсору в виде JSON-ответа."""
+    fields = select_fields(request, schema)
+    if fields is None:
+        return error('Неизвестное поле в fields', 400)
+    lookups = set(fields.values()) | {'id', field}
+    page = CursorPaginator(
+        queryset.values(*lookups), API_PAGE_SIZE, field=field
+    ).get_page(after=request.GET.get('after'),
+               before=request.GET.get('before'))
+    return JsonResponse({
+        'results': [to_json(row, fields) for row in page],
+        'next': page.next_cursor,
+        'previous': page.previous_cursor,
+    })
+
+
+def one(request, queryset, schema):
+    fields = select_fields(request, schema)
+    if fields is None:
+        return error('Неизвестное поле в fields', 400)
+    row = queryset.values(*set(fields.values())).first()
+    if row is None:
+        return error('Не найдено', 404)
+    return JsonResponse(to_json(row, fields))
+
+
+@conditional(posts_source)
+def posts(request):
+    return rows(request, request.api_source.queryset, POST_FIELDS,
+                'pub_date')
+
+
+@conditional(post_source)
+def post(request, post_id):
+    return one(request, request.api_source.queryset, POST_FIELDS)
+
+
+@conditional(comments_source)
+def comments(request, post_id):
+    if not Post.objects.filter(pk=post_id).exists():
+        return error('Не найдено', 404)
+    return rows(request, request.api_source.queryset, COMMENT_FIELDS,
+                'created')
+
+
+@conditional(groups_source)
+def groups(request):
+    return rows(request, request.api_source.queryset, GROUP_FIELDS, 'id')
+
+
+@conditional(group_posts_source)
+def group_posts(request, slug):
+    if request.api_source is None:
+        return error('Не найдено', 404)
+    return rows(request, request.api_source.queryset, POST_FIELDS,
+                'pub_date')
+
+
+@conditional(profile_source)
+def profile(request, username):
+    if request.api_source is None:
+        return error('Не найдено', 404)
+    author = User.objects.filter(username=username).values(
+        'id', 'username', 'first_name', 'last_name').get()
+    author['posts_count'] = counters.get_count(
+        counters.author_key(author['id']), request.api_source.queryset)
+    return JsonResponse(author)
+
+
+@conditional(profile_source)
+def profile_posts(request, username):
+    if request.api_source is None:
+        return error('Не найдено', 404)
+    return rows(request, request.api_source.queryset, POST_FIELDS,
+                'pub_date')
+
+
+@conditional(follow_source)
+def follow(request):
+    if request.api_source is None:
+        return error('Нужна авторизация', 401)
+    return rows(request, request.api_source.queryset, POST_FIELDS,
+                'pub_date')
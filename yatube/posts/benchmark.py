@@ -0,0 +1,285 @@
+"""Нагрузочный стенд для view приложения posts.
+
+``seed`` наполняет базу реалистичными данными: перекошенный граф подписок,
+популярные авторы, длинные ветки комментариев. ``run`` гоняет view через
+тестовый клиент Django, в одном или нескольких потоках, и считает
+пропускную способность, перцентили времени ответа, число SQL-запросов и
+пиковую память на запрос. Запускать только на отдельной базе:
+стенд пишет в неё посты и комментарии, поэтому seed_benchmark без
+флага --allow-write отказывается работать.
+"""
+import datetime
+import itertools
+import json
+import math
+import random
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from faker import Faker
+
+from . import comment_queue, timeline
+from .bulk import batched, explicit_dates
+from .models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+USERNAME_PREFIX = 'bench_'
+SCENARIOS = (
+    'index', 'group_list', 'profile', 'post_detail', 'follow_index',
+    'post_create', 'add_comment',
+)
+
+
+def zipf_weights(size, skew=1.1):
+    """Накопленные веса распределения Ципфа для random.choices."""
+    return list(itertools.accumulate(
+        1 / (rank ** skew) for rank in range(1, size + 1)))
+
+
+def skewed_choices(population, count, cum_weights=None):
+    """Выборка с распределением Ципфа: первые элементы самые популярные.
+
+    При многократной выборке из одной совокупности веса лучше посчитать
+    один раз через zipf_weights и передать в cum_weights.
+    """
+    if cum_weights is None:
+        cum_weights = zipf_weights(len(population))
+    return random.choices(population, cum_weights=cum_weights, k=count)
+
+
+def seed_follows(user_ids, follows_per_user):
+    """Подписки с перекосом: на популярных авторов подписаны почти все."""
+    pairs = set()
+    cum_weights = zipf_weights(len(user_ids))
+    for user_id in user_ids:
+        count = random.randint(0, follows_per_user * 2)
+        for author_id in skewed_choices(user_ids, count, cum_weights):
+            if author_id != user_id:
+                pairs.add((user_id, author_id))
+    for batch in batched(pairs):
+        Follow.objects.bulk_create(
+            (Follow(user_id=user_id, author_id=author_id)
+             for user_id, author_id in batch),
+            ignore_conflicts=True)
+    return len(pairs)
+
+
+def seed(users=1000, posts=10000, groups=20, follows_per_user=20,
+         comments=20000, stdout=None):
+    """Создаёт набор данных для стенда и пересчитывает производные таблицы."""
+    fake = Faker('ru_RU')
+    log = stdout.write if stdout else (lambda message: None)
+    now = timezone.now()
+
+    def random_date():
+        return now - datetime.timedelta(seconds=random.randint(0, 31536000))
+
+    offset = User.objects.filter(username__startswith=USERNAME_PREFIX).count()
+    for batch in batched(range(offset, offset + users)):
+        User.objects.bulk_create(
+            User(username=f'{USERNAME_PREFIX}{i}',
+                 first_name=fake.first_name(), last_name=fake.last_name())
+            for i in batch)
+    user_ids = list(User.objects.filter(
+        username__startswith=USERNAME_PREFIX).values_list('pk', flat=True))
+    log(f'Пользователей: {len(user_ids)}')
+
+    for i in range(groups):
+        Group.objects.get_or_create(
+            slug=f'bench-{i}',
+            defaults={'title': fake.sentence(nb_words=3)[:200],
+                      'description': fake.text(200)})
+    group_ids = list(Group.objects.filter(
+        slug__startswith='bench-').values_list('pk', flat=True))
+
+    log(f'Подписок: {seed_follows(user_ids, follows_per_user)}')
+
+    with explicit_dates():
+        authors = skewed_choices(user_ids, posts)
+        for batch in batched(authors):
+            Post.objects.bulk_create(
+                Post(author_id=author_id,
+                     group_id=random.choice(group_ids + [None]),
+                     text=fake.text(random.randint(50, 1000)),
+                     pub_date=random_date())
+                for author_id in batch)
+        log(f'Постов: {posts}')
+        post_ids = list(Post.objects.order_by('-pk').values_list(
+            'pk', flat=True)[:posts])
+        for batch in batched(skewed_choices(post_ids, comments)):
+            Comment.objects.bulk_create(
+                Comment(post_id=post_id,
+                        author_id=random.choice(user_ids),
+                        text=fake.sentence(nb_words=12),
+                        created=random_date())
+                for post_id in batch)
+        log(f'Комментариев: {comments}')
+
+    # Счётчики первыми: rebuild_counters выставляет флаги тяжёлых авторов,
+    # которые timeline.rebuild не раскладывает по лентам.
+    call_command('rebuild_counters', stdout=stdout)
+    call_command('rebuild_search_index', stdout=stdout)
+    for user_id in user_ids:
+        timeline.rebuild(user_id)
+
+
+def percentile(values, fraction):
+    """Перцентиль методом ближайшего ранга."""
+    ordered = sorted(values)
+    index = max(0, math.ceil(fraction * len(ordered)) - 1)
+    return ordered[index]
+
+
+class Runner:
+    def __init__(self, requests=100, measure_memory=False, cold_cache=False,
+                 concurrency=1):
+        self.requests = requests
+        # tracemalloc считает память всего процесса, при нескольких
+        # потоках пик одного запроса не выделить.
+        self.measure_memory = measure_memory and concurrency == 1
+        self.cold_cache = cold_cache
+        self.concurrency = concurrency
+        self.user_ids = list(User.objects.filter(
+            username__startswith=USERNAME_PREFIX).values_list(
+                'pk', flat=True))
+        self.usernames = dict(User.objects.filter(
+            pk__in=self.user_ids).values_list('pk', 'username'))
+        self.group_slugs = list(Group.objects.values_list('slug', flat=True))
+        self.post_ids = list(
+            Post.objects.values_list('pk', flat=True)[:10000])
+        self.clients = {}
+
+    def client_for(self, user_id):
+        # Client хранит cookies и не рассчитан на общий доступ из потоков.
+        key = (threading.get_ident(), user_id)
+        if key not in self.clients:
+            client = Client()
+            client.force_login(User.objects.get(pk=user_id))
+            self.clients[key] = client
+        return self.clients[key]
+
+    def request(self, scenario):
+        """Случайный запрос сценария: (клиент, метод, url, данные)."""
+        client = self.client_for(random.choice(self.user_ids))
+        page = {'page': random.randint(1, 5)}
+        if scenario == 'index':
+            return client.get, reverse('posts:index'), page
+        if scenario == 'group_list':
+            slug = random.choice(self.group_slugs)
+            return (client.get,
+                    reverse('posts:group_list', kwargs={'slug': slug}), page)
+        if scenario == 'profile':
+            username = self.usernames[skewed_choices(self.user_ids, 1)[0]]
+            return (client.get, reverse(
+                'posts:profile', kwargs={'username': username}), page)
+        if scenario == 'post_detail':
+            post_id = skewed_choices(self.post_ids, 1)[0]
+            return (client.get, reverse(
+                'posts:post_detail', kwargs={'post_id': post_id}), {})
+        if scenario == 'follow_index':
+            return client.get, reverse('posts:follow_index'), page
+        if scenario == 'post_create':
+            return (client.post, reverse('posts:post_create'),
+                    {'text': 'Пост со стенда'})
+        if scenario == 'add_comment':
+            post_id = skewed_choices(self.post_ids, 1)[0]
+            return (client.post, reverse(
+                'posts:add_comment', kwargs={'post_id': post_id}),
+                {'text': 'Комментарий со стенда'})
+        raise ValueError(f'Неизвестный сценарий {scenario}')
+
+    def measure_one(self, scenario):
+        """Один запрос: (время в мс, число SQL-запросов, пик памяти в КБ)."""
+        method, url, data = self.request(scenario)
+        if self.cold_cache:
+            cache.clear()
+        if self.measure_memory:
+            tracemalloc.start()
+        with CaptureQueriesContext(connection) as captured:
+            started = time.perf_counter()
+            response = method(url, data)
+            elapsed = (time.perf_counter() - started) * 1000
+        memory = None
+        if self.measure_memory:
+            memory = tracemalloc.get_traced_memory()[1] / 1024
+            tracemalloc.stop()
+        if response.status_code >= 400:
+            raise RuntimeError(f'{url}: HTTP {response.status_code}')
+        return elapsed, len(captured), memory
+
+    def measure(self, scenario):
+        started = time.perf_counter()
+        if self.concurrency == 1:
+            samples = [self.measure_one(scenario)
+                       for _ in range(self.requests)]
+        else:
+            with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+                samples = list(pool.map(
+                    lambda _: self.measure_one(scenario),
+                    range(self.requests)))
+        if scenario == 'add_comment':
+            # При отложенной записи считаем до записи последнего в базу.
+            comment_queue.wait()
+        wall = time.perf_counter() - started
+        timings, queries, memory = zip(*samples)
+        result = {
+            'requests': self.requests,
+            'concurrency': self.concurrency,
+            'throughput_rps': self.requests / wall,
+            'p50_ms': percentile(timings, 0.50),
+            'p95_ms': percentile(timings, 0.95),
+            'p99_ms': percentile(timings, 0.99),
+            'queries_mean': sum(queries) / len(queries),
+            'queries_max': max(queries),
+        }
+        if self.measure_memory:
+            result['memory_peak_kb_mean'] = sum(memory) / len(memory)
+        return result
+
+    def run(self, scenarios=SCENARIOS):
+        return {
+            'started_at': timezone.now().isoformat(),
+            'dataset': {
+                'users': User.objects.count(),
+                'posts': Post.objects.count(),
+                'follows': Follow.objects.count(),
+                'comments': Comment.objects.count(),
+            },
+            'scenarios': {
+                scenario: self.measure(scenario) for scenario in scenarios
+            },
+        }
+
+
+def compare(results, baseline, threshold=0.1):
+    """Сценарии, где p95 вырос больше чем на threshold относительно базы."""
+    regressions = {}
+    for scenario, current in results['scenarios'].items():
+        base = baseline.get('scenarios', {}).get(scenario)
+        if not base or not base['p95_ms']:
+            continue
+        change = current['p95_ms'] / base['p95_ms'] - 1
+        if change > threshold:
+            regressions[scenario] = change
+    return regressions
+
+
+def save(results, path):
+    with open(path, 'w', encoding='utf-8') as output:
+        json.dump(results, output, ensure_ascii=False, indent=2)
+
+
+def load(path):
+    with open(path, encoding='utf-8') as source:
+        return json.load(source)
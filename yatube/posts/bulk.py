@@ -0,0 +1,254 @@
+"""Потоковые выгрузка и загрузка групп, постов, комментариев и подписок.
+
+Выгрузка читает таблицу через iterator(chunk_size=...) и пишет строки
+в NDJSON или CSV, поэтому память не растёт с размером таблицы. Загрузка
+читает файл пачками, каждую пачку вставляет bulk_create в отдельной
+транзакции и после коммита записывает номер обработанной строки в файл
+контрольной точки: прерванную загрузку можно продолжить с того же места.
+Пользователи и группы связываются по username и slug, авторы, которых
+нет в базе, создаются без пароля.
+"""
+import csv
+import itertools
+import json
+import os
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from django.contrib.auth import get_user_model
+from django.core.files.storage import default_storage
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.utils.dateparse import parse_datetime
+
+from .models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+BATCH_SIZE = 5000
+FORMATS = ('ndjson', 'csv')
+
+# Поле выгрузки -> путь в values_list.
+EXPORT_FIELDS = {
+    'groups': (Group, {
+        'id': 'id',
+        'title': 'title',
+        'slug': 'slug',
+        'description': 'description',
+    }),
+    'posts': (Post, {
+        'id': 'id',
+        'text': 'text',
+        'pub_date': 'pub_date',
+        'author': 'author__username',
+        'group': 'group__slug',
+        'image': 'image',
+    }),
+    'comments': (Comment, {
+        'id': 'id',
+        'post': 'post_id',
+        'author': 'author__username',
+        'text': 'text',
+        'created': 'created',
+    }),
+    'follows': (Follow, {
+        'user': 'user__username',
+        'author': 'author__username',
+    }),
+}
+MODELS = tuple(EXPORT_FIELDS)
+
+
+def batched(iterable, size=BATCH_SIZE):
+    iterator = iter(iterable)
+    while True:
+        batch = list(itertools.islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+@contextmanager
+def explicit_dates():
+    """Позволяет задать pub_date и created вручную при bulk_create."""
+    fields = [Post._meta.get_field('pub_date'),
+              Comment._meta.get_field('created')]
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+
+def export_rows(name, chunk_size=BATCH_SIZE):
+    """Строки таблицы name словарями, без загрузки всей таблицы в память."""
+    model, fields = EXPORT_FIELDS[name]
+    rows = model.objects.order_by('pk').values_list(
+        *fields.values()).iterator(chunk_size=chunk_size)
+    for row in rows:
+        # isoformat без округления до миллисекунд, как в DjangoJSONEncoder.
+        yield {name: value.isoformat() if hasattr(value, 'isoformat')
+               else value for name, value in zip(fields, row)}
+
+
+def write_rows(rows, output, fmt, fields):
+    if fmt == 'csv':
+        writer = csv.DictWriter(output, fieldnames=list(fields))
+        writer.writeheader()
+        for row in rows:
+            writer.writerow({key: '' if value is None else value
+                             for key, value in row.items()})
+        return
+    for row in rows:
+        output.write(json.dumps(row, ensure_ascii=False))
+        output.write('\n')
+
+
+def read_rows(source, fmt):
+    if fmt == 'csv':
+        for row in csv.DictReader(source):
+            yield {key: value or None for key, value in row.items()}
+        return
+    for line in source:
+        if line.strip():
+            yield json.loads(line)
+
+
+class Resolver:
+    """Кэш соответствий username -> id и slug -> id на время загрузки."""
+
+    def __init__(self):
+        self.users = {}
+        self.groups = {}
+
+    def user_ids(self, usernames):
+        missing = set(usernames) - set(self.users)
+        if missing:
+            self.users.update(User.objects.filter(
+                username__in=missing).values_list('username', 'pk'))
+            new = missing - set(self.users)
+            User.objects.bulk_create(
+                (User(username=username) for username in new),
+                ignore_conflicts=True)
+            self.users.update(User.objects.filter(
+                username__in=new).values_list('username', 'pk'))
+        return self.users
+
+    def group_ids(self, slugs):
+        missing = set(slugs) - set(self.groups) - {None}
+        if missing:
+            self.groups.update(Group.objects.filter(
+                slug__in=missing).values_list('slug', 'pk'))
+        return self.groups
+
+
+def _date(value):
+    return parse_datetime(value) if isinstance(value, str) else value
+
+
+def build_groups(rows, resolver):
+    return [Group(id=row['id'], title=row['title'], slug=row['slug'],
+                  description=row['description'] or '') for row in rows]
+
+
+def build_posts(rows, resolver):
+    users = resolver.user_ids(row['author'] for row in rows)
+    groups = resolver.group_ids(row['group'] for row in rows)
+    return [Post(id=row['id'], text=row['text'] or '',
+                 pub_date=_date(row['pub_date']),
+                 author_id=users[row['author']],
+                 group_id=groups.get(row['group']),
+                 image=row['image'] or '') for row in rows]
+
+
+def build_comments(rows, resolver):
+    users = resolver.user_ids(row['author'] for row in rows)
+    return [Comment(id=row['id'], post_id=row['post'],
+                    author_id=users[row['author']], text=row['text'] or '',
+                    created=_date(row['created'])) for row in rows]
+
+
+def build_follows(rows, resolver):
+    users = resolver.user_ids(
+        itertools.chain.from_iterable(
+            (row['user'], row['author']) for row in rows))
+    return [Follow(user_id=users[row['user']],
+                   author_id=users[row['author']])
+            for row in rows if row['user'] != row['author']]
+
+
+BUILDERS = {
+    'groups': build_groups,
+    'posts': build_posts,
+    'comments': build_comments,
+    'follows': build_follows,
+}
+
+
+def copy_image(name, media_source):
+    """Копирует картинку поста из media_source в MEDIA_ROOT."""
+    target = default_storage.path(name)
+    if os.path.exists(target):
+        return
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    shutil.copyfile(os.path.join(media_source, name), target)
+
+
+def read_checkpoint(path):
+    if not path or not os.path.exists(path):
+        return 0
+    with open(path) as checkpoint:
+        return int(checkpoint.read() or 0)
+
+
+def write_checkpoint(path, done):
+    if not path:
+        return
+    with open(path + '.tmp', 'w') as checkpoint:
+        checkpoint.write(str(done))
+    os.replace(path + '.tmp', path)
+
+
+def import_rows(name, rows, batch_size=BATCH_SIZE, checkpoint=None,
+                media_source=None, workers=4, log=None, on_batch=None):
+    """Загружает строки пачками; возвращает число обработанных строк.
+
+    Строки с уже существующим id пропускаются, так что повторная
+    загрузка того же файла безопасна. on_batch получает объекты каждой
+    пачки после коммита и копирования картинок.
+    """
+    model = EXPORT_FIELDS[name][0]
+    build = BUILDERS[name]
+    resolver = Resolver()
+    done = read_checkpoint(checkpoint)
+    rows = itertools.islice(rows, done, None)
+    with ThreadPoolExecutor(max_workers=workers) as executor, \
+            explicit_dates():
+        for batch in batched(rows, batch_size):
+            objects = build(batch, resolver)
+            with transaction.atomic():
+                model.objects.bulk_create(objects, ignore_conflicts=True)
+            if media_source and name == 'posts':
+                images = [row['image'] for row in batch if row['image']]
+                # Контрольная точка пишется только после копирования.
+                list(executor.map(
+                    lambda image: copy_image(image, media_source), images))
+            if on_batch:
+                on_batch(objects)
+            done += len(batch)
+            write_checkpoint(checkpoint, done)
+            if log:
+                log(f'{name}: {done}')
+    reset_sequences(model)
+    return done
+
+
+def reset_sequences(model):
+    """После вставки с явными id сдвигает автоинкремент (PostgreSQL)."""
+    statements = connection.ops.sequence_reset_sql(no_style(), [model])
+    with connection.cursor() as cursor:
+        for sql in statements:
+            cursor.execute(sql)
@@ -0,0 +1,69 @@
+"""Счётчики версий для ключей кэша фрагментов.
+
+Версия входит в ключ фрагмента, поэтому изменение данных делает старые
+фрагменты недоступными сразу, а TTL можно держать большим. Версии
+сдвигаются сигналами Post, Follow, Comment и Group.
+"""
+import time
+
+from django.core.cache import cache
+
+PREFIX = 'version:'
+INDEX = 'feed:index'
+GROUPS = 'groups'
+
+
+def group_key(group_id):
+    return f'feed:group:{group_id}'
+
+
+def profile_key(author_id):
+    return f'feed:profile:{author_id}'
+
+
+def follow_key(user_id):
+    return f'feed:follow:{user_id}'
+
+
+def post_key(post_id):
+    return f'post:{post_id}'
+
+
+def comments_key(post_id):
+    return f'comments:{post_id}'
+
+
+def post_keys(post):
+    """Версии, которые зависят от карточки поста: он сам и его ленты."""
+    names = [INDEX, profile_key(post.author_id), post_key(post.pk)]
+    if post.group_id:
+        names.append(group_key(post.group_id))
+    return names
+
+
+def initial_version():
+    # Версия от времени, а не с единицы: после вытеснения ключа из кэша
+    # не вернутся версии, под которыми уже лежат старые фрагменты.
+    return time.time_ns() // 1000
+
+
+def get_version(name):
+    key = PREFIX + name
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, initial_version(), None)
+        version = cache.get(key)
+    return version
+
+
+def bump(*names):
+    for name in names:
+        try:
+            cache.incr(PREFIX + name)
+        except ValueError:
+            cache.set(PREFIX + name, initial_version(), None)
+
+
+def follow_feed_version(user_id):
+    """Лента подписок зависит и от подписок, и от любого нового поста."""
+    return f'{get_version(INDEX)}.{get_version(follow_key(user_id))}'
@@ -0,0 +1,225 @@
+"""Отложенная запись комментариев пачками.
+
+При ``COMMENT_WRITE_BEHIND = True`` add_comment не делает INSERT сам,
+а кладёт проверенный комментарий в очередь процесса. Фоновый поток
+забирает до ``COMMENT_BATCH_SIZE`` комментариев или всё, что пришло за
+``COMMENT_FLUSH_INTERVAL`` секунд, и пишет их одним bulk_create в одной
+транзакции. Пока комментарий в очереди, автор видит его на странице
+поста: ожидающие записи лежат в кэше и подмешиваются в первую страницу
+комментариев (``with_pending``).
+
+При штатной остановке процесса очередь дописывается в базу: через
+atexit (в том числе после SIGTERM у gunicorn) и через хук uwsgi.atexit,
+который uwsgi вызывает при остановке воркера. При аварийном завершении
+теряются комментарии последнего неполного интервала.
+"""
+import atexit
+import logging
+import queue
+import threading
+import time
+import uuid
+from collections import Counter
+
+try:
+    import uwsgi
+except ImportError:
+    uwsgi = None
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import close_old_connections, connection, transaction
+from django.utils import timezone
+
+from . import cache_versions, counters
+from .models import Comment, Post
+
+logger = logging.getLogger(__name__)
+
+PENDING_KEY = 'pending-comments:{}:{}'
+PENDING_TIMEOUT = 300
+
+_queue = queue.Queue()
+_stopping = threading.Event()
+_lock = threading.Lock()
+_writer = None
+_uwsgi_previous_atexit = None
+
+
+def pending_key(post_id, user_id):
+    return PENDING_KEY.format(post_id, user_id)
+
+
+def pending_cache():
+    """Кэш ожидающих комментариев.
+
+    Поток записи и запросы держат разные экземпляры кэша, поэтому при
+    двухуровневом кэше список читается мимо локального уровня: иначе
+    автор до CHECK_INTERVAL секунд видел бы записанные комментарии
+    дважды.
+    """
+    return getattr(cache, 'shared', cache)
+
+
+def start_writer():
+    global _writer
+    with _lock:
+        if _writer is None or not _writer.is_alive():
+            _stopping.clear()
+            _writer = threading.Thread(
+                target=writer_loop, name='comment-writer', daemon=True)
+            _writer.start()
+            register_shutdown()
+
+
+def register_shutdown():
+    """Дописывает очередь при остановке процесса или воркера uwsgi."""
+    global _uwsgi_previous_atexit
+    atexit.unregister(shutdown)
+    atexit.register(shutdown)
+    # uwsgi по умолчанию завершает воркер без atexit, но вызывает свой хук.
+    if uwsgi is None:
+        return
+    previous = getattr(uwsgi, 'atexit', None)
+    if previous is not _on_uwsgi_exit:
+        _uwsgi_previous_atexit = previous
+        uwsgi.atexit = _on_uwsgi_exit
+
+
+def _on_uwsgi_exit():
+    shutdown()
+    if _uwsgi_previous_atexit is not None:
+        _uwsgi_previous_atexit()
+
+
+def submit(comment):
+    """Ставит несохранённый комментарий в очередь на запись."""
+    comment.created = timezone.now()
+    token = uuid.uuid4().hex
+    key = pending_key(comment.post_id, comment.author_id)
+    with _lock:
+        pending = pending_cache().get(key, [])
+        pending.append({'token': token, 'text': comment.text,
+                        'created': comment.created})
+        pending_cache().set(key, pending, PENDING_TIMEOUT)
+    # Меняет ETag страницы поста, чтобы автор не получил 304.
+    cache_versions.bump(cache_versions.comments_key(comment.post_id))
+    _queue.put((token, comment))
+    start_writer()
+
+
+def with_pending(request, page, post_id):
+    """Добавляет к первой странице комментарии зрителя из очереди."""
+    user = request.user
+    if (not settings.COMMENT_WRITE_BEHIND or not user.is_authenticated
+            or request.GET.get('after')):
+        return page
+    pending = pending_cache().get(pending_key(post_id, user.pk))
+    if pending:
+        page.object_list = [
+            Comment(post_id=post_id, author=user, text=entry['text'],
+                    created=entry['created'])
+            for entry in reversed(pending)
+        ] + list(page.object_list)
+    return page
+
+
+def collect(timeout):
+    """Пачка из очереди: ждёт первый элемент не дольше timeout секунд."""
+    try:
+        batch = [_queue.get(timeout=timeout)]
+    except queue.Empty:
+        return []
+    deadline = time.monotonic() + settings.COMMENT_FLUSH_INTERVAL
+    while len(batch) < settings.COMMENT_BATCH_SIZE:
+        remaining = deadline - time.monotonic()
+        try:
+            if remaining > 0:
+                batch.append(_queue.get(timeout=remaining))
+            else:
+                batch.append(_queue.get_nowait())
+        except queue.Empty:
+            break
+    return batch
+
+
+def write(batch):
+    """Пишет пачку одной транзакцией; при ошибке — по одному."""
+    comments = [comment for _, comment in batch]
+    # Пост могли удалить, пока комментарий ждал в очереди.
+    alive = set(Post.objects.filter(
+        pk__in={comment.post_id for comment in comments}).values_list(
+            'pk', flat=True))
+    comments = [comment for comment in comments if comment.post_id in alive]
+    per_post = Counter(comment.post_id for comment in comments)
+    try:
+        with transaction.atomic():
+            Comment.objects.bulk_create(comments)
+            # bulk_create не шлёт post_save: счётчики — вручную.
+            for post_id, count in per_post.items():
+                counters.incr(counters.comments_key(post_id), count)
+    except Exception:
+        logger.exception('Не удалось записать пачку из %s комментариев',
+                         len(comments))
+        for comment in comments:
+            try:
+                comment.save()
+            except Exception:
+                logger.exception('Комментарий к посту %s потерян',
+                                 comment.post_id)
+    else:
+        cache_versions.bump(*(cache_versions.comments_key(post_id)
+                              for post_id in per_post))
+    forget(batch)
+
+
+def forget(batch):
+    """Убирает записанные комментарии из кэша ожидающих."""
+    tokens = {}
+    for token, comment in batch:
+        key = pending_key(comment.post_id, comment.author_id)
+        tokens.setdefault(key, set()).add(token)
+    with _lock:
+        for key, written in tokens.items():
+            pending = [entry for entry in pending_cache().get(key, [])
+                       if entry['token'] not in written]
+            if pending:
+                pending_cache().set(key, pending, PENDING_TIMEOUT)
+            else:
+                pending_cache().delete(key)
+
+
+def flush(timeout=0):
+    """Записывает одну пачку из очереди; возвращает её размер."""
+    batch = collect(timeout)
+    if not batch:
+        return 0
+    try:
+        write(batch)
+    finally:
+        for _ in batch:
+            _queue.task_done()
+    return len(batch)
+
+
+def writer_loop():
+    close_old_connections()
+    try:
+        while not (_stopping.is_set() and _queue.empty()):
+            flush(timeout=settings.COMMENT_FLUSH_INTERVAL)
+    finally:
+        connection.close()
+
+
+def wait():
+    """Ждёт, пока все поставленные в очередь комментарии записаны."""
+    _queue.join()
+
+
+def shutdown(timeout=30):
+    """Останавливает поток записи, дописав очередь."""
+    _stopping.set()
+    if _writer is not None and _writer.is_alive():
+        _writer.join(timeout)
+    while flush():
+        pass
@@ -0,0 +1,107 @@
+"""Условные ответы и Cache-Control для HTML-лент.
+
+ETag страницы строится из версий в cache_versions, зрителя (его
+подписок, сессии и CSRF-cookie) и адреса,
+поэтому проверка обходится без запросов к ленте и рендера шаблона:
+неизменившаяся страница отвечает 304. Анонимные страницы помечаются
+``public, max-age``, чтобы их мог кэшировать обратный прокси,
+страницы пользователя — ``private, no-cache``.
+"""
+import hashlib
+from functools import wraps
+
+from django.conf import settings
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import condition
+
+from . import cache_versions
+from .models import Group, Post, User
+
+
+def viewer_version(request):
+    """Состояние зрителя, от которого зависит страница.
+
+    Версия подписок — кнопки «Подписаться». Сессия и CSRF-cookie —
+    токен в формах: после повторного входа или смены CSRF-cookie
+    страница из кэша браузера отправляла бы формы со старым токеном.
+    Анонимные ленты форм с токеном не содержат.
+    """
+    if not request.user.is_authenticated:
+        return 'anon'
+    user_id = request.user.pk
+    version = cache_versions.get_version(cache_versions.follow_key(user_id))
+    session_key = request.session.session_key or ''
+    csrf_cookie = request.META.get('CSRF_COOKIE', '')
+    return f'{user_id}.{version}.{session_key}.{csrf_cookie}'
+
+
+def index_version(request):
+    return cache_versions.get_version(cache_versions.INDEX)
+
+
+def group_version(request, slug):
+    group_id = Group.objects.filter(slug=slug).values_list(
+        'pk', flat=True).first()
+    if group_id is None:
+        return None
+    return cache_versions.get_version(cache_versions.group_key(group_id))
+
+
+def profile_version(request, username):
+    author_id = User.objects.filter(username=username).values_list(
+        'pk', flat=True).first()
+    if author_id is None:
+        return None
+    return cache_versions.get_version(cache_versions.profile_key(author_id))
+
+
+def post_version(request, post_id):
+    author_id = Post.objects.filter(pk=post_id).values_list(
+        'author_id', flat=True).first()
+    if author_id is None:
+        return None
+    return '.'.join(str(cache_versions.get_version(name)) for name in (
+        cache_versions.post_key(post_id),
+        cache_versions.comments_key(post_id),
+        cache_versions.profile_key(author_id),
+    ))
+
+
+def follow_version(request):
+    return cache_versions.follow_feed_version(request.user.pk)
+
+
+def feed_version(request, version_func, *args, **kwargs):
+    """Версия ленты; считается один раз за запрос."""
+    if not hasattr(request, 'feed_version'):
+        request.feed_version = version_func(request, *args, **kwargs)
+    return request.feed_version
+
+
+def feed_condition(version_func):
+    """304 по версии ленты и заголовки Cache-Control для HTML-view."""
+    def etag(request, *args, **kwargs):
+        version = feed_version(request, version_func, *args, **kwargs)
+        if version is None:
+            return None
+        raw = (f'{version}|{viewer_version(request)}|'
+               f'{request.get_full_path()}')
+        return hashlib.md5(raw.encode()).hexdigest()
+
+    def decorator(view_func):
+        conditional_view = condition(etag_func=etag)(view_func)
+
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            response = conditional_view(request, *args, **kwargs)
+            if response.status_code not in (200, 304):
+                return response
+            if request.user.is_authenticated or response.cookies:
+                patch_cache_control(response, private=True, no_cache=True)
+            else:
+                patch_cache_control(
+                    response, public=True,
+                    max_age=settings.FEED_CACHE_MAX_AGE)
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,102 @@
+from django.db import transaction
+from django.db.models import Count, F
+
+from .models import Comment, Counter, Follow, Post
+
+POSTS = 'posts'
+
+
+def author_key(author_id):
+    return f'posts:author:{author_id}'
+
+
+def group_key(group_id):
+    return f'posts:group:{group_id}'
+
+
+def comments_key(post_id):
+    return f'comments:post:{post_id}'
+
+
+def followers_key(author_id):
+    return f'followers:author:{author_id}'
+
+
+def post_keys(post):
+    keys = [POSTS, author_key(post.author_id)]
+    if post.group_id:
+        keys.append(group_key(post.group_id))
+    return keys
+
+
+def source(name):
+    """Выборка, по которой счётчик name считается через COUNT(*)."""
+    if name == POSTS:
+        return Post.objects.all()
+    prefix, pk = name.rsplit(':', 1)
+    return {
+        'posts:author': Post.objects.filter(author_id=pk),
+        'posts:group': Post.objects.filter(group_id=pk),
+        'comments:post': Comment.objects.filter(post_id=pk),
+        'followers:author': Follow.objects.filter(author_id=pk),
+    }[prefix]
+
+
+def incr(name, delta=1):
+    """Сдвигает счётчик одним UPDATE.
+
+    Вызывается в транзакции изменения. Если строки счётчика ещё нет, она
+    создаётся из COUNT(*), который уже видит это изменение. Строку, которую
+    успела создать параллельная транзакция, её COUNT(*) посчитал без нашего
+    изменения, поэтому к ней прибавляется delta.
+    """
+    if Counter.objects.filter(name=name).update(value=F('value') + delta):
+        return
+    with transaction.atomic():
+        _, created = Counter.objects.get_or_create(
+            name=name, defaults={'value': source(name).count()})
+        if not created:
+            Counter.objects.filter(name=name).update(
+                value=F('value') + delta)
+
+
+def recount(names):
+    """Пересчитывает счётчики names через COUNT(*)."""
+    for name in names:
+        Counter.objects.update_or_create(
+            name=name, defaults={'value': source(name).count()})
+
+
+def drop(name):
+    Counter.objects.filter(name=name).delete()
+
+
+def get_count(name, queryset):
+    """Значение счётчика, при отсутствии считается через COUNT(*)."""
+    value = Counter.objects.filter(name=name).values_list(
+        'value', flat=True).first()
+    if value is None:
+        value = queryset.count()
+        # Один INSERT без SELECT и точек сохранения get_or_create; строку,
+        # которую успел создать параллельный запрос, он не трогает.
+        Counter.objects.bulk_create(
+            [Counter(name=name, value=value)], ignore_conflicts=True)
+    return value
+
+
+def actual_counts():
+    """Точные значения всех счётчиков, посчитанные по таблицам."""
+    counts = {POSTS: Post.objects.count()}
+    by_author = Post.objects.values_list('author_id').annotate(
+        total=Count('pk')).order_by()
+    counts.update((author_key(pk), total) for pk, total in by_author)
+    by_group = Post.objects.filter(group__isnull=False).values_list(
+        'group_id').annotate(total=Count('pk')).order_by()
+    counts.update((group_key(pk), total) for pk, total in by_group)
+    by_post = Comment.objects.values_list('post_id').annotate(
+        total=Count('pk')).order_by()
+    counts.update((comments_key(pk), total) for pk, total in by_post)
+    by_author = Follow.objects.values_list('author_id').annotate(
+        total=Count('pk')).order_by()
+    counts.update((followers_key(pk), total) for pk, total in by_author)
+    return counts
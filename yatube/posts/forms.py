@@ -1,5 +1,7 @@
 from django import forms
+from django.conf import settings
 
+from .images import too_large
 from .models import Post, Comment
 
 
@@ -12,6 +14,16 @@ class PostForm(forms.ModelForm):
             'group': 'Группа',
             'image': 'Изображение', }
 
+    def clean_image(self):
+        image = self.cleaned_data.get('image')
+        # У только что загруженного файла ImageField уже прочитал размеры.
+        size = getattr(getattr(image, 'image', None), 'size', None)
+        if size and too_large(size):
+            raise forms.ValidationError(
+                'Слишком большое изображение: не больше '
+                f'{settings.IMAGE_MAX_PIXELS // 1_000_000} Мпикс')
+        return image
+
 
 class CommentForm(forms.ModelForm):
     class Meta:
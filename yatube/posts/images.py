@@ -0,0 +1,123 @@
+"""Обработка загруженных картинок постов.
+
+Из оригинала строится мастер-копия: повёрнутая по EXIF, уменьшенная до
+IMAGE_MAX_SIZE по большей стороне и сохранённая без метаданных в JPEG
+(или PNG, если есть прозрачность). Рядом кладутся копии в современных
+форматах, которые умеет сохранять установленный Pillow (AVIF, WebP).
+Адреса, размеры и вес копий записываются в Post.image_variants.
+Вызывается из генерации миниатюр (см. thumbnails).
+Картинки больше IMAGE_MAX_PIXELS не обрабатываются, откуда бы они ни
+пришли: из формы, админки или загрузки данных.
+"""
+import json
+import os
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps
+
+from .models import Post
+
+MASTER_DIR = 'posts/master/'
+VARIANTS_DIR = 'posts/variants/'
+# Порядок важен: браузер берёт первый поддерживаемый <source>.
+MODERN_FORMATS = (
+    ('avif', 'AVIF', 'image/avif', {'quality': 60}),
+    ('webp', 'WEBP', 'image/webp', {'quality': 80, 'method': 4}),
+)
+
+
+class ImageTooLarge(ValueError):
+    pass
+
+
+def too_large(size):
+    width, height = size
+    return width * height > settings.IMAGE_MAX_PIXELS
+
+
+def available_formats():
+    Image.init()
+    return [entry for entry in MODERN_FORMATS if entry[1] in Image.SAVE]
+
+
+def normalize(image):
+    """Поворот по EXIF, уменьшение и сброс метаданных."""
+    image = ImageOps.exif_transpose(image)
+    has_alpha = (image.mode in ('RGBA', 'LA')
+                 or 'transparency' in image.info)
+    image = image.convert('RGBA' if has_alpha else 'RGB')
+    image.thumbnail((settings.IMAGE_MAX_SIZE, settings.IMAGE_MAX_SIZE),
+                    Image.LANCZOS)
+    image.info.clear()
+    return image, has_alpha
+
+
+def store(name, image, pil_format, options):
+    buffer = BytesIO()
+    image.save(buffer, pil_format, **options)
+    if default_storage.exists(name):
+        default_storage.delete(name)
+    name = default_storage.save(name, ContentFile(buffer.getvalue()))
+    return {
+        'url': default_storage.url(name),
+        'name': name,
+        'width': image.width,
+        'height': image.height,
+        'bytes': buffer.tell(),
+    }
+
+
+def process(post):
+    """Строит мастер-копию и варианты; возвращает имя мастер-копии."""
+    with post.image.open('rb') as source:
+        # Image.open читает только заголовок, пиксели ещё не распакованы.
+        image = Image.open(source)
+        if too_large(image.size):
+            raise ImageTooLarge(
+                f'{post.image.name}: {image.width}x{image.height}')
+        image, has_alpha = normalize(image)
+    stem = os.path.splitext(os.path.basename(post.image.name))[0]
+    base = f'{post.pk}-{stem}'
+    variants = {}
+    if has_alpha:
+        master = store(f'{MASTER_DIR}{base}.png', image, 'PNG',
+                       {'optimize': True})
+        master['type'] = 'image/png'
+    else:
+        master = store(f'{MASTER_DIR}{base}.jpg', image, 'JPEG',
+                       {'quality': 85, 'optimize': True,
+                        'progressive': True})
+        master['type'] = 'image/jpeg'
+    for extension, pil_format, mime, options in available_formats():
+        variant = store(f'{VARIANTS_DIR}{base}.{extension}', image,
+                        pil_format, options)
+        variant['type'] = mime
+        variants[extension] = variant
+    variants['master'] = master
+    updates = {
+        'image_width': master['width'],
+        'image_height': master['height'],
+        'image_variants': json.dumps(variants),
+    }
+    if not settings.IMAGE_KEEP_ORIGINAL:
+        post.image.delete(save=False)
+        updates['image'] = master['name']
+    Post.objects.filter(pk=post.pk).update(**updates)
+    return master['name']
+
+
+def reset(post):
+    """Сбрасывает производные старой картинки и удаляет их файлы.
+
+    Поля меняются только у объекта, сохраняет его вызывающий код.
+    """
+    for version in post.image_versions.values():
+        if version['name'] != post.image.name:
+            default_storage.delete(version['name'])
+    post.thumbnail = ''
+    post.image_width = None
+    post.image_height = None
+    post.image_variants = ''
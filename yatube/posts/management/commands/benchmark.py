@@ -0,0 +1,73 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.test import override_settings
+
+from posts import benchmark
+
+
+class Command(BaseCommand):
+    help = ('Замеряет время ответа, число запросов и память view постов. '
+            'Данные готовит команда seed_benchmark.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=100,
+                            help='Запросов на сценарий.')
+        parser.add_argument('--scenario', action='append',
+                            choices=benchmark.SCENARIOS,
+                            help='Сценарий; по умолчанию все.')
+        parser.add_argument('--memory', action='store_true',
+                            help='Замерять пиковую память (медленнее).')
+        parser.add_argument('--cold-cache', action='store_true',
+                            help='Очищать кэш перед каждым запросом.')
+        parser.add_argument('--concurrency', type=int, default=1,
+                            help='Одновременных клиентов (потоков).')
+        parser.add_argument('--parallel-queries', action='store_true',
+                            help='Включить PARALLEL_QUERIES на время замера.')
+        parser.add_argument('--write-behind', action='store_true',
+                            help='Включить COMMENT_WRITE_BEHIND на время '
+                                 'замера.')
+        parser.add_argument('--output', help='Сохранить результаты в JSON.')
+        parser.add_argument('--baseline',
+                            help='Сравнить p95 с сохранёнными результатами.')
+        parser.add_argument('--threshold', type=float, default=0.1,
+                            help='Допустимый рост p95, доля (0.1 — 10%%).')
+
+    def handle(self, *args, **options):
+        runner = benchmark.Runner(
+            requests=options['requests'],
+            measure_memory=options['memory'],
+            cold_cache=options['cold_cache'],
+            concurrency=options['concurrency'],
+        )
+        if not runner.user_ids:
+            raise CommandError('Нет данных: сначала запустите seed_benchmark')
+        with override_settings(
+                PARALLEL_QUERIES=options['parallel_queries'],
+                COMMENT_WRITE_BEHIND=options['write_behind']):
+            results = runner.run(options['scenario'] or benchmark.SCENARIOS)
+        results['parallel_queries'] = options['parallel_queries']
+        results['write_behind'] = options['write_behind']
+        for scenario, result in results['scenarios'].items():
+            self.stdout.write(
+                f'{scenario:<14} {result["throughput_rps"]:7.1f} rps  '
+                f'p50 {result["p50_ms"]:8.1f} мс  '
+                f'p95 {result["p95_ms"]:8.1f} мс  '
+                f'p99 {result["p99_ms"]:8.1f} мс  '
+                f'запросов {result["queries_mean"]:5.1f}')
+        if options['output']:
+            benchmark.save(results, options['output'])
+        if options['baseline']:
+            baseline = benchmark.load(options['baseline'])
+            for scenario, result in results['scenarios'].items():
+                base = baseline.get('scenarios', {}).get(scenario, {})
+                if base.get('throughput_rps'):
+                    ratio = result['throughput_rps'] / base['throughput_rps']
+                    self.stdout.write(
+                        f'{scenario}: пропускная способность {ratio:.2f}x '
+                        f'от базовой')
+            regressions = benchmark.compare(
+                results, baseline, options['threshold'])
+            for scenario, change in regressions.items():
+                self.stderr.write(f'{scenario}: p95 вырос на {change:.0%}')
+            if regressions:
+                raise CommandError('Производительность ухудшилась')
+            self.stdout.write(self.style.SUCCESS('Регрессий нет'))
@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import F, Min
+
+from posts import timeline
+from posts.models import Follow
+
+
+class Command(BaseCommand):
+    help = (
+        'Удаляет повторные подписки и подписки на самого себя '
+        'перед включением ограничений unique_follow и no_self_follow.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Только показать, сколько подписок будет удалено.',
+        )
+
+    def handle(self, *args, **options):
+        keep = Follow.objects.values('user_id', 'author_id').annotate(
+            keep=Min('id')).values_list('keep', flat=True)
+        duplicates = Follow.objects.exclude(pk__in=list(keep))
+        self_follows = Follow.objects.filter(user_id=F('author_id'))
+        self.stdout.write(
+            f'Повторных подписок: {duplicates.count()}, '
+            f'на самого себя: {self_follows.count()}')
+        if options['dry_run']:
+            return
+        pairs = set(duplicates.values_list('user_id', 'author_id'))
+        with transaction.atomic():
+            duplicates.delete()
+            self_follows.delete()
+            # Удаление дубля чистит ленту, хотя подписка осталась.
+            for user_id, author_id in pairs:
+                timeline.backfill(user_id, author_id)
+        self.stdout.write(self.style.SUCCESS('Готово'))
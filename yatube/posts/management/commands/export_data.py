@@ -0,0 +1,32 @@
+import sys
+
+from django.core.management.base import BaseCommand
+
+from posts import bulk
+
+
+class Command(BaseCommand):
+    help = 'Потоково выгружает группы, посты, комментарии или подписки.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('model', choices=bulk.MODELS)
+        parser.add_argument('--format', choices=bulk.FORMATS,
+                            default='ndjson')
+        parser.add_argument('--output',
+                            help='Файл; по умолчанию стандартный вывод.')
+        parser.add_argument('--chunk-size', type=int,
+                            default=bulk.BATCH_SIZE,
+                            help='Строк за одно чтение из базы.')
+
+    def handle(self, *args, **options):
+        name = options['model']
+        fields = bulk.EXPORT_FIELDS[name][1]
+        rows = bulk.export_rows(name, options['chunk_size'])
+        if not options['output']:
+            bulk.write_rows(rows, sys.stdout, options['format'], fields)
+            return
+        with open(options['output'], 'w', encoding='utf-8',
+                  newline='') as output:
+            bulk.write_rows(rows, output, options['format'], fields)
+        self.stderr.write(self.style.SUCCESS(
+            f'Выгружено в {options["output"]}'))
@@ -0,0 +1,107 @@
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from posts import bulk, counters, search, thumbnails, timeline
+from posts.models import Follow, Post
+
+# Не больше лимита параметров запроса SQLite.
+CHUNK_SIZE = 500
+
+
+class Command(BaseCommand):
+    help = ('Потоково загружает группы, посты, комментарии или подписки '
+            'из NDJSON или CSV. Порядок: groups, posts, comments, follows.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('model', choices=bulk.MODELS)
+        parser.add_argument('input', help='Файл с данными.')
+        parser.add_argument('--format', choices=bulk.FORMATS,
+                            default='ndjson')
+        parser.add_argument('--batch-size', type=int,
+                            default=bulk.BATCH_SIZE,
+                            help='Строк в одной транзакции.')
+        parser.add_argument('--checkpoint',
+                            help='Файл контрольной точки для продолжения '
+                                 'прерванной загрузки.')
+        parser.add_argument('--media-source',
+                            help='Каталог, откуда копировать картинки постов.')
+        parser.add_argument('--workers', type=int, default=4,
+                            help='Потоков для копирования картинок.')
+        parser.add_argument('--skip-rebuild', action='store_true',
+                            help='Не обновлять счётчики, поиск и ленты '
+                                 'загруженных строк (потом их пересчитывают '
+                                 'rebuild_counters и rebuild_search_index).')
+
+    def handle(self, *args, **options):
+        name = options['model']
+        self.update_derived = not options['skip_rebuild']
+        # Что задели загруженные строки: обновляется только это.
+        self.counter_names = set()
+        self.post_authors = set()
+        self.follow_authors = set()
+        self.followers = set()
+        with open(options['input'], encoding='utf-8', newline='') as source:
+            done = bulk.import_rows(
+                name,
+                bulk.read_rows(source, options['format']),
+                batch_size=options['batch_size'],
+                checkpoint=options['checkpoint'],
+                media_source=options['media_source'],
+                workers=options['workers'],
+                log=self.stdout.write,
+                on_batch=getattr(self, f'{name}_imported', None),
+            )
+        self.stdout.write(self.style.SUCCESS(f'Загружено строк: {done}'))
+        if self.update_derived:
+            self.rebuild()
+
+    def posts_imported(self, posts):
+        ids = [post.pk for post in posts]
+        self.schedule_thumbnails(ids)
+        if not self.update_derived:
+            return
+        # Текст из базы: уже существовавшие посты bulk_create пропустил.
+        with transaction.atomic():
+            search.index_posts(Post.objects.filter(
+                pk__in=ids).values_list('pk', 'text'))
+        for post in posts:
+            self.counter_names.update(counters.post_keys(post))
+            self.post_authors.add(post.author_id)
+
+    def comments_imported(self, comments):
+        self.counter_names.update(
+            counters.comments_key(comment.post_id) for comment in comments)
+
+    def follows_imported(self, follows):
+        for follow in follows:
+            self.counter_names.add(counters.followers_key(follow.author_id))
+            self.follow_authors.add(follow.author_id)
+            self.followers.add(follow.user_id)
+
+    def schedule_thumbnails(self, post_ids):
+        """bulk_create не шлёт post_save: миниатюры пачки — отдельно."""
+        posts = Post.objects.filter(
+            pk__in=post_ids, thumbnail='').exclude(
+                image='').only('pk', 'image', 'author_id', 'group_id')
+        for post in posts:
+            thumbnails.schedule(post)
+
+    def rebuild(self):
+        """bulk_create не шлёт сигналы: производные данные загруженных
+        строк — заново, остальные не трогаются."""
+        counters.recount(sorted(self.counter_names))
+        for author_ids in bulk.batched(sorted(self.follow_authors),
+                                       CHUNK_SIZE):
+            timeline.sync_heavy_authors(author_ids)
+        user_ids = set(self.followers)
+        for author_ids in bulk.batched(sorted(self.post_authors),
+                                       CHUNK_SIZE):
+            user_ids.update(Follow.objects.filter(
+                author_id__in=author_ids).values_list('user_id', flat=True))
+        for user_id in sorted(user_ids):
+            timeline.rebuild(user_id)
+        self.stdout.write(
+            f'Счётчиков: {len(self.counter_names)}, лент: {len(user_ids)}')
+        # Версии лент в кэше не знают о загруженных строках.
+        cache.clear()
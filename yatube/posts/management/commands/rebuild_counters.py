@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from posts import timeline
+from posts.counters import actual_counts
+from posts.models import Counter
+
+
+class Command(BaseCommand):
+    help = ('Пересчитывает счётчики постов, комментариев и подписчиков '
+            'по таблицам.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--verify',
+            action='store_true',
+            help='Только сравнить счётчики с таблицами, ничего не меняя.',
+        )
+
+    def handle(self, *args, **options):
+        actual = actual_counts()
+        stored = dict(Counter.objects.values_list('name', 'value'))
+        mismatched = sorted(
+            name for name, value in stored.items()
+            if value != actual.get(name, 0)
+        )
+        for name in mismatched:
+            self.stdout.write(
+                f'{name}: {stored[name]} != {actual.get(name, 0)}')
+        if options['verify']:
+            self.stdout.write(f'Расхождений: {len(mismatched)}')
+            return
+        with transaction.atomic():
+            Counter.objects.all().delete()
+            Counter.objects.bulk_create(
+                Counter(name=name, value=value)
+                for name, value in actual.items())
+        # Флаги тяжёлых авторов следуют за числом подписчиков.
+        timeline.sync_heavy_authors()
+        self.stdout.write(self.style.SUCCESS(
+            f'Пересчитано счётчиков: {len(actual)}'))
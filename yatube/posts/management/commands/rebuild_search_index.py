@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from posts import bulk, search
+from posts.models import Post
+
+# Не больше лимита параметров запроса SQLite.
+BATCH_SIZE = 500
+
+
+class Command(BaseCommand):
+    help = 'Перестраивает поисковый индекс по всем постам.'
+
+    def handle(self, *args, **options):
+        indexed = 0
+        posts = Post.objects.order_by().values_list('pk', 'text').iterator()
+        for batch in bulk.batched(posts, BATCH_SIZE):
+            # Пачка в своей транзакции: индекс остальных постов на месте.
+            with transaction.atomic():
+                search.index_posts(batch)
+            indexed += len(batch)
+        self.stdout.write(self.style.SUCCESS(
+            f'Проиндексировано постов: {indexed}'))
@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from posts import benchmark
+
+
+class Command(BaseCommand):
+    help = ('Наполняет базу данными для нагрузочного стенда. '
+            'Запускать только на отдельной базе.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000,
+                            help='Число пользователей.')
+        parser.add_argument('--posts', type=int, default=10000,
+                            help='Число постов.')
+        parser.add_argument('--groups', type=int, default=20,
+                            help='Число групп.')
+        parser.add_argument('--follows-per-user', type=int, default=20,
+                            help='Среднее число подписок пользователя.')
+        parser.add_argument('--comments', type=int, default=20000,
+                            help='Число комментариев.')
+        parser.add_argument('--allow-write', action='store_true',
+                            help='Подтвердить запись в базу default.')
+
+    def handle(self, *args, **options):
+        if not options['allow_write']:
+            raise CommandError(
+                f'Данные будут записаны в базу '
+                f'{connection.settings_dict["NAME"]}. Укажите отдельную '
+                f'базу через DB_NAME и повторите с --allow-write.')
+        benchmark.seed(
+            users=options['users'],
+            posts=options['posts'],
+            groups=options['groups'],
+            follows_per_user=options['follows_per_user'],
+            comments=options['comments'],
+            stdout=self.stdout,
+        )
+        self.stdout.write(self.style.SUCCESS('Данные для стенда созданы'))
@@ -0,0 +1,37 @@
+# Generated by Django 2.2.16 on 2026-10-18 03:01
+
+from django.db import migrations, models
+from django.db.models import F, Min
+import django.db.models.expressions
+
+from core.operations import AddConstraintConcurrently
+
+
+def remove_duplicate_follows(apps, schema_editor):
+    Follow = apps.get_model('posts', 'Follow')
+    keep = Follow.objects.values('user_id', 'author_id').annotate(
+        keep=Min('id')).values_list('keep', flat=True)
+    Follow.objects.exclude(pk__in=list(keep)).delete()
+    Follow.objects.filter(user_id=F('author_id')).delete()
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('posts', '0008_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_follows,
+                             migrations.RunPython.noop, atomic=True),
+        AddConstraintConcurrently(
+            model_name='follow',
+            constraint=models.UniqueConstraint(fields=('user', 'author'), name='unique_follow'),
+        ),
+        AddConstraintConcurrently(
+            model_name='follow',
+            constraint=models.CheckConstraint(check=models.Q(_negated=True, user=django.db.models.expressions.F('author')), name='no_self_follow'),
+        ),
+    ]
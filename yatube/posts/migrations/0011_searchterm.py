@@ -0,0 +1,173 @@
+# Generated by Django 2.2.16 on 2026-10-18 03:07
+
+from collections import Counter
+import re
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+# Копия токенизатора posts.search и стеммера posts.stemmer на момент
+# миграции: миграция не должна зависеть от живого кода приложения.
+WORD_RE = re.compile(r'\w+')
+CYRILLIC_RE = re.compile(r'[а-яё]')
+MAX_TERM_LENGTH = 64
+
+VOWELS = 'аеиоуыэюя'
+
+PERFECTIVE_GERUND = (
+    ('в', 'вши', 'вшись'),
+    ('ив', 'ивши', 'ившись', 'ыв', 'ывши', 'ывшись'),
+)
+REFLEXIVE = ('ся', 'сь')
+ADJECTIVE = (
+    'ее', 'ие', 'ые', 'ое', 'ими', 'ыми', 'ей', 'ий', 'ый', 'ой', 'ем',
+    'им', 'ым', 'ом', 'его', 'ого', 'ему', 'ому', 'их', 'ых', 'ую', 'юю',
+    'ая', 'яя', 'ою', 'ею',
+)
+PARTICIPLE = (
+    ('ем', 'нн', 'вш', 'ющ', 'щ'),
+    ('ивш', 'ывш', 'ующ'),
+)
+VERB = (
+    ('ла', 'на', 'ете', 'йте', 'ли', 'й', 'л', 'ем', 'н', 'ло', 'но', 'ет',
+     'ют', 'ны', 'ть', 'ешь', 'нно'),
+    ('ила', 'ыла', 'ена', 'ейте', 'уйте', 'ите', 'или', 'ыли', 'ей', 'уй',
+     'ил', 'ыл', 'им', 'ым', 'ен', 'ило', 'ыло', 'ено', 'ят', 'ует', 'уют',
+     'ит', 'ыт', 'ены', 'ить', 'ыть', 'ишь', 'ую', 'ю'),
+)
+NOUN = (
+    'а', 'ев', 'ов', 'ие', 'ье', 'е', 'иями', 'ями', 'ами', 'еи', 'ии', 'и',
+    'ией', 'ей', 'ой', 'ий', 'й', 'иям', 'ям', 'ием', 'ем', 'ам', 'ом', 'о',
+    'у', 'ах', 'иях', 'ях', 'ы', 'ь', 'ию', 'ью', 'ю', 'ия', 'ья', 'я',
+)
+SUPERLATIVE = ('ейше', 'ейш')
+DERIVATIONAL = ('ость', 'ост')
+
+
+def _region_after_vowel_pair(word, start=0):
+    """Начало области после первой пары «гласная, согласная»."""
+    for i in range(start + 1, len(word)):
+        if word[i] not in VOWELS and word[i - 1] in VOWELS:
+            return i + 1
+    return len(word)
+
+
+def _longest(word, endings):
+    return max((e for e in endings if word.endswith(e)), key=len,
+               default=None)
+
+
+def _remove(word, endings, grouped=False):
+    """Отрезает самое длинное окончание, None — если ничего не подошло.
+
+    Для пары групп окончания первой группы должны идти после «а» или «я».
+    """
+    if not grouped:
+        ending = _longest(word, endings)
+        return None if ending is None else word[:-len(ending)]
+    first, second = endings
+    candidates = [
+        e for e in first
+        if word.endswith(e) and word[:-len(e)][-1:] in ('а', 'я')
+    ] + [e for e in second if word.endswith(e)]
+    ending = _longest(word, candidates)
+    return None if ending is None else word[:-len(ending)]
+
+
+def _remove_adjectival(word):
+    stem = _remove(word, ADJECTIVE)
+    if stem is None:
+        return None
+    participle = _remove(stem, PARTICIPLE, grouped=True)
+    return stem if participle is None else participle
+
+
+def _step_one(tail):
+    stripped = _remove(tail, PERFECTIVE_GERUND, grouped=True)
+    if stripped is not None:
+        return stripped
+    reflexive = _remove(tail, REFLEXIVE)
+    if reflexive is not None:
+        tail = reflexive
+    for remover in (
+        _remove_adjectival,
+        lambda w: _remove(w, VERB, grouped=True),
+        lambda w: _remove(w, NOUN),
+    ):
+        stripped = remover(tail)
+        if stripped is not None:
+            return stripped
+    return tail
+
+
+def _step_four(tail):
+    if tail.endswith('нн'):
+        return tail[:-1]
+    superlative = _remove(tail, SUPERLATIVE)
+    if superlative is not None:
+        return superlative[:-1] if superlative.endswith('нн') else superlative
+    if tail.endswith('ь'):
+        return tail[:-1]
+    return tail
+
+
+def stem(word):
+    word = word.lower().replace('ё', 'е')
+    rv = next(
+        (i + 1 for i, char in enumerate(word) if char in VOWELS), len(word))
+    r2 = _region_after_vowel_pair(word, _region_after_vowel_pair(word))
+    prefix, tail = word[:rv], word[rv:]
+
+    tail = _step_one(tail)
+    if tail.endswith('и'):
+        tail = tail[:-1]
+    # Словообразовательные окончания отрезаются только в R2.
+    ending = _longest(tail, DERIVATIONAL)
+    if ending and len(prefix) + len(tail) - len(ending) >= r2:
+        tail = tail[:-len(ending)]
+    return prefix + _step_four(tail)
+
+
+def normalize(word):
+    word = word.lower()
+    if CYRILLIC_RE.search(word):
+        word = stem(word)
+    return word[:MAX_TERM_LENGTH]
+
+
+def terms(text):
+    return Counter(normalize(word) for word in WORD_RE.findall(text))
+
+
+def build_search_index(apps, schema_editor):
+    Post = apps.get_model('posts', 'Post')
+    SearchTerm = apps.get_model('posts', 'SearchTerm')
+    for post in Post.objects.only('text').iterator():
+        SearchTerm.objects.bulk_create(
+            SearchTerm(term=term, post_id=post.pk, weight=weight)
+            for term, weight in terms(post.text).items())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0010_post_thumbnail'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchTerm',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(max_length=64)),
+                ('weight', models.PositiveIntegerField(default=1)),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_terms', to='posts.Post')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='searchterm',
+            constraint=models.UniqueConstraint(fields=('term', 'post'), name='unique_search_term'),
+        ),
+        migrations.RunPython(build_search_index, migrations.RunPython.noop),
+    ]
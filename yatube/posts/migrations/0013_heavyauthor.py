@@ -0,0 +1,38 @@
+# Generated by Django 2.2.16 on 2026-10-18 03:58
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+import django.db.models.deletion
+
+# Порог settings.TIMELINE_FANOUT_LIMIT, каким он был при создании модели.
+TIMELINE_FANOUT_LIMIT = 1000
+
+
+def mark_heavy_authors(apps, schema_editor):
+    Follow = apps.get_model('posts', 'Follow')
+    HeavyAuthor = apps.get_model('posts', 'HeavyAuthor')
+    author_ids = Follow.objects.values('author_id').annotate(
+        followers=Count('pk')).filter(
+            followers__gt=TIMELINE_FANOUT_LIMIT).values_list(
+                'author_id', flat=True)
+    HeavyAuthor.objects.bulk_create(
+        HeavyAuthor(author_id=author_id) for author_id in author_ids)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('posts', '0012_post_image_metadata'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HeavyAuthor',
+            fields=[
+                ('author', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='heavy', serialize=False, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.RunPython(mark_heavy_authors, migrations.RunPython.noop),
+    ]
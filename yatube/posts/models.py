@@ -1,10 +1,23 @@
+import json
 
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth import get_user_model
 
 User = get_user_model()
 
 
+class AtomicSaveMixin:
+    """Сохраняет объект в одной транзакции с обработчиками post_save.
+
+    Так счётчики и ленты не расходятся с таблицей, если сохранение или
+    обработчик упали. Удаление Django и так делает в транзакции.
+    """
+
+    def save(self, *args, **kwargs):
+        with transaction.atomic(using=kwargs.get('using')):
+            super().save(*args, **kwargs)
+
+
 class Group(models.Model):
     title = models.CharField(max_length=200)
     slug = models.SlugField(unique=True, max_length=10)
@@ -14,7 +27,7 @@ class Group(models.Model):
         return self.title
 
 
-class Post(models.Model):
+class Post(AtomicSaveMixin, models.Model):
     text = models.TextField()
     pub_date = models.DateTimeField(auto_now_add=True)
     group = models.ForeignKey(
@@ -35,17 +48,42 @@ class Post(models.Model):
         upload_to='posts/',
         blank=True
     )
+    thumbnail = models.CharField(
+        'Миниатюра для ленты',
+        max_length=255,
+        blank=True,
+        editable=False,
+    )
+    image_width = models.PositiveIntegerField(
+        'Ширина картинки', null=True, blank=True, editable=False)
+    image_height = models.PositiveIntegerField(
+        'Высота картинки', null=True, blank=True, editable=False)
+    image_variants = models.TextField(
+        'Версии картинки (JSON)',
+        blank=True,
+        editable=False,
+    )
 
     class Meta:
         ordering = ('-pub_date',)
         verbose_name = 'Пост'
         verbose_name_plural = 'Посты'
+        indexes = (
+            models.Index(fields=('-pub_date', '-id')),
+            models.Index(fields=('author', '-pub_date')),
+            models.Index(fields=('group', '-pub_date')),
+        )
 
     def __str__(self):
         return self.text[:15]
 
+    @property
+    def image_versions(self):
+        """Обработанные копии картинки: формат -> url, размеры, вес."""
+        return json.loads(self.image_variants) if self.image_variants else {}
+
 
-class Comment(models.Model):
+class Comment(AtomicSaveMixin, models.Model):
     post = models.ForeignKey(
         Post,
         on_delete=models.CASCADE,
@@ -59,11 +97,16 @@ class Comment(models.Model):
     text = models.TextField()
     created = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = (
+            models.Index(fields=('post', '-created')),
+        )
+
     def __str__(self):
         return self.text
 
 
-class Follow(models.Model):
+class Follow(AtomicSaveMixin, models.Model):
     user = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
@@ -72,3 +115,81 @@ class Follow(models.Model):
         User,
         on_delete=models.CASCADE,
         related_name='following')
+
+    class Meta:
+        constraints = (
+            models.UniqueConstraint(
+                fields=('user', 'author'),
+                name='unique_follow'),
+            models.CheckConstraint(
+                check=~models.Q(user=models.F('author')),
+                name='no_self_follow'),
+        )
+
+
+class TimelineEntry(models.Model):
+    """Пост в материализованной ленте подписок пользователя."""
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='timeline')
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries')
+    pub_date = models.DateTimeField()
+
+    class Meta:
+        ordering = ('-pub_date',)
+        indexes = (
+            models.Index(fields=('user', '-pub_date')),
+        )
+        constraints = (
+            models.UniqueConstraint(
+                fields=('user', 'post'),
+                name='unique_timeline_entry'),
+        )
+
+
+class HeavyAuthor(models.Model):
+    """Автор, у которого подписчиков больше TIMELINE_FANOUT_LIMIT.
+
+    Его посты не раскладываются по лентам, а добираются при чтении.
+    """
+    author = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='heavy')
+
+    def __str__(self):
+        return str(self.author_id)
+
+
+class Counter(models.Model):
+    """Денормализованный счётчик: число постов, комментариев, подписчиков."""
+    name = models.CharField(max_length=64, unique=True)
+    value = models.IntegerField(default=0)
+
+    def __str__(self):
+        return f'{self.name}={self.value}'
+
+
+class SearchTerm(models.Model):
+    """Запись обратного индекса: основа слова и пост, где она встречается."""
+    term = models.CharField(max_length=64)
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='search_terms')
+    weight = models.PositiveIntegerField(default=1)
+
+    class Meta:
+        constraints = (
+            models.UniqueConstraint(
+                fields=('term', 'post'),
+                name='unique_search_term'),
+        )
+
+    def __str__(self):
+        return self.term
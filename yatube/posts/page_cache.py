@@ -0,0 +1,85 @@
+"""Кэш целых страниц для анонимных пользователей.
+
+Ответ хранится под ключом адреса страницы вместе с версией ленты, при
+которой он построен. Когда версия сменилась или истёк срок
+ANON_PAGE_CACHE_TIMEOUT, страницу перестраивает только запрос, взявший
+блокировку, а остальные в это время получают устаревшую копию
+(stale-while-revalidate). Если копии ещё нет, блокировку тоже берёт
+один запрос, а остальные до ANON_PAGE_CACHE_WAIT секунд ждут, пока
+страница появится в кэше. Так ни истечение кэша, ни холодный старт не
+приводят к тому, что все одновременные запросы рендерят страницу заново.
+"""
+import hashlib
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .conditional import feed_version
+
+PAGE_KEY = 'page:{}'
+LOCK_KEY = 'page-lock:{}'
+LOCK_TIMEOUT = 30
+POLL_INTERVAL = 0.05
+# Устаревшая копия никогда не совпадёт с ETag актуальной страницы.
+STALE_ETAG = 'W/"stale"'
+
+
+def page_key(request):
+    return hashlib.md5(request.get_full_path().encode()).hexdigest()
+
+
+def wait_for_page(key, version):
+    """Ждёт, пока запрос с блокировкой положит страницу в кэш."""
+    deadline = time.monotonic() + settings.ANON_PAGE_CACHE_WAIT
+    while time.monotonic() < deadline:
+        time.sleep(POLL_INTERVAL)
+        entry = cache.get(PAGE_KEY.format(key))
+        if entry is not None and entry[0] == version:
+            return entry[2]
+    return None
+
+
+def page_without_lock(entry, key, version):
+    """Ответ, пока страницу строит другой запрос, или None."""
+    if entry is not None:
+        response = entry[2]
+        response['ETag'] = STALE_ETAG
+        return response
+    return wait_for_page(key, version)
+
+
+def anonymous_page_cache(version_func):
+    def decorator(view_func):
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            timeout = settings.ANON_PAGE_CACHE_TIMEOUT
+            if (not timeout or request.method != 'GET'
+                    or request.user.is_authenticated):
+                return view_func(request, *args, **kwargs)
+            version = feed_version(request, version_func, *args, **kwargs)
+            key = page_key(request)
+            entry = cache.get(PAGE_KEY.format(key))
+            if entry is not None:
+                entry_version, expires_at, response = entry
+                if entry_version == version and expires_at > time.time():
+                    return response
+            if not cache.add(LOCK_KEY.format(key), 1, LOCK_TIMEOUT):
+                response = page_without_lock(entry, key, version)
+                if response is not None:
+                    return response
+                # Не дождались: строим страницу сами, блокировка не наша.
+                return view_func(request, *args, **kwargs)
+            try:
+                response = view_func(request, *args, **kwargs)
+                if response.status_code == 200 and not response.cookies:
+                    cache.set(
+                        PAGE_KEY.format(key),
+                        (version, time.time() + timeout, response),
+                        timeout + settings.ANON_PAGE_CACHE_STALE)
+                return response
+            finally:
+                cache.delete(LOCK_KEY.format(key))
+        return wrapper
+    return decorator
@@ -0,0 +1,187 @@
+import base64
+import collections.abc
+import datetime
+
+from django.core.exceptions import FieldDoesNotExist
+from django.core.paginator import Paginator
+from django.db.models import DateField, Q
+from django.utils.dateparse import parse_datetime
+from django.utils.functional import cached_property
+
+
+def encode_cursor(value, pk):
+    """Кодирует позицию (дата или число, id) в непрозрачный токен для URL."""
+    if hasattr(value, 'isoformat'):
+        value = value.isoformat()
+    raw = f'{value}|{pk}'.encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """Разбирает токен курсора, для битого токена возвращает None."""
+    if not token:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        raw_value, pk = raw.decode().split('|')
+        value = parse_datetime(raw_value)
+        if value is None:
+            value = int(raw_value)
+        pk = int(pk)
+    except (ValueError, UnicodeDecodeError):
+        return None
+    return value, pk
+
+
+ELLIPSIS = None
+
+
+def elided_page_range(number, num_pages, on_each_side=2, on_ends=1):
+    """Номера страниц вокруг текущей и по краям, пропуски — ELLIPSIS.
+
+    Длина списка не зависит от общего числа страниц.
+    """
+    window = range(max(number - on_each_side, 1),
+                   min(number + on_each_side, num_pages) + 1)
+    head = range(1, min(on_ends, num_pages) + 1)
+    tail = range(max(num_pages - on_ends + 1, 1), num_pages + 1)
+    pages = []
+    for part in (head, window, tail):
+        for page in part:
+            if pages and page <= pages[-1]:
+                continue
+            if pages and page > pages[-1] + 1:
+                # Пропуск в одну страницу показываем номером, а не «…».
+                if page == pages[-1] + 2:
+                    pages.append(page - 1)
+                else:
+                    pages.append(ELLIPSIS)
+            pages.append(page)
+    return pages
+
+
+class WindowedPaginator(Paginator):
+    """Paginator, который отдаёт в шаблон только окно номеров страниц."""
+
+    def get_elided_page_range(self, number=1, on_each_side=2, on_ends=1):
+        number = self.validate_number(number)
+        return elided_page_range(number, self.num_pages, on_each_side, on_ends)
+
+
+class CountedPaginator(WindowedPaginator):
+    """Paginator с заранее известным числом записей вместо COUNT(*)."""
+
+    def __init__(self, object_list, per_page, count, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self._count = count
+
+    @cached_property
+    def count(self):
+        return self._count
+
+
+class CursorPage(collections.abc.Sequence):
+    is_cursor = True
+
+    def __init__(self, object_list, paginator, has_next, has_previous):
+        self.object_list = object_list
+        self.paginator = paginator
+        self.field = paginator.field
+        self._has_next = has_next
+        self._has_previous = has_previous
+
+    def __repr__(self):
+        return f'<CursorPage {self.previous_cursor}:{self.next_cursor}>'
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+    def has_other_pages(self):
+        return self._has_next or self._has_previous
+
+    def _cursor(self, obj):
+        # Строки values() — словари, в них должны быть поле и id.
+        if isinstance(obj, dict):
+            return encode_cursor(obj[self.field], obj['id'])
+        return encode_cursor(getattr(obj, self.field), obj.pk)
+
+    @property
+    def next_cursor(self):
+        if not self._has_next or not self.object_list:
+            return None
+        return self._cursor(self.object_list[-1])
+
+    @property
+    def previous_cursor(self):
+        if not self._has_previous or not self.object_list:
+            return None
+        return self._cursor(self.object_list[0])
+
+
+class CursorPaginator:
+    """Пагинация по ключу (field, id) вместо OFFSET.
+
+    Стоимость любой страницы одинакова, запрос COUNT(*) не выполняется.
+    Страницы идут от новых записей к старым.
+    """
+    is_cursor = True
+
+    def __init__(self, object_list, per_page, field='pub_date'):
+        self.object_list = object_list
+        self.per_page = int(per_page)
+        self.field = field
+
+    @cached_property
+    def is_date_field(self):
+        try:
+            field = self.object_list.model._meta.get_field(self.field)
+        except FieldDoesNotExist:
+            # Аннотация, например score у поиска, — число.
+            return False
+        return isinstance(field, DateField)
+
+    def decode(self, token):
+        """Курсор этого paginator; чужой или битый — None."""
+        cursor = decode_cursor(token)
+        if cursor is None:
+            return None
+        is_date = isinstance(cursor[0], datetime.date)
+        return cursor if is_date == self.is_date_field else None
+
+    def get_page(self, after=None, before=None):
+        after = self.decode(after)
+        before = None if after else self.decode(before)
+        queryset = self.object_list
+        field = self.field
+        if after:
+            value, pk = after
+            queryset = queryset.filter(
+                Q(**{f'{field}__lt': value})
+                | Q(**{field: value, 'pk__lt': pk})
+            ).order_by(f'-{field}', '-pk')
+        elif before:
+            value, pk = before
+            queryset = queryset.filter(
+                Q(**{f'{field}__gt': value})
+                | Q(**{field: value, 'pk__gt': pk})
+            ).order_by(field, 'pk')
+        else:
+            queryset = queryset.order_by(f'-{field}', '-pk')
+        posts = list(queryset[:self.per_page + 1])
+        has_more = len(posts) > self.per_page
+        posts = posts[:self.per_page]
+        if before:
+            posts.reverse()
+            return CursorPage(posts, self, has_next=True,
+                              has_previous=has_more)
+        return CursorPage(posts, self, has_next=has_more,
+                          has_previous=after is not None)
@@ -0,0 +1,90 @@
+"""Полнотекстовый поиск по постам на обратном индексе SearchTerm.
+
+Текст разбивается на слова, русские слова приводятся к основе
+стеммером Snowball. Индекс поста перестраивается сигналом при
+сохранении, релевантность считается как сумма tf * idf совпавших основ.
+"""
+import math
+import re
+from collections import Counter
+
+from django.db.models import Case, Count, F, IntegerField, Sum, Value, When
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+from . import counters
+from .models import Post, SearchTerm
+from .stemmer import stem
+
+WORD_RE = re.compile(r'\w+')
+CYRILLIC_RE = re.compile(r'[а-яё]')
+MAX_TERM_LENGTH = 64
+
+
+def normalize(word):
+    word = word.lower()
+    if CYRILLIC_RE.search(word):
+        word = stem(word)
+    return word[:MAX_TERM_LENGTH]
+
+
+def terms(text):
+    """Частоты основ слов текста."""
+    return Counter(normalize(word) for word in WORD_RE.findall(text))
+
+
+def index_post(post):
+    index_posts([(post.pk, post.text)])
+
+
+def index_posts(posts):
+    """Переиндексирует пачку постов (пар id, текст) одним DELETE и INSERT."""
+    posts = list(posts)
+    SearchTerm.objects.filter(post_id__in=[pk for pk, _ in posts]).delete()
+    SearchTerm.objects.bulk_create(
+        SearchTerm(term=term, post_id=pk, weight=weight)
+        for pk, text in posts for term, weight in terms(text).items())
+
+
+def search_posts(query):
+    """Посты, где встречается хотя бы одно слово запроса.
+
+    В queryset добавлено поле score — релевантность.
+    """
+    query_terms = set(terms(query))
+    if not query_terms:
+        return Post.objects.annotate(
+            score=Value(0, output_field=IntegerField())).none()
+    total = counters.get_count(counters.POSTS, Post.objects.all())
+    frequencies = dict(
+        SearchTerm.objects.filter(term__in=query_terms)
+        .values_list('term').annotate(Count('pk')).order_by())
+    score = Sum(Case(
+        *(When(search_terms__term=term,
+               then=F('search_terms__weight') * idf(total, frequency))
+          for term, frequency in frequencies.items()),
+        default=0,
+        output_field=IntegerField(),
+    ))
+    return Post.objects.filter(
+        search_terms__term__in=query_terms
+    ).annotate(score=score).select_related('author', 'group')
+
+
+def idf(total, frequency):
+    """Вес редкости слова, целое число не меньше 1."""
+    return max(1, int(100 * math.log((total + 1) / (frequency + 0.5))))
+
+
+def highlight(text, query):
+    """Экранирует text и выделяет <mark> слова, совпавшие с запросом."""
+    query_terms = set(terms(query))
+    parts = []
+    position = 0
+    for match in WORD_RE.finditer(text):
+        if normalize(match.group()) in query_terms:
+            parts.append(escape(text[position:match.start()]))
+            parts.append(f'<mark>{escape(match.group())}</mark>')
+            position = match.end()
+    parts.append(escape(text[position:]))
+    return mark_safe(''.join(parts))
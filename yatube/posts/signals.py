@@ -0,0 +1,112 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from . import cache_versions, counters, images, search, thumbnails, timeline
+from .models import Comment, Follow, Group, Post
+
+
+@receiver(post_save, sender=Post)
+def post_fan_out(sender, instance, created, **kwargs):
+    if created:
+        timeline.fan_out(instance)
+
+
+@receiver(post_save, sender=Follow)
+def follow_backfill(sender, instance, created, **kwargs):
+    if created:
+        timeline.followers_changed(instance.author_id, 1)
+        timeline.backfill(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def unfollow_purge(sender, instance, **kwargs):
+    timeline.purge(instance.user_id, instance.author_id)
+    timeline.followers_changed(instance.author_id, -1)
+
+
+@receiver(pre_save, sender=Post)
+def post_remember_saved(sender, instance, **kwargs):
+    saved = None
+    if instance.pk:
+        saved = Post.objects.filter(pk=instance.pk).values_list(
+            'group_id', 'image').first()
+    if saved is None:
+        instance._image_changed = bool(instance.image)
+        return
+    instance._saved_group_id, saved_image = saved
+    instance._image_changed = instance.image.name != saved_image
+    if instance._image_changed:
+        images.reset(instance)
+
+
+@receiver(post_save, sender=Post)
+def post_count(sender, instance, created, **kwargs):
+    if created:
+        for key in counters.post_keys(instance):
+            counters.incr(key)
+        return
+    saved_group_id = getattr(instance, '_saved_group_id', None)
+    if saved_group_id != instance.group_id:
+        if saved_group_id:
+            counters.incr(counters.group_key(saved_group_id), -1)
+        if instance.group_id:
+            counters.incr(counters.group_key(instance.group_id))
+
+
+@receiver(post_delete, sender=Post)
+def post_uncount(sender, instance, **kwargs):
+    for key in counters.post_keys(instance):
+        counters.incr(key, -1)
+    counters.drop(counters.comments_key(instance.pk))
+
+
+@receiver(post_save, sender=Comment)
+def comment_count(sender, instance, created, **kwargs):
+    if created:
+        counters.incr(counters.comments_key(instance.post_id))
+
+
+@receiver(post_delete, sender=Comment)
+def comment_uncount(sender, instance, **kwargs):
+    counters.incr(counters.comments_key(instance.post_id), -1)
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def post_bump_versions(sender, instance, **kwargs):
+    names = cache_versions.post_keys(instance)
+    saved_group_id = getattr(instance, '_saved_group_id', None)
+    if saved_group_id and saved_group_id != instance.group_id:
+        names.append(cache_versions.group_key(saved_group_id))
+    cache_versions.bump(*names)
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def follow_bump_versions(sender, instance, **kwargs):
+    cache_versions.bump(cache_versions.follow_key(instance.user_id))
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def comment_bump_versions(sender, instance, **kwargs):
+    cache_versions.bump(cache_versions.comments_key(instance.post_id))
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def group_bump_versions(sender, instance, **kwargs):
+    cache_versions.bump(cache_versions.GROUPS,
+                        cache_versions.group_key(instance.pk))
+
+
+@receiver(post_save, sender=Post)
+def post_index(sender, instance, **kwargs):
+    search.index_post(instance)
+
+
+@receiver(post_save, sender=Post)
+def post_thumbnail(sender, instance, **kwargs):
+    # Откуда бы ни пришла картинка: форма, админка или код.
+    if getattr(instance, '_image_changed', False):
+        thumbnails.schedule(instance)
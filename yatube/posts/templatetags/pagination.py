@@ -0,0 +1,16 @@
+from django import template
+
+from posts.paginators import elided_page_range
+
+register = template.Library()
+
+
+@register.simple_tag
+def page_window(page_obj, on_each_side=2, on_ends=1):
+    """Окно номеров страниц вокруг текущей; None на месте пропуска."""
+    paginator = page_obj.paginator
+    if hasattr(paginator, 'get_elided_page_range'):
+        return paginator.get_elided_page_range(
+            page_obj.number, on_each_side, on_ends)
+    return elided_page_range(
+        page_obj.number, paginator.num_pages, on_each_side, on_ends)
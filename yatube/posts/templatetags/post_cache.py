@@ -0,0 +1,11 @@
+from django import template
+
+from posts import cache_versions
+
+register = template.Library()
+
+
+@register.filter
+def post_version(post):
+    """Версия поста для ключа {% cache %}."""
+    return cache_versions.get_version(cache_versions.post_key(post.pk))
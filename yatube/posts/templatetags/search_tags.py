@@ -0,0 +1,11 @@
+from django import template
+
+from posts import search
+
+register = template.Library()
+
+
+@register.filter
+def highlight(text, query):
+    """Выделяет в тексте слова из поискового запроса."""
+    return search.highlight(text, query)
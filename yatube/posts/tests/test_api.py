@@ -0,0 +1,106 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..api import API_PAGE_SIZE
+from ..models import Comment, Follow, Group, Post
+from ..paginators import encode_cursor
+
+User = get_user_model()
+
+
+class ApiTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='HasNoName')
+        cls.author = User.objects.create_user(username='Author')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        for i in range(API_PAGE_SIZE + 5):
+            Post.objects.create(author=cls.author, group=cls.group,
+                                text=f'Тестовый пост {i}')
+        cls.post = Post.objects.latest('pub_date', 'pk')
+        Comment.objects.create(post=cls.post, author=cls.user,
+                               text='Комментарий')
+        Follow.objects.create(user=cls.user, author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+
+    def get(self, name, kwargs=None, **params):
+        return self.client.get(reverse(f'api:{name}', kwargs=kwargs), params)
+
+    def test_posts_cursor_pagination(self):
+        first = self.get('posts').json()
+        self.assertEqual(len(first['results']), API_PAGE_SIZE)
+        self.assertEqual(first['results'][0]['id'], self.post.pk)
+        second = self.get('posts', after=first['next']).json()
+        self.assertEqual(len(second['results']), 5)
+        self.assertIsNone(second['next'])
+        ids = [row['id'] for row in first['results'] + second['results']]
+        self.assertEqual(len(set(ids)), Post.objects.count())
+
+    def test_cursor_of_wrong_type_returns_first_page(self):
+        response = self.get('posts', after=encode_cursor(5, 1))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['results'][0]['id'], self.post.pk)
+
+    def test_sparse_fields(self):
+        data = self.get('posts', fields='id,author').json()
+        self.assertEqual(data['results'][0],
+                         {'id': self.post.pk, 'author': 'Author'})
+        response = self.get('posts', fields='id,password')
+        self.assertEqual(response.status_code, 400)
+
+    def test_resources(self):
+        self.assertEqual(
+            self.get('post', {'post_id': self.post.pk}).json()['group'],
+            'test-slug')
+        self.assertEqual(
+            self.get('comments', {'post_id': self.post.pk}).json()
+            ['results'][0]['text'], 'Комментарий')
+        self.assertEqual(self.get('groups').json()['results'][0]['slug'],
+                         'test-slug')
+        self.assertEqual(
+            len(self.get('group_posts', {'slug': 'test-slug'}).json()
+                ['results']), API_PAGE_SIZE)
+        self.assertEqual(
+            self.get('profile', {'username': 'Author'}).json()
+            ['posts_count'], API_PAGE_SIZE + 5)
+        self.assertEqual(
+            self.get('post', {'post_id': 0}).status_code, 404)
+        self.assertEqual(
+            self.get('group_posts', {'slug': 'missing'}).status_code, 404)
+
+    def test_follow_requires_login(self):
+        self.assertEqual(self.get('follow').status_code, 401)
+        self.client.force_login(self.user)
+        data = self.get('follow').json()
+        self.assertEqual(data['results'][0]['id'], self.post.pk)
+
+    def test_conditional_get(self):
+        response = self.get('posts')
+        etag = response['ETag']
+        self.assertIn('Last-Modified', response)
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('api:posts'),
+                                       HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        Post.objects.create(author=self.author, text='Новый пост')
+        response = self.client.get(reverse('api:posts'),
+                                   HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_comment_changes_etag(self):
+        url = reverse('api:comments', kwargs={'post_id': self.post.pk})
+        etag = self.client.get(url)['ETag']
+        Comment.objects.create(post=self.post, author=self.user,
+                               text='Ещё комментарий')
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
@@ -0,0 +1,76 @@
+import json
+import os
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+
+from .. import benchmark
+from ..models import Comment, Follow, Post, TimelineEntry
+
+
+class BenchmarkTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        call_command('seed_benchmark', users=20, posts=60, groups=3,
+                     follows_per_user=3, comments=40, allow_write=True,
+                     stdout=StringIO())
+
+    def setUp(self):
+        handle, self.path = tempfile.mkstemp(suffix='.json')
+        os.close(handle)
+
+    def tearDown(self):
+        os.remove(self.path)
+
+    def test_seed_creates_dataset(self):
+        self.assertEqual(Post.objects.count(), 60)
+        self.assertEqual(Comment.objects.count(), 40)
+        self.assertTrue(Follow.objects.exists())
+        self.assertTrue(TimelineEntry.objects.exists())
+        self.assertGreater(
+            len(set(Post.objects.values_list('pub_date', flat=True))), 1)
+
+    def test_seed_requires_explicit_flag(self):
+        with self.assertRaises(CommandError):
+            call_command('seed_benchmark', users=1, posts=1,
+                         stdout=StringIO())
+        self.assertEqual(Post.objects.count(), 60)
+
+    def test_seed_follows_builds_weights_once(self):
+        user_ids = list(range(1, 51))
+        with mock.patch.object(benchmark, 'zipf_weights',
+                               wraps=benchmark.zipf_weights) as weights, \
+                mock.patch.object(Follow.objects, 'bulk_create'):
+            benchmark.seed_follows(user_ids, 3)
+        weights.assert_called_once_with(len(user_ids))
+
+    def test_benchmark_saves_results(self):
+        call_command('benchmark', requests=3, memory=True,
+                     output=self.path, stdout=StringIO())
+        with open(self.path, encoding='utf-8') as source:
+            results = json.load(source)
+        self.assertEqual(
+            set(results['scenarios']), set(benchmark.SCENARIOS))
+        for result in results['scenarios'].values():
+            self.assertLessEqual(result['p50_ms'], result['p99_ms'])
+            self.assertGreater(result['queries_mean'], 0)
+            self.assertIn('memory_peak_kb_mean', result)
+
+    def test_baseline_regression(self):
+        baseline = {'scenarios': {'index': {'p95_ms': 0.001}}}
+        benchmark.save(baseline, self.path)
+        with self.assertRaises(CommandError):
+            call_command('benchmark', requests=2, scenario=['index'],
+                         baseline=self.path, stdout=StringIO(),
+                         stderr=StringIO())
+
+    def test_percentile(self):
+        values = list(range(1, 101))
+        self.assertEqual(benchmark.percentile(values, 0.5), 50)
+        self.assertEqual(benchmark.percentile(values, 0.99), 99)
+        self.assertEqual(benchmark.percentile([7], 0.95), 7)
@@ -0,0 +1,158 @@
+import os
+import shutil
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from .. import bulk, counters, search
+from ..models import Comment, Counter, Follow, Group, Post, TimelineEntry
+
+User = get_user_model()
+
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+TEMP_DIR = tempfile.mkdtemp(dir=settings.BASE_DIR)
+TEMP_MEDIA_ROOT = os.path.join(TEMP_DIR, 'media')
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class BulkTransferTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='HasNoName')
+        cls.author = User.objects.create_user(username='Author')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        # Файла картинки нет в хранилище, миниатюра не нужна.
+        with mock.patch('posts.thumbnails.schedule'):
+            cls.post = Post.objects.create(
+                author=cls.author, group=cls.group, text='Пост с картинкой',
+                image='posts/small.gif')
+        Post.objects.create(author=cls.author, text='Пост без группы')
+        Comment.objects.create(post=cls.post, author=cls.user,
+                               text='Комментарий')
+        Follow.objects.create(user=cls.user, author=cls.author)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_DIR, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+
+    def path(self, name):
+        return os.path.join(TEMP_DIR, name)
+
+    def export(self, fmt='ndjson'):
+        for name in bulk.MODELS:
+            call_command('export_data', name, format=fmt,
+                         output=self.path(f'{name}.{fmt}'),
+                         stderr=StringIO())
+
+    def wipe(self):
+        for model in (Follow, Comment, Post, Group):
+            model.objects.all().delete()
+        User.objects.exclude(pk=self.user.pk).delete()
+
+    def load(self, fmt='ndjson', **options):
+        for name in bulk.MODELS:
+            call_command('import_data', name, self.path(f'{name}.{fmt}'),
+                         format=fmt, stdout=StringIO(), **options)
+
+    def test_round_trip(self):
+        for fmt in bulk.FORMATS:
+            with self.subTest(fmt=fmt):
+                self.export(fmt)
+                self.wipe()
+                self.load(fmt)
+                post = Post.objects.get(pk=self.post.pk)
+                self.assertEqual(post.text, 'Пост с картинкой')
+                self.assertEqual(post.pub_date, self.post.pub_date)
+                self.assertEqual(post.group.slug, 'test-slug')
+                self.assertEqual(post.author.username, 'Author')
+                self.assertEqual(Post.objects.count(), 2)
+                self.assertEqual(post.comments.get().text, 'Комментарий')
+                self.assertTrue(Follow.objects.filter(
+                    user=self.user, author__username='Author').exists())
+                self.assertTrue(TimelineEntry.objects.filter(
+                    user=self.user, post=post).exists())
+                self.assertEqual(Counter.objects.get(
+                    name=f'posts:author:{post.author_id}').value, 2)
+
+    def test_import_updates_only_touched_rows(self):
+        self.export()
+        self.wipe()
+        other = User.objects.create_user(username='Other')
+        Post.objects.create(author=other, text='Чужой пост')
+        untouched = counters.author_key(other.pk)
+        Counter.objects.filter(name=untouched).update(value=7)
+        for name in ('groups', 'posts'):
+            call_command('import_data', name, self.path(f'{name}.ndjson'),
+                         stdout=StringIO())
+        author = User.objects.get(username='Author')
+        self.assertEqual(Counter.objects.get(
+            name=counters.author_key(author.pk)).value, 2)
+        self.assertEqual(Counter.objects.get(name=counters.POSTS).value, 3)
+        self.assertEqual(Counter.objects.get(name=untouched).value, 7)
+        self.assertEqual(
+            list(search.search_posts('картинкой').values_list(
+                'pk', flat=True)), [self.post.pk])
+
+    def test_checkpoint_resumes(self):
+        self.export()
+        self.wipe()
+        call_command('import_data', 'groups', self.path('groups.ndjson'),
+                     stdout=StringIO())
+        checkpoint = self.path('posts.checkpoint')
+        with open(checkpoint, 'w') as output:
+            output.write('1')
+        call_command('import_data', 'posts', self.path('posts.ndjson'),
+                     checkpoint=checkpoint, batch_size=1,
+                     skip_rebuild=True, stdout=StringIO())
+        self.assertEqual(Post.objects.count(), 1)
+        with open(checkpoint) as source:
+            self.assertEqual(source.read(), '2')
+
+    def test_images_copied(self):
+        source = self.path('source')
+        os.makedirs(os.path.join(source, 'posts'))
+        with open(os.path.join(source, 'posts', 'small.gif'), 'wb') as f:
+            f.write(SMALL_GIF)
+        self.export()
+        self.wipe()
+        call_command('import_data', 'posts', self.path('posts.ndjson'),
+                     media_source=source, skip_rebuild=True,
+                     stdout=StringIO())
+        self.assertTrue(os.path.exists(
+            os.path.join(TEMP_MEDIA_ROOT, 'posts', 'small.gif')))
+
+    @override_settings(MEDIA_ROOT=os.path.join(TEMP_DIR, 'thumbnails'))
+    def test_imported_posts_get_thumbnails(self):
+        source = self.path('source')
+        os.makedirs(os.path.join(source, 'posts'), exist_ok=True)
+        with open(os.path.join(source, 'posts', 'small.gif'), 'wb') as f:
+            f.write(SMALL_GIF)
+        self.export()
+        self.wipe()
+        call_command('import_data', 'posts', self.path('posts.ndjson'),
+                     media_source=source, skip_rebuild=True,
+                     stdout=StringIO())
+        self.assertTrue(Post.objects.get(pk=self.post.pk).thumbnail)
@@ -0,0 +1,130 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import (Client, TestCase, TransactionTestCase,
+                         override_settings)
+from django.urls import reverse
+
+from .. import comment_queue, counters
+from ..models import Comment, Post
+
+User = get_user_model()
+
+
+@override_settings(COMMENT_WRITE_BEHIND=True, COMMENT_FLUSH_INTERVAL=0)
+@mock.patch('posts.comment_queue.start_writer')
+class CommentQueueTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='HasNoName')
+        cls.reader = User.objects.create_user(username='Reader')
+        cls.post = Post.objects.create(author=cls.user, text='Пост')
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+        self.detail_url = reverse(
+            'posts:post_detail', kwargs={'post_id': self.post.pk})
+
+    def tearDown(self):
+        while comment_queue.flush():
+            pass
+
+    def add_comment(self, text):
+        return self.authorized_client.post(
+            reverse('posts:add_comment', kwargs={'post_id': self.post.pk}),
+            {'text': text})
+
+    def comment_texts(self, client):
+        response = client.get(self.detail_url)
+        return [comment.text for comment in response.context['comments']]
+
+    def test_comment_is_queued_and_visible_to_author(self, start_writer):
+        self.add_comment('Первый')
+        self.add_comment('Второй')
+        start_writer.assert_called()
+        self.assertFalse(Comment.objects.exists())
+        self.assertEqual(self.comment_texts(self.authorized_client),
+                         ['Второй', 'Первый'])
+        self.assertEqual(self.comment_texts(self.reader_client), [])
+
+    def test_flush_writes_one_batch(self, start_writer):
+        counters.get_count(counters.comments_key(self.post.pk),
+                           self.post.comments.all())
+        for number in range(3):
+            self.add_comment(f'Комментарий {number}')
+        with self.assertNumQueries(5):
+            self.assertEqual(comment_queue.flush(), 3)
+        self.assertEqual(Comment.objects.count(), 3)
+        self.assertEqual(
+            counters.get_count(counters.comments_key(self.post.pk),
+                               Comment.objects.none()), 3)
+        # После записи комментарии не задваиваются.
+        self.assertEqual(len(self.comment_texts(self.authorized_client)), 3)
+        self.assertEqual(len(self.comment_texts(self.reader_client)), 3)
+
+    def test_batch_size_bound(self, start_writer):
+        for number in range(3):
+            self.add_comment(f'Комментарий {number}')
+        with override_settings(COMMENT_BATCH_SIZE=2):
+            self.assertEqual(comment_queue.flush(), 2)
+            self.assertEqual(comment_queue.flush(), 1)
+
+    def test_shutdown_drains_queue(self, start_writer):
+        self.add_comment('Перед остановкой')
+        comment_queue.shutdown()
+        self.assertTrue(Comment.objects.filter(
+            text='Перед остановкой').exists())
+
+    def test_deleted_post_does_not_lose_batch(self, start_writer):
+        other = Post.objects.create(author=self.user, text='Другой пост')
+        self.add_comment('Останется')
+        self.authorized_client.post(
+            reverse('posts:add_comment', kwargs={'post_id': other.pk}),
+            {'text': 'Пропадёт'})
+        other.delete()
+        comment_queue.flush()
+        self.assertEqual(
+            list(Comment.objects.values_list('text', flat=True)),
+            ['Останется'])
+
+
+@override_settings(COMMENT_WRITE_BEHIND=True, COMMENT_FLUSH_INTERVAL=0.01)
+class CommentWriterTest(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='HasNoName')
+        self.post = Post.objects.create(author=self.user, text='Пост')
+        self.client.force_login(self.user)
+
+    def tearDown(self):
+        comment_queue.shutdown()
+
+    def test_writer_thread_writes_queued_comments(self):
+        for number in range(3):
+            self.client.post(
+                reverse('posts:add_comment', kwargs={'post_id': self.post.pk}),
+                {'text': f'Комментарий {number}'})
+        self.assertTrue(comment_queue._writer.is_alive())
+        comment_queue.wait()
+        self.assertEqual(Comment.objects.filter(post=self.post).count(), 3)
+        # Записанные комментарии не задваиваются с ожидающими.
+        response = self.client.get(
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk}))
+        self.assertEqual(len(response.context['comments']), 3)
+
+    def test_uwsgi_atexit_drains_queue(self):
+        previous = mock.Mock()
+        fake_uwsgi = mock.Mock(atexit=previous)
+        with mock.patch.object(comment_queue, 'uwsgi', fake_uwsgi), \
+                mock.patch.object(comment_queue, 'shutdown') as shutdown:
+            comment_queue.register_shutdown()
+            comment_queue.register_shutdown()
+            fake_uwsgi.atexit()
+        shutdown.assert_called_once_with()
+        previous.assert_called_once_with()
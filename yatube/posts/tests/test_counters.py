@@ -0,0 +1,124 @@
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from .. import counters
+from ..models import Comment, Counter, Group, Post
+
+User = get_user_model()
+
+
+class CountersTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='HasNoName')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        cls.group_2 = Group.objects.create(
+            title='Тестовая группа 2',
+            slug='test-slug2',
+            description='Тестовое описание 2',
+        )
+
+    def setUp(self):
+        self.guest_client = Client()
+        cache.clear()
+        for name in (counters.POSTS,
+                     counters.author_key(self.user.pk),
+                     counters.group_key(self.group.pk),
+                     counters.group_key(self.group_2.pk)):
+            counters.get_count(name, Post.objects.none())
+
+    def value(self, name):
+        return Counter.objects.get(name=name).value
+
+    def test_post_create_edit_delete_moves_counters(self):
+        post = Post.objects.create(
+            author=self.user, text='Тестовый пост', group=self.group)
+        self.assertEqual(self.value(counters.POSTS), 1)
+        self.assertEqual(self.value(counters.author_key(self.user.pk)), 1)
+        self.assertEqual(self.value(counters.group_key(self.group.pk)), 1)
+
+        post.group = self.group_2
+        post.save()
+        self.assertEqual(self.value(counters.group_key(self.group.pk)), 0)
+        self.assertEqual(self.value(counters.group_key(self.group_2.pk)), 1)
+
+        post.delete()
+        self.assertEqual(self.value(counters.POSTS), 0)
+        self.assertEqual(self.value(counters.group_key(self.group_2.pk)), 0)
+
+    def test_comment_counter(self):
+        post = Post.objects.create(author=self.user, text='Тестовый пост')
+        key = counters.comments_key(post.pk)
+        self.assertEqual(counters.get_count(key, post.comments.all()), 0)
+        comment = Comment.objects.create(
+            post=post, author=self.user, text='Комментарий')
+        self.assertEqual(self.value(key), 1)
+        comment.delete()
+        self.assertEqual(self.value(key), 0)
+
+    def test_missing_counter_created_from_count(self):
+        Post.objects.create(author=self.user, text='Первый')
+        counters.drop(counters.POSTS)
+        Post.objects.create(author=self.user, text='Второй')
+        self.assertEqual(self.value(counters.POSTS), 2)
+
+    def test_incr_adds_to_counter_created_concurrently(self):
+        name = counters.author_key(self.user.pk + 1)
+
+        def racing_source(name):
+            # Параллельная транзакция успела создать строку без нас.
+            Counter.objects.create(name=name, value=5)
+            return Post.objects.none()
+
+        with mock.patch('posts.counters.source', racing_source):
+            counters.incr(name)
+        self.assertEqual(self.value(name), 6)
+
+    def test_failed_save_rolls_back_counters(self):
+        with mock.patch('posts.signals.search.index_post',
+                        side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                Post.objects.create(author=self.user, text='Тестовый пост')
+        self.assertFalse(Post.objects.exists())
+        self.assertEqual(self.value(counters.POSTS), 0)
+
+    def test_index_paginator_takes_count_from_counter(self):
+        Post.objects.create(author=self.user, text='Тестовый пост')
+        Counter.objects.filter(name=counters.POSTS).update(value=25)
+        response = self.guest_client.get(reverse('posts:index'))
+        self.assertEqual(response.context['page_obj'].paginator.count, 25)
+
+    def test_index_renders_window_of_page_links(self):
+        Post.objects.create(author=self.user, text='Тестовый пост')
+        Counter.objects.filter(name=counters.POSTS).update(value=1_000_000)
+        response = self.guest_client.get(
+            reverse('posts:index'), {'page': 50_000})
+        content = response.content.decode()
+        # Первая, предыдущая, 1, четыре соседние, 100000, следующая,
+        # последняя; текущая страница — не ссылка.
+        self.assertEqual(content.count('class="page-link" href="?page='), 10)
+        self.assertIn('?page=49998', content)
+        self.assertIn('?page=100000', content)
+        self.assertNotIn('?page=49997', content)
+        self.assertEqual(content.count('&hellip;'), 2)
+
+    def test_rebuild_counters_command(self):
+        Post.objects.create(author=self.user, text='Тестовый пост')
+        Counter.objects.filter(name=counters.POSTS).update(value=7)
+        out = StringIO()
+        call_command('rebuild_counters', '--verify', stdout=out)
+        self.assertIn('Расхождений: 1', out.getvalue())
+        self.assertEqual(self.value(counters.POSTS), 7)
+        call_command('rebuild_counters', stdout=StringIO())
+        self.assertEqual(self.value(counters.POSTS), 1)
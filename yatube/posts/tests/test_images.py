@@ -0,0 +1,149 @@
+import shutil
+import tempfile
+import unittest
+from io import BytesIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+
+from .. import images
+from ..forms import PostForm
+from ..models import Post
+
+User = get_user_model()
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+HAS_WEBP = any(entry[0] == 'webp' for entry in images.available_formats())
+
+
+def uploaded_image(size=(300, 200), mode='RGB', fmt='JPEG', name='big.jpg',
+                   exif=None):
+    buffer = BytesIO()
+    options = {'exif': exif} if exif else {}
+    Image.new(mode, size, 'red').save(buffer, fmt, **options)
+    return SimpleUploadedFile(
+        name=name, content=buffer.getvalue(),
+        content_type=f'image/{fmt.lower()}')
+
+
+def exif_with_description():
+    exif = Image.Exif()
+    # 0x010E — ImageDescription.
+    exif[0x010E] = 'секрет'
+    return exif.tobytes()
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_ASYNC=False,
+                   IMAGE_MAX_SIZE=100)
+class ImageProcessingTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='HasNoName')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+        cache.clear()
+
+    def create_post(self, image):
+        self.authorized_client.post(
+            reverse('posts:post_create'),
+            data={'text': 'Пост с картинкой', 'image': image},
+        )
+        return Post.objects.get(text='Пост с картинкой')
+
+    def test_master_is_resized_and_metadata_stored(self):
+        post = self.create_post(uploaded_image())
+        self.assertEqual((post.image_width, post.image_height), (100, 67))
+        master = post.image_versions['master']
+        self.assertEqual(master['type'], 'image/jpeg')
+        self.assertTrue(master['name'].startswith(images.MASTER_DIR))
+        self.assertGreater(master['bytes'], 0)
+        with default_storage.open(master['name']) as stored:
+            self.assertEqual(Image.open(stored).size, (100, 67))
+        response = self.client.get(
+            reverse('posts:post_detail', kwargs={'post_id': post.pk}))
+        self.assertContains(response, master['url'])
+
+    def test_exif_is_stripped(self):
+        post = self.create_post(
+            uploaded_image(exif=exif_with_description()))
+        name = post.image_versions['master']['name']
+        with default_storage.open(name) as stored:
+            self.assertFalse(Image.open(stored).getexif())
+
+    def test_transparent_image_kept_as_png(self):
+        post = self.create_post(
+            uploaded_image(mode='RGBA', fmt='PNG', name='alpha.png'))
+        self.assertEqual(post.image_versions['master']['type'], 'image/png')
+
+    @unittest.skipUnless(HAS_WEBP, 'Pillow собран без WebP')
+    def test_webp_variant(self):
+        post = self.create_post(uploaded_image())
+        variant = post.image_versions['webp']
+        self.assertEqual(variant['type'], 'image/webp')
+        with default_storage.open(variant['name']) as stored:
+            self.assertEqual(Image.open(stored).format, 'WEBP')
+
+    @override_settings(IMAGE_KEEP_ORIGINAL=False)
+    def test_original_replaced_by_master(self):
+        post = self.create_post(uploaded_image())
+        master = post.image_versions['master']
+        self.assertEqual(post.image.name, master['name'])
+
+    def test_edit_resets_derived_fields(self):
+        post = self.create_post(uploaded_image())
+        old_master = post.image_versions['master']['name']
+        url = reverse('posts:post_edit', kwargs={'post_id': post.pk})
+        self.authorized_client.post(
+            url, {'text': post.text, 'image-clear': 'on'})
+        post.refresh_from_db()
+        self.assertFalse(post.image)
+        self.assertEqual(post.image_versions, {})
+        self.assertIsNone(post.image_width)
+        self.assertFalse(post.thumbnail)
+        self.assertFalse(default_storage.exists(old_master))
+        response = self.client.get(
+            reverse('posts:post_detail', kwargs={'post_id': post.pk}))
+        self.assertNotContains(response, '<picture>')
+
+    def test_edit_with_new_image_rebuilds_versions(self):
+        post = self.create_post(uploaded_image())
+        old_master = post.image_versions['master']['name']
+        self.authorized_client.post(
+            reverse('posts:post_edit', kwargs={'post_id': post.pk}),
+            {'text': post.text,
+             'image': uploaded_image(size=(50, 80), name='new.jpg')})
+        post.refresh_from_db()
+        self.assertEqual((post.image_width, post.image_height), (50, 80))
+        self.assertNotEqual(post.image_versions['master']['name'],
+                            old_master)
+
+    @override_settings(IMAGE_MAX_PIXELS=1000)
+    def test_process_rejects_too_many_pixels(self):
+        with self.assertLogs('posts.thumbnails', 'ERROR'):
+            post = Post.objects.create(
+                author=self.user, text='Из админки', image=uploaded_image())
+        with self.assertRaises(images.ImageTooLarge):
+            images.process(post)
+        post.refresh_from_db()
+        self.assertEqual(post.image_versions, {})
+
+    @override_settings(IMAGE_MAX_PIXELS=1000)
+    def test_form_rejects_too_many_pixels(self):
+        form = PostForm(data={'text': 'Текст'},
+                        files={'image': uploaded_image()})
+        self.assertFalse(form.is_valid())
+        self.assertIn('image', form.errors)
@@ -0,0 +1,82 @@
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from core.query_budget import (
+    QueryBudgetExceeded, QueryBudgetTestMixin, QueryCounter, counting_queries,
+)
+from .. import views
+from ..models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+class QueryBudgetTest(QueryBudgetTestMixin, TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='HasNoName')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        cls.authors = [User.objects.create_user(username=f'Author{i}')
+                       for i in range(5)]
+        for author in cls.authors:
+            Follow.objects.create(user=cls.user, author=author)
+            Post.objects.create(
+                author=author, text='Тестовый пост', group=cls.group)
+        cls.post = Post.objects.create(
+            author=cls.user, text='Тестовый пост', group=cls.group)
+        Comment.objects.bulk_create(
+            Comment(post=cls.post, author=author, text='Комментарий')
+            for author in cls.authors)
+        call_command('rebuild_counters', stdout=StringIO())
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+        cache.clear()
+
+    def test_feeds_stay_within_query_budget(self):
+        urls = [
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile',
+                    kwargs={'username': self.user.username}),
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk}),
+            reverse('posts:follow_index'),
+        ]
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertWithinQueryBudget(self.authorized_client, url)
+
+    def test_cached_profile_feed_skips_page_query(self):
+        url = reverse('posts:profile', kwargs={'username': self.user})
+        self.authorized_client.get(url)
+        counter = QueryCounter()
+        with counting_queries(counter):
+            self.authorized_client.get(url)
+        sql = '\n'.join(counter.queries)
+        self.assertNotIn('FROM "posts_post"', sql)
+        self.assertEqual(sql.count('FROM "posts_counter"'), 1)
+
+    def test_middleware_counts_only_views_with_budget(self):
+        with mock.patch('core.query_budget.QueryCounter',
+                        wraps=QueryCounter) as counter:
+            self.authorized_client.get(reverse('posts:post_create'))
+            counter.assert_not_called()
+            self.authorized_client.get(reverse('posts:index'))
+            counter.assert_called_once_with()
+
+    @override_settings(QUERY_BUDGET_STRICT=True)
+    def test_middleware_raises_over_budget_in_strict_mode(self):
+        with mock.patch.object(views.index, 'query_budget', 0):
+            with self.assertRaises(QueryBudgetExceeded):
+                self.authorized_client.get(reverse('posts:index'))
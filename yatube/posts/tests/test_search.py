@@ -0,0 +1,98 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from ..models import Post, SearchTerm
+from ..paginators import encode_cursor
+from ..stemmer import stem
+from ..views import AMOUNT_CONST
+
+User = get_user_model()
+
+
+class StemmerTest(TestCase):
+    def test_russian_stems(self):
+        words = {
+            'красивая': 'красив',
+            'подписчиков': 'подписчик',
+            'публикации': 'публикац',
+            'осторожность': 'осторожн',
+            'улыбнулся': 'улыбнул',
+            'ёлками': 'елк',
+        }
+        for word, expected in words.items():
+            with self.subTest(word=word):
+                self.assertEqual(stem(word), expected)
+
+
+class SearchViewTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='HasNoName')
+        cls.cat_post = Post.objects.create(
+            author=cls.user, text='Кошки и кошка спят на подоконнике')
+        cls.dog_post = Post.objects.create(
+            author=cls.user, text='Собака гуляет, кошку не видно')
+        Post.objects.create(author=cls.user, text='Про погоду')
+
+    def setUp(self):
+        self.guest_client = Client()
+
+    def search(self, query, **params):
+        return self.guest_client.get(
+            reverse('posts:search'), {'q': query, **params})
+
+    def test_search_matches_word_forms_and_ranks(self):
+        response = self.search('кошками')
+        self.assertEqual(list(response.context['page_obj']),
+                         [self.cat_post, self.dog_post])
+        self.assertContains(response, '<mark>Кошки</mark>')
+        self.assertContains(response, '<mark>кошку</mark>')
+
+    def test_search_escapes_text(self):
+        post = Post.objects.create(
+            author=self.user, text='<b>кошка</b> на крыше')
+        response = self.search('кошка')
+        self.assertIn(post, response.context['page_obj'])
+        self.assertContains(response, '&lt;b&gt;<mark>кошка</mark>')
+
+    def test_edit_reindexes_post(self):
+        post = Post.objects.get(pk=self.dog_post.pk)
+        post.text = 'Собака гуляет'
+        post.save()
+        response = self.search('кошка')
+        self.assertEqual(list(response.context['page_obj']),
+                         [self.cat_post])
+
+    def test_search_results_are_cursor_paginated(self):
+        Post.objects.bulk_create(
+            Post(author=self.user, text=f'Слон номер {i}')
+            for i in range(AMOUNT_CONST + 2))
+        call_command('rebuild_search_index', stdout=StringIO())
+        first = self.search('слоны').context['page_obj']
+        self.assertEqual(len(first), AMOUNT_CONST)
+        second = self.search(
+            'слоны', after=first.next_cursor).context['page_obj']
+        self.assertEqual(len(second), 2)
+        self.assertFalse(set(first) & set(second))
+
+    def test_cursor_of_wrong_type_returns_first_page(self):
+        response = self.search(
+            'кошка', after=encode_cursor(timezone.now(), 1))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(list(response.context['page_obj']),
+                         list(self.search('кошка').context['page_obj']))
+
+    def test_empty_query(self):
+        response = self.search('')
+        self.assertEqual(len(response.context['page_obj']), 0)
+
+    def test_post_delete_drops_terms(self):
+        Post.objects.get(pk=self.cat_post.pk).delete()
+        self.assertFalse(
+            SearchTerm.objects.filter(post_id=self.cat_post.pk).exists())
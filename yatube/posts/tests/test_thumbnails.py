@@ -0,0 +1,174 @@
+import shutil
+import tempfile
+import threading
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import (Client, TestCase, TransactionTestCase,
+                         override_settings)
+from django.urls import reverse
+
+from .. import thumbnails
+from ..models import Post
+
+User = get_user_model()
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+def uploaded_gif(name='small.gif'):
+    return SimpleUploadedFile(
+        name=name, content=SMALL_GIF, content_type='image/gif')
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_ASYNC=False)
+class ThumbnailTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='HasNoName')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+        cache.clear()
+
+    def test_post_form_builds_thumbnail(self):
+        self.authorized_client.post(
+            reverse('posts:post_create'),
+            data={'text': 'Пост с картинкой', 'image': uploaded_gif()},
+        )
+        post = Post.objects.get(text='Пост с картинкой')
+        self.assertTrue(post.image)
+        self.assertTrue(post.thumbnail)
+        response = self.client.get(reverse('posts:index'))
+        self.assertContains(response, post.thumbnail)
+
+    def test_post_saved_outside_form_gets_thumbnail(self):
+        post = Post.objects.create(
+            author=self.user, text='Из админки', image=uploaded_gif())
+        post.refresh_from_db()
+        self.assertTrue(post.thumbnail)
+        post.image = uploaded_gif('other.gif')
+        post.save()
+        post.refresh_from_db()
+        self.assertIn('other', post.image_versions['master']['name'])
+        response = self.client.get(reverse('posts:index'))
+        self.assertContains(response, post.thumbnail)
+        self.assertNotContains(response, 'Изображение обрабатывается')
+
+    def test_new_image_resets_thumbnail(self):
+        post = Post.objects.create(
+            author=self.user, text='Пост', thumbnail='/media/old.jpg')
+        self.authorized_client.post(
+            reverse('posts:post_edit', kwargs={'post_id': post.pk}),
+            data={'text': 'Пост', 'image': uploaded_gif('other.gif')},
+        )
+        post.refresh_from_db()
+        self.assertNotEqual(post.thumbnail, '/media/old.jpg')
+        self.assertTrue(post.thumbnail)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_ASYNC=True)
+class ThumbnailPlaceholderTest(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_feed_shows_placeholder_until_thumbnail_ready(self):
+        user = User.objects.create_user(username='HasNoName')
+        post = Post.objects.create(author=user, text='Пост с картинкой',
+                                   image=uploaded_gif())
+        urls = [reverse('posts:index'),
+                reverse('posts:profile', kwargs={'username': user}),
+                reverse('posts:post_detail', kwargs={'post_id': post.pk})]
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertContains(response, 'Изображение обрабатывается')
+                self.assertNotContains(response, '/media/cache/')
+        url = thumbnails.generate(post.pk)
+        for url_name in urls[:2]:
+            with self.subTest(url=url_name):
+                response = self.client.get(url_name)
+                self.assertContains(response, url)
+                self.assertNotContains(
+                    response, 'Изображение обрабатывается')
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_ASYNC=False)
+class BackfillThumbnailsTest(TransactionTestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def create_posts(self):
+        """Посты, сохранённые, когда миниатюр ещё не было."""
+        user = User.objects.create_user(username='HasNoName')
+        with mock.patch('posts.thumbnails.schedule'):
+            return [
+                Post.objects.create(author=user, text=f'Пост {i}',
+                                    image=uploaded_gif(f'small{i}.gif'))
+                for i in range(3)
+            ]
+
+    def test_backfill_thumbnails_command(self):
+        posts = self.create_posts()
+        out = StringIO()
+        # Общая in-memory база SQLite в тестах не ждёт блокировки таблицы,
+        # а сразу падает, поэтому записи в базу из потоков идут по одной.
+        # Файловая SQLite и серверные базы ждут блокировку сами.
+        lock = threading.Lock()
+        generate = thumbnails.generate
+
+        def serialized(post_id):
+            with lock:
+                return generate(post_id)
+
+        with mock.patch('posts.thumbnails.generate', serialized):
+            call_command('backfill_thumbnails', '--workers=3', stdout=out)
+        self.assertIn('построено: 3', out.getvalue())
+        for post in posts:
+            post.refresh_from_db()
+            self.assertTrue(post.thumbnail)
+
+    def test_backfill_runs_posts_in_parallel(self):
+        self.create_posts()
+        # Пройти барьер можно, только если все три поста в работе сразу.
+        barrier = threading.Barrier(3, timeout=10)
+        threads = set()
+
+        def generate(post_id):
+            threads.add(threading.current_thread().name)
+            barrier.wait()
+            return f'/media/{post_id}.jpg'
+
+        out = StringIO()
+        with mock.patch('posts.thumbnails.generate', generate):
+            call_command('backfill_thumbnails', '--workers=3', stdout=out)
+        self.assertIn('построено: 3', out.getvalue())
+        self.assertEqual(len(threads), 3)
@@ -1,5 +1,6 @@
 import shutil
 import tempfile
+from unittest import mock
 
 from django.contrib.auth import get_user_model
 from django.test import Client, TestCase, override_settings
@@ -7,10 +8,16 @@ from django.urls import reverse
 from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.conf import settings
+from django.db import IntegrityError, connection, transaction
+from django.test.utils import CaptureQueriesContext
 
-from ..models import Follow, Group, Post
+from .. import page_cache
+from ..models import (
+    Comment, Follow, Group, HeavyAuthor, Post, TimelineEntry,
+)
 from ..forms import PostForm
-from ..views import AMOUNT_CONST
+from ..paginators import elided_page_range, encode_cursor
+from ..views import AMOUNT_CONST, COMMENTS_AMOUNT_CONST
 
 
 User = get_user_model()
@@ -20,7 +27,7 @@ TEST_CONST: int = AMOUNT_CONST + 3
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
 
 
-@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_ASYNC=False)
 class PostPagesTests(TestCase):
     @classmethod
     def setUpClass(cls):
@@ -49,12 +56,14 @@ class PostPagesTests(TestCase):
             content=small_gif,
             content_type='image/gif')
 
-        cls.post = Post.objects.create(
-            author=cls.user,
-            text='Тестовая пост',
-            group=cls.group,
-            image='tasks/small.gif'
-        )
+        # Файла картинки нет в хранилище, миниатюра не нужна.
+        with mock.patch('posts.thumbnails.schedule'):
+            cls.post = Post.objects.create(
+                author=cls.user,
+                text='Тестовая пост',
+                group=cls.group,
+                image='tasks/small.gif'
+            )
 
     def setUp(self):
         self.authorized_client = Client()
@@ -218,6 +227,117 @@ class PaginatorViewsTest(TestCase):
                 self.assertEqual(len(response.context['page_obj']),
                                  TEST_CONST - AMOUNT_CONST)
 
+    def test_elided_page_range(self):
+        cases = {
+            (1, 1): [1],
+            (3, 7): [1, 2, 3, 4, 5, 6, 7],
+            (4, 100): [1, 2, 3, 4, 5, 6, None, 100],
+            (50, 1000): [1, None, 48, 49, 50, 51, 52, None, 1000],
+            (1000, 1000): [1, None, 998, 999, 1000],
+        }
+        for (number, num_pages), expected in cases.items():
+            with self.subTest(number=number, num_pages=num_pages):
+                self.assertEqual(
+                    elided_page_range(number, num_pages), expected)
+
+
+@override_settings(POSTS_PAGINATION='cursor')
+class CursorPaginatorViewsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='NoName')
+        cls.group = Group.objects.create(
+            title='Тестовая группа1',
+            slug='testslug1',
+            description='Тестовое описание1',
+        )
+        obj = (Post(author=cls.user,
+                    text=f'Test {i}',
+                    group=cls.group, ) for i in range(TEST_CONST))
+        Post.objects.bulk_create(obj)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_cursor_pages_walk_forward_and_back(self):
+        url_names = [
+            reverse('posts:index'),
+            reverse('posts:profile',
+                    kwargs={'username': self.user.username}),
+            reverse('posts:group_list',
+                    kwargs={'slug': self.group.slug}), ]
+        for url in url_names:
+            with self.subTest(url=url):
+                first_page = self.client.get(url).context['page_obj']
+                self.assertEqual(len(first_page), AMOUNT_CONST)
+                self.assertFalse(first_page.has_previous())
+                second_page = self.client.get(
+                    url, {'after': first_page.next_cursor}
+                ).context['page_obj']
+                self.assertEqual(len(second_page),
+                                 TEST_CONST - AMOUNT_CONST)
+                self.assertFalse(second_page.has_next())
+                back_page = self.client.get(
+                    url, {'before': second_page.previous_cursor}
+                ).context['page_obj']
+                self.assertEqual(list(back_page), list(first_page))
+
+    def test_cursor_page_skips_count_query(self):
+        url = reverse('posts:index')
+        with self.assertNumQueries(1):
+            self.client.get(url)
+
+    def test_broken_cursor_returns_first_page(self):
+        response = self.client.get(reverse('posts:index'),
+                                   {'after': 'not-a-cursor'})
+        self.assertEqual(len(response.context['page_obj']), AMOUNT_CONST)
+
+    def test_cursor_of_wrong_type_returns_first_page(self):
+        response = self.client.get(reverse('posts:index'),
+                                   {'after': encode_cursor(5, 1)})
+        self.assertEqual(len(response.context['page_obj']), AMOUNT_CONST)
+        self.assertFalse(response.context['page_obj'].has_previous())
+
+
+class CommentsPaginationTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='HasNoName')
+        cls.post = Post.objects.create(author=cls.user, text='Тестовый пост')
+        Comment.objects.bulk_create(
+            Comment(post=cls.post, author=cls.user, text=f'Комментарий {i}')
+            for i in range(COMMENTS_AMOUNT_CONST + 3))
+
+    def test_post_detail_shows_newest_comments_only(self):
+        response = self.client.get(reverse(
+            'posts:post_detail', kwargs={'post_id': self.post.pk}))
+        comments = response.context['comments']
+        self.assertEqual(len(comments), COMMENTS_AMOUNT_CONST)
+        self.assertEqual(comments[0], Comment.objects.latest('pk'))
+        self.assertTrue(comments.next_cursor)
+
+    def test_more_comments_fragment_and_json(self):
+        url = reverse('posts:post_comments',
+                      kwargs={'post_id': self.post.pk})
+        first = self.client.get(url).context['comments']
+        response = self.client.get(url, {'after': first.next_cursor})
+        self.assertTemplateUsed(response, 'includes/comments.html')
+        self.assertEqual(len(response.context['comments']), 3)
+
+        data = self.client.get(
+            url, {'after': first.next_cursor, 'format': 'json'}).json()
+        self.assertEqual(len(data['comments']), 3)
+        self.assertIsNone(data['next'])
+
+    def test_comments_cursor_of_wrong_type_returns_first_page(self):
+        url = reverse('posts:post_comments',
+                      kwargs={'post_id': self.post.pk})
+        response = self.client.get(url, {'after': encode_cursor(5, 1)})
+        self.assertEqual(len(response.context['comments']),
+                         COMMENTS_AMOUNT_CONST)
+
 
 class FollowTest(TestCase):
     @classmethod
@@ -283,6 +403,114 @@ class FollowTest(TestCase):
         count_posts_in_unfollow_user = len(response.context.get('page_obj'))
         self.assertEqual(count_posts_in_unfollow_user, 0)
 
+    def test_unfollow_without_follow(self):
+        response = self.authorized_client.get(reverse(
+            'posts:profile_unfollow', args=(self.user_2.username,)))
+        self.assertRedirects(response, '/follow/')
+
+    def test_follow_constraints(self):
+        Follow.objects.create(user=self.user_1, author=self.user_2)
+        for author in (self.user_2, self.user_1):
+            with self.subTest(author=author):
+                with self.assertRaises(IntegrityError):
+                    with transaction.atomic():
+                        Follow.objects.create(user=self.user_1,
+                                              author=author)
+
+
+class TimelineTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='Reader')
+        cls.author = User.objects.create_user(username='Author')
+        cls.old_post = Post.objects.create(
+            author=cls.author, text='Старый пост')
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.reader)
+
+    def follow_page(self):
+        response = self.authorized_client.get(reverse('posts:follow_index'))
+        return list(response.context['page_obj'])
+
+    def test_follow_backfills_and_new_post_fans_out(self):
+        self.authorized_client.get(reverse(
+            'posts:profile_follow', args=(self.author.username,)))
+        new_post = Post.objects.create(author=self.author, text='Новый')
+        self.assertEqual(
+            TimelineEntry.objects.filter(user=self.reader).count(), 2)
+        self.assertEqual(self.follow_page(), [new_post, self.old_post])
+
+    def test_unfollow_purges_timeline(self):
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.authorized_client.get(reverse(
+            'posts:profile_unfollow', args=(self.author.username,)))
+        self.assertFalse(
+            TimelineEntry.objects.filter(user=self.reader).exists())
+        self.assertEqual(self.follow_page(), [])
+
+    @override_settings(TIMELINE_LENGTH=2)
+    def test_timeline_is_trimmed(self):
+        Follow.objects.create(user=self.reader, author=self.author)
+        for i in range(3):
+            Post.objects.create(author=self.author, text=f'Пост {i}')
+        self.assertEqual(
+            TimelineEntry.objects.filter(user=self.reader).count(), 2)
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=0)
+    def test_heavy_author_is_read_on_request(self):
+        Follow.objects.create(user=self.reader, author=self.author)
+        new_post = Post.objects.create(author=self.author, text='Новый')
+        self.assertFalse(
+            TimelineEntry.objects.filter(user=self.reader).exists())
+        self.assertEqual(self.follow_page(), [new_post, self.old_post])
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=0)
+    def test_heavy_authors_read_from_stored_flag(self):
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.assertTrue(
+            HeavyAuthor.objects.filter(author=self.author).exists())
+        with CaptureQueriesContext(connection) as queries:
+            self.follow_page()
+        sql = '\n'.join(query['sql'] for query in queries.captured_queries)
+        self.assertIn('posts_heavyauthor', sql)
+        self.assertNotIn('GROUP BY', sql)
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=1)
+    def test_author_below_limit_is_fanned_out_again(self):
+        other = User.objects.create_user(username='Other')
+        Follow.objects.create(user=self.reader, author=self.author)
+        Follow.objects.create(user=other, author=self.author)
+        new_post = Post.objects.create(author=self.author, text='Новый')
+        self.assertFalse(
+            TimelineEntry.objects.filter(post=new_post).exists())
+        Follow.objects.filter(user=other).delete()
+        self.assertFalse(HeavyAuthor.objects.exists())
+        self.assertEqual(
+            set(TimelineEntry.objects.filter(user=self.reader).values_list(
+                'post_id', flat=True)),
+            {new_post.pk, self.old_post.pk})
+        self.assertEqual(self.follow_page(), [new_post, self.old_post])
+
+    @override_settings(TIMELINE_LENGTH=1, TIMELINE_TRIM_BATCH=2)
+    def test_fan_out_trims_followers_in_batches(self):
+        readers = [self.reader] + [
+            User.objects.create_user(username=f'Reader{i}') for i in range(2)]
+        for reader in readers:
+            Follow.objects.create(user=reader, author=self.author)
+        with CaptureQueriesContext(connection) as queries:
+            new_post = Post.objects.create(author=self.author, text='Новый')
+        deletes = [query for query in queries.captured_queries
+                   if query['sql'].startswith('DELETE FROM "posts_timeline')]
+        self.assertEqual(len(deletes), 2)
+        for reader in readers:
+            self.assertEqual(
+                list(TimelineEntry.objects.filter(user=reader).values_list(
+                    'post_id', flat=True)),
+                [new_post.pk])
+
 
 class CacheTest(TestCase):
     @classmethod
@@ -312,3 +540,210 @@ class CacheTest(TestCase):
         response = self.authorized_client.get(reverse('posts:index'))
         self.assertEqual(len(response.context.get('page_obj')),
                          posts_count)
+
+
+class FragmentCacheTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='HasNoName')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',)
+        cls.post = Post.objects.create(
+            author=cls.user, text='Первый пост', group=cls.group)
+
+    def setUp(self):
+        cache.clear()
+        self.urls = [
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile', kwargs={'username': self.user}),
+        ]
+
+    def test_feeds_are_served_from_cache(self):
+        for url in self.urls:
+            self.client.get(url)
+        Post.objects.filter(pk=self.post.pk).update(text='Тихая правка')
+        for url in self.urls:
+            with self.subTest(url=url):
+                self.assertContains(self.client.get(url), 'Первый пост')
+
+    def test_new_post_invalidates_feeds(self):
+        for url in self.urls:
+            self.client.get(url)
+        Post.objects.create(
+            author=self.user, text='Второй пост', group=self.group)
+        for url in self.urls:
+            with self.subTest(url=url):
+                self.assertContains(self.client.get(url), 'Второй пост')
+
+    def test_post_edit_invalidates_post_fragment(self):
+        url = reverse('posts:post_detail', kwargs={'post_id': self.post.pk})
+        self.client.get(url)
+        self.post.text = 'Исправленный пост'
+        self.post.save()
+        self.assertContains(self.client.get(url), 'Исправленный пост')
+        self.assertContains(
+            self.client.get(reverse('posts:index')), 'Исправленный пост')
+
+
+class ConditionalFeedTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='HasNoName')
+        cls.author = User.objects.create_user(username='Author')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',)
+        cls.post = Post.objects.create(
+            author=cls.author, text='Первый пост', group=cls.group)
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+        self.urls = [
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile', kwargs={'username': self.author}),
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk}),
+        ]
+
+    def test_not_modified(self):
+        for url in self.urls:
+            with self.subTest(url=url):
+                etag = self.client.get(url)['ETag']
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 304)
+
+    def test_new_post_changes_etag(self):
+        etags = {url: self.client.get(url)['ETag'] for url in self.urls[:3]}
+        Post.objects.create(
+            author=self.author, text='Второй пост', group=self.group)
+        for url, etag in etags.items():
+            with self.subTest(url=url):
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 200)
+
+    def test_follow_changes_profile_etag(self):
+        url = reverse('posts:profile', kwargs={'username': self.author})
+        etag = self.authorized_client.get(url)['ETag']
+        Follow.objects.create(user=self.user, author=self.author)
+        response = self.authorized_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_etag_depends_on_viewer(self):
+        url = reverse('posts:index')
+        etag = self.client.get(url)['ETag']
+        response = self.authorized_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_etag_changes_with_session_and_csrf_cookie(self):
+        url = reverse('posts:post_detail', kwargs={'post_id': self.post.pk})
+        etag = self.authorized_client.get(url)['ETag']
+        self.authorized_client.cookies[settings.CSRF_COOKIE_NAME] = 'a' * 64
+        response = self.authorized_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+        self.authorized_client.logout()
+        self.authorized_client.force_login(self.user)
+        self.authorized_client.cookies[settings.CSRF_COOKIE_NAME] = 'a' * 64
+        response = self.authorized_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        response = self.authorized_client.get(
+            url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_cache_control(self):
+        response = self.client.get(reverse('posts:index'))
+        self.assertIn('public', response['Cache-Control'])
+        self.assertIn(
+            f'max-age={settings.FEED_CACHE_MAX_AGE}',
+            response['Cache-Control'])
+        response = self.authorized_client.get(reverse('posts:index'))
+        self.assertIn('private', response['Cache-Control'])
+        self.assertIn('no-cache', response['Cache-Control'])
+
+
+@override_settings(ANON_PAGE_CACHE_TIMEOUT=60)
+class AnonymousPageCacheTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='HasNoName')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',)
+        cls.post = Post.objects.create(
+            author=cls.user, text='Первый пост', group=cls.group)
+
+    def setUp(self):
+        cache.clear()
+        self.urls = [
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile', kwargs={'username': self.user}),
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk}),
+        ]
+
+    def key(self, url):
+        return page_cache.page_key(self.client.get(url).wsgi_request)
+
+    def lock(self, url):
+        return page_cache.LOCK_KEY.format(self.key(url))
+
+    def test_page_served_from_cache(self):
+        for url in self.urls:
+            with self.subTest(url=url):
+                self.client.get(url)
+                response = self.client.get(url)
+                self.assertIsNone(response.context)
+                self.assertContains(response, 'Первый пост')
+
+    def test_authorized_not_cached(self):
+        self.client.force_login(self.user)
+        self.client.get(self.urls[0])
+        self.assertIsNotNone(self.client.get(self.urls[0]).context)
+
+    def test_stale_page_while_other_request_rebuilds(self):
+        url = self.urls[0]
+        lock = self.lock(url)
+        Post.objects.create(author=self.user, text='Второй пост')
+        cache.add(lock, 1)
+        response = self.client.get(url)
+        self.assertNotContains(response, 'Второй пост')
+        self.assertEqual(response['ETag'], page_cache.STALE_ETAG)
+        cache.delete(lock)
+        self.assertContains(self.client.get(url), 'Второй пост')
+        self.assertIsNone(cache.get(lock))
+
+    def test_cold_miss_waits_for_page_from_lock_holder(self):
+        key = self.key(self.urls[0])
+        lock = page_cache.LOCK_KEY.format(key)
+        page = page_cache.PAGE_KEY.format(key)
+        entry = cache.get(page)
+        cache.delete(page)
+        cache.add(lock, 1)
+        with mock.patch('posts.page_cache.time.sleep',
+                        side_effect=lambda _: cache.set(page, entry)):
+            response = self.client.get(self.urls[0])
+        self.assertIsNone(response.context)
+        self.assertContains(response, 'Первый пост')
+        self.assertEqual(cache.get(lock), 1)
+
+    @override_settings(ANON_PAGE_CACHE_WAIT=0)
+    def test_cold_miss_renders_itself_after_wait(self):
+        url = self.urls[0]
+        lock = self.lock(url)
+        cache.clear()
+        cache.add(lock, 1)
+        response = self.client.get(url)
+        self.assertIsNotNone(response.context)
+        self.assertEqual(cache.get(lock), 1)
+        self.assertIsNone(cache.get(page_cache.PAGE_KEY.format(
+            page_cache.page_key(response.wsgi_request))))
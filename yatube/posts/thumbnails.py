@@ -0,0 +1,78 @@
+"""Обработка картинок и генерация миниатюр для ленты.
+
+Когда у поста появляется новая картинка (сигнал post_save, а для
+загруженных данных — import_data), строятся мастер-копия и её варианты
+(см. images), затем из мастер-копии — миниатюра. При THUMBNAIL_ASYNC это
+делает пул потоков после коммита, иначе — сам сохраняющий поток. Адрес
+миниатюры записывается в Post.thumbnail, и шаблоны больше не вызывают
+sorl-thumbnail во время запроса.
+"""
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+from sorl.thumbnail import get_thumbnail
+
+from core.profiling import thumbnail_timer
+
+from . import cache_versions, images
+from .models import Post
+
+logger = logging.getLogger(__name__)
+
+FEED_GEOMETRY = '960x339'
+FEED_OPTIONS = {'crop': 'center', 'upscale': True}
+
+_executor = None
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.THUMBNAIL_WORKERS,
+            thread_name_prefix='thumbnails')
+    return _executor
+
+
+def generate(post_id):
+    """Строит миниатюру поста и сохраняет её адрес. Возвращает адрес."""
+    post = Post.objects.filter(pk=post_id).only(
+        'image', 'author_id', 'group_id').first()
+    if post is None or not post.image:
+        return None
+    with thumbnail_timer():
+        master = images.process(post)
+        thumbnail = get_thumbnail(master, FEED_GEOMETRY, **FEED_OPTIONS)
+    if not thumbnail.exists():
+        logger.warning('Не удалось построить миниатюру поста %s', post_id)
+        return None
+    Post.objects.filter(pk=post_id).update(thumbnail=thumbnail.url)
+    # Карточка с заглушкой лежит и во фрагментах лент, не только поста.
+    cache_versions.bump(*cache_versions.post_keys(post))
+    return thumbnail.url
+
+
+def generate_in_worker(post_id):
+    close_old_connections()
+    try:
+        return generate(post_id)
+    except Exception:
+        logger.exception('Ошибка генерации миниатюры поста %s', post_id)
+    finally:
+        connection.close()
+
+
+def schedule(post):
+    """Строит миниатюру сразу или, при THUMBNAIL_ASYNC, после коммита."""
+    if not post.image:
+        return
+    if not settings.THUMBNAIL_ASYNC:
+        try:
+            generate(post.pk)
+        except Exception:
+            logger.exception('Ошибка генерации миниатюры поста %s', post.pk)
+        return
+    transaction.on_commit(
+        lambda: get_executor().submit(generate_in_worker, post.pk))
@@ -0,0 +1,185 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Count, OuterRef, Q, Subquery
+
+from . import counters
+from .models import Follow, HeavyAuthor, Post, TimelineEntry
+
+User = get_user_model()
+
+
+def heavy_author_ids(user):
+    """Авторы из подписок user, чьи посты не раскладываются по лентам."""
+    return list(
+        HeavyAuthor.objects.filter(author__following__user=user)
+        .values_list('author_id', flat=True)
+    )
+
+
+def is_heavy_author(author_id):
+    return HeavyAuthor.objects.filter(author_id=author_id).exists()
+
+
+def followers_changed(author_id, delta):
+    """Сдвигает счётчик подписчиков и при переходе через
+    TIMELINE_FANOUT_LIMIT переключает флаг HeavyAuthor.
+
+    Автор, опустившийся до лимита, сначала раскладывается по лентам
+    подписчиков, и только потом теряет флаг, чтобы его посты не пропали
+    из лент в промежутке.
+    """
+    key = counters.followers_key(author_id)
+    counters.incr(key, delta)
+    followers = counters.get_count(
+        key, Follow.objects.filter(author_id=author_id))
+    if followers > settings.TIMELINE_FANOUT_LIMIT:
+        if delta > 0:
+            HeavyAuthor.objects.bulk_create(
+                [HeavyAuthor(author_id=author_id)], ignore_conflicts=True)
+    elif delta < 0 and is_heavy_author(author_id):
+        backfill_followers(author_id)
+        HeavyAuthor.objects.filter(author_id=author_id).delete()
+
+
+def sync_heavy_authors(author_ids=None):
+    """Выставляет флаги HeavyAuthor по таблице подписок.
+
+    Нужно после загрузки подписок в обход сигналов. author_ids
+    ограничивает проверку этими авторами.
+    """
+    follows = Follow.objects.all()
+    heavy = HeavyAuthor.objects.all()
+    if author_ids is not None:
+        follows = follows.filter(author_id__in=author_ids)
+        heavy = heavy.filter(author_id__in=author_ids)
+    heavy_ids = set(
+        follows.values('author_id')
+        .annotate(followers=Count('pk'))
+        .filter(followers__gt=settings.TIMELINE_FANOUT_LIMIT)
+        .values_list('author_id', flat=True)
+    )
+    dropped = set(heavy.exclude(
+        author_id__in=heavy_ids).values_list('author_id', flat=True))
+    for author_id in dropped:
+        backfill_followers(author_id)
+    with transaction.atomic():
+        HeavyAuthor.objects.filter(author_id__in=dropped).delete()
+        HeavyAuthor.objects.bulk_create(
+            (HeavyAuthor(author_id=author_id) for author_id in heavy_ids),
+            ignore_conflicts=True,
+        )
+
+
+def trim_many(user_ids):
+    """Оставляет в лентах только TIMELINE_LENGTH последних постов.
+
+    На каждые TIMELINE_TRIM_BATCH пользователей — два запроса: граница
+    ленты каждого и один общий DELETE всего, что старше своей границы.
+    """
+    user_ids = list(user_ids)
+    length = settings.TIMELINE_LENGTH
+    batch_size = settings.TIMELINE_TRIM_BATCH
+    for start in range(0, len(user_ids), batch_size):
+        last_kept = TimelineEntry.objects.filter(
+            user_id=OuterRef('pk')).order_by(
+                '-pub_date', '-post_id').values('pub_date')[length - 1:length]
+        bounds = User.objects.filter(
+            pk__in=user_ids[start:start + batch_size]
+        ).annotate(
+            bound=Subquery(last_kept)
+        ).filter(bound__isnull=False).values_list('pk', 'bound')
+        condition = Q()
+        for user_id, bound in bounds:
+            condition |= Q(user_id=user_id, pub_date__lt=bound)
+        if condition:
+            TimelineEntry.objects.filter(condition).delete()
+
+
+def trim(user_id):
+    trim_many([user_id])
+
+
+def fan_out(post):
+    """Раскладывает новый пост по лентам подписчиков автора."""
+    if is_heavy_author(post.author_id):
+        return
+    follower_ids = list(
+        Follow.objects.filter(author_id=post.author_id)
+        .values_list('user_id', flat=True)
+    )
+    TimelineEntry.objects.bulk_create(
+        (TimelineEntry(user_id=user_id, post=post, pub_date=post.pub_date)
+         for user_id in follower_ids),
+        ignore_conflicts=True,
+    )
+    trim_many(follower_ids)
+
+
+def recent_posts(author_id):
+    return list(Post.objects.filter(author_id=author_id).values_list(
+        'pk', 'pub_date')[:settings.TIMELINE_LENGTH])
+
+
+def backfill(user_id, author_id):
+    """Добавляет в ленту последние посты автора после подписки."""
+    if is_heavy_author(author_id):
+        return
+    TimelineEntry.objects.bulk_create(
+        (TimelineEntry(user_id=user_id, post_id=pk, pub_date=pub_date)
+         for pk, pub_date in recent_posts(author_id)),
+        ignore_conflicts=True,
+    )
+    trim(user_id)
+
+
+def backfill_followers(author_id):
+    """Раскладывает последние посты автора по лентам всех подписчиков."""
+    posts = recent_posts(author_id)
+    follower_ids = list(
+        Follow.objects.filter(author_id=author_id)
+        .values_list('user_id', flat=True)
+    )
+    batch_size = settings.TIMELINE_TRIM_BATCH
+    for start in range(0, len(follower_ids), batch_size):
+        batch = follower_ids[start:start + batch_size]
+        TimelineEntry.objects.bulk_create(
+            (TimelineEntry(user_id=user_id, post_id=pk, pub_date=pub_date)
+             for user_id in batch for pk, pub_date in posts),
+            ignore_conflicts=True,
+        )
+        trim_many(batch)
+
+
+def purge(user_id, author_id):
+    """Убирает из ленты посты автора после отписки."""
+    TimelineEntry.objects.filter(
+        user_id=user_id, post__author_id=author_id).delete()
+
+
+def rebuild(user_id):
+    """Собирает ленту заново, например после загрузки в обход сигналов."""
+    posts = Post.objects.filter(
+        author__following__user_id=user_id
+    ).exclude(
+        author_id__in=heavy_author_ids(user_id)
+    ).values_list('pk', 'pub_date')[:settings.TIMELINE_LENGTH]
+    with transaction.atomic():
+        TimelineEntry.objects.filter(user_id=user_id).delete()
+        TimelineEntry.objects.bulk_create(
+            TimelineEntry(user_id=user_id, post_id=pk, pub_date=pub_date)
+            for pk, pub_date in posts)
+
+
+def timeline_posts(user):
+    """Посты ленты подписок.
+
+    Обычные авторы читаются из материализованной ленты, посты авторов
+    с огромным числом подписчиков добираются запросом при чтении.
+    """
+    heavy_ids = heavy_author_ids(user)
+    if not heavy_ids:
+        return Post.objects.filter(timeline_entries__user=user)
+    entries = TimelineEntry.objects.filter(user=user).values('post_id')
+    return Post.objects.filter(
+        Q(pk__in=entries) | Q(author_id__in=heavy_ids))
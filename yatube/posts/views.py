@@ -1,85 +1,215 @@
+from django.conf import settings
+from django.http import JsonResponse
 from django.shortcuts import render, get_object_or_404
-from django.core.paginator import Paginator
 from django.shortcuts import redirect
 from django.contrib.auth.decorators import login_required
 
+from core.parallel import run_parallel
+from core.query_budget import query_budget
+from core.routers import pin, read_replica
+from core.throttle import throttle
+
 from .forms import PostForm, CommentForm
 
-from .models import Post, Group, User, Follow
+from .models import Comment, Post, Group, User, Follow
+from . import cache_versions, comment_queue, counters
+from .conditional import (
+    feed_condition, follow_version, group_version, index_version,
+    post_version, profile_version,
+)
+from .page_cache import anonymous_page_cache
+from .search import search_posts
+from .paginators import (
+    CountedPaginator, CursorPaginator, WindowedPaginator,
+)
+from .timeline import timeline_posts
 
 AMOUNT_CONST: int = 10
+COMMENTS_AMOUNT_CONST: int = 20
+
+
+def paginator(post_list, count=None):
+    if count is None:
+        return WindowedPaginator(post_list, AMOUNT_CONST)
+    return CountedPaginator(post_list, AMOUNT_CONST, count)
+
+
+def comments_page(request, post_id):
+    """Порция комментариев поста от новых к старым."""
+    return CursorPaginator(
+        Comment.objects.filter(post_id=post_id).select_related('author'),
+        COMMENTS_AMOUNT_CONST,
+        field='created',
+    ).get_page(after=request.GET.get('after'))
+
+
+def get_page(request, post_list, counter=None):
+    """Страница ленты: по номеру или по курсору ?after=/?before=.
 
+    Если передано имя счётчика, число записей берётся из него.
+    """
+    after = request.GET.get('after')
+    before = request.GET.get('before')
+    if settings.POSTS_PAGINATION == 'cursor' or after or before:
+        return CursorPaginator(post_list, AMOUNT_CONST).get_page(
+            after=after, before=before)
+    count = None
+    if counter is not None:
+        count = counters.get_count(counter, post_list)
+    return paginator(post_list, count).get_page(request.GET.get('page'))
 
-def paginator(post_list):
-    return Paginator(post_list, AMOUNT_CONST)
 
+def evaluated(page):
+    """Выполняет запрос страницы сразу, а не при рендере шаблона."""
+    page.object_list = list(page.object_list)
+    return page
 
+
+@query_budget(6)
+@read_replica
+@feed_condition(index_version)
+@anonymous_page_cache(index_version)
 def index(request):
     template = 'posts/index.html'
     post_list = Post.objects.select_related(
         'group', 'author').all()
-    page_number = request.GET.get('page')
-    page_obj = paginator(post_list).get_page(page_number)
+    page_obj = get_page(request, post_list, counters.POSTS)
     context = {
         'page_obj': page_obj,
+        'feed_version': cache_versions.get_version(cache_versions.INDEX),
     }
     return render(request, template, context)
 
 
+@query_budget(8)
+@read_replica
+@feed_condition(group_version)
+@anonymous_page_cache(group_version)
 def group_list(request, slug):
     template = 'posts/group_list.html'
     group = get_object_or_404(Group, slug=slug)
     post_list = Post.objects.select_related(
-        'group').filter(group=group)
-    page_number = request.GET.get('page')
-    page_obj = paginator(post_list).get_page(page_number)
+        'group', 'author').filter(group=group)
+    page_obj = get_page(request, post_list, counters.group_key(group.pk))
     context = {
         'group': group,
         'page_obj': page_obj,
+        'feed_version': cache_versions.get_version(
+            cache_versions.group_key(group.pk)),
     }
 
     return render(request, template, context)
 
 
+@query_budget(9)
+@read_replica
+@feed_condition(profile_version)
+@anonymous_page_cache(profile_version)
 def profile(request, username):
     template = 'posts/profile.html'
     author = get_object_or_404(User, username=username)
-    page_number = request.GET.get('page')
     post_list = author.posts.select_related(
         'group', 'author')
-    page_obj = paginator(post_list).get_page(page_number)
-    if request.user.is_authenticated:
-        following = Follow.objects.filter(author=author,
-                                          user=request.user).exists()
+    counter = counters.author_key(author.pk)
+    user = request.user
+
+    def page():
+        page_obj = get_page(request, post_list, counter)
+        # В пуле страница выбирается сразу; без пула — лениво, чтобы
+        # закэшированный фрагмент ленты не делал запрос.
+        return evaluated(page_obj) if settings.PARALLEL_QUERIES else page_obj
+
+    page_obj, following = run_parallel(
+        page,
+        lambda: user.is_authenticated and Follow.objects.filter(
+            author=author, user=user).exists(),
+    )
+    if isinstance(page_obj.paginator, CountedPaginator):
+        posts_count = page_obj.paginator.count
     else:
-        following = False
+        posts_count = counters.get_count(counter, post_list)
     context = {
         'author': author,
         'page_obj': page_obj,
         'following': following,
-        'post_list': post_list,
+        'posts_count': posts_count,
+        'feed_version': cache_versions.get_version(
+            cache_versions.profile_key(author.pk)),
     }
     return render(request, template, context)
 
 
+@query_budget(8)
+@read_replica
+@feed_condition(post_version)
+@anonymous_page_cache(post_version)
 def post_detail(request, post_id):
     template = 'posts/post_detail.html'
-    post = get_object_or_404(Post, pk=post_id)
+    post, comments = run_parallel(
+        lambda: get_object_or_404(
+            Post.objects.select_related('author', 'group'), pk=post_id),
+        lambda: comments_page(request, post_id),
+    )
+    comments = comment_queue.with_pending(request, comments, post_id)
     form = CommentForm(request.POST or None)
-    comments = post.comments.all()
+    author_posts_count = counters.get_count(
+        counters.author_key(post.author_id),
+        Post.objects.filter(author_id=post.author_id))
 
     context = {
         'post': post,
         'form': form,
-        'comments': comments
+        'comments': comments,
+        'author_posts_count': author_posts_count,
+    }
+    return render(request, template, context)
+
+
+@read_replica
+def post_comments(request, post_id):
+    """Следующая порция комментариев: HTML-фрагмент или JSON."""
+    post = get_object_or_404(Post, pk=post_id)
+    comments = comments_page(request, post.pk)
+    if request.GET.get('format') == 'json':
+        return JsonResponse({
+            'comments': [
+                {
+                    'id': comment.pk,
+                    'author': comment.author.username,
+                    'text': comment.text,
+                    'created': comment.created,
+                }
+                for comment in comments
+            ],
+            'next': comments.next_cursor,
+        })
+    context = {
+        'post': post,
+        'comments': comments,
+    }
+    return render(request, 'includes/comments.html', context)
+
+
+@query_budget(7)
+def search(request):
+    template = 'posts/search.html'
+    query = request.GET.get('q', '').strip()
+    page_obj = CursorPaginator(
+        search_posts(query), AMOUNT_CONST, field='score'
+    ).get_page(after=request.GET.get('after'),
+               before=request.GET.get('before'))
+    context = {
+        'query': query,
+        'page_obj': page_obj,
     }
     return render(request, template, context)
 
 
 @login_required
+@throttle('post_create')
 def post_create(request):
     template = 'posts/create_post.html'
-    form = PostForm(request.POST or None)
+    form = PostForm(request.POST or None, files=request.FILES or None)
     if form.is_valid():
         post_create = form.save(commit=False)
         post_create.author = request.user
@@ -109,6 +239,7 @@ def post_edit(request, post_id):
 
 
 @login_required
+@throttle('add_comment')
 def add_comment(request, post_id):
     post = get_object_or_404(Post, pk=post_id)
     form = CommentForm(request.POST or None)
@@ -116,18 +247,24 @@ def add_comment(request, post_id):
         comment = form.save(commit=False)
         comment.author = request.user
         comment.post = post
-        comment.save()
+        if settings.COMMENT_WRITE_BEHIND:
+            comment_queue.submit(comment)
+        else:
+            comment.save()
     return redirect('posts:post_detail', post_id=post_id)
 
 
 @login_required
+@query_budget(5)
+@read_replica
+@feed_condition(follow_version)
 def follow_index(request):
     template = 'posts/follow.html'
-    posts = Post.objects.filter(author__following__user=request.user).all()
-    page_number = request.GET.get('page')
-    page_obj = paginator(posts).get_page(page_number)
+    posts = timeline_posts(request.user).select_related('author', 'group')
+    page_obj = get_page(request, posts)
     context = {
         'page_obj': page_obj,
+        'feed_version': cache_versions.follow_feed_version(request.user.pk),
     }
     return render(request, template, context)
 
@@ -142,6 +279,8 @@ def profile_follow(request, username):
             author=author,
             user=follow_user,
         )
+        # Пишет на GET, так что ReplicaPinMiddleware его не закрепит.
+        pin(follow_user)
     return redirect('posts:follow_index')
 
 
@@ -150,9 +289,9 @@ def profile_unfollow(request, username):
     # Дизлайк, отписка
     author = get_object_or_404(User, username=username)
     follow_user = request.user
-    if follow_user != author:
-        Follow.objects.get(
-            author=author,
-            user=follow_user,
-        ).delete()
+    Follow.objects.filter(
+        author=author,
+        user=follow_user,
+    ).delete()
+    pin(follow_user)
     return redirect('posts:follow_index')
@@ -12,6 +12,8 @@ https://docs.djangoproject.com/en/2.2/ref/settings/
 
 import os
 
+from core.db import database_from_env, replicas_from_env
+
 # Build paths inside the project like this: os.path.join(BASE_DIR, ...)
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
@@ -51,10 +53,13 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'core.profiling.ProfilingMiddleware',
+    'core.query_budget.QueryBudgetMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
-    'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'core.auth.CachedAuthenticationMiddleware',
+    'core.routers.ReplicaPinMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -62,12 +67,25 @@ MIDDLEWARE = [
 ROOT_URLCONF = 'yatube.urls'
 
 TEMPLATES_DIR = os.path.join(BASE_DIR, 'templates')
+# Профиль для продакшена: TEMPLATE_CACHE=1 (по умолчанию при DEBUG = False)
+# включает кэширующий загрузчик, и core при старте процесса заранее
+# компилирует все шаблоны из TEMPLATES_DIR (см. core.templates).
+TEMPLATE_CACHE = os.environ.get(
+    'TEMPLATE_CACHE', '0' if DEBUG else '1') == '1'
+TEMPLATE_LOADERS = [
+    'django.template.loaders.filesystem.Loader',
+    'django.template.loaders.app_directories.Loader',
+]
+if TEMPLATE_CACHE:
+    TEMPLATE_LOADERS = [
+        ('django.template.loaders.cached.Loader', TEMPLATE_LOADERS),
+    ]
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
         'DIRS': [TEMPLATES_DIR],
-        'APP_DIRS': True,
         'OPTIONS': {
+            'loaders': TEMPLATE_LOADERS,
             'context_processors': [
                 'django.template.context_processors.debug',
                 'django.template.context_processors.request',
@@ -84,11 +102,35 @@ WSGI_APPLICATION = 'yatube.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/2.2/ref/settings/#databases
 
+# База задаётся переменными окружения (см. core.db.database_from_env):
+# DB_ENGINE=postgresql, DB_NAME, DB_USER, DB_PASSWORD, DB_HOST, DB_PORT.
+# DB_CONN_MAX_AGE — сколько секунд держать соединение открытым между
+# запросами. За пулером PgBouncer в режиме транзакций задайте
+# DB_POOLER=transaction. Без переменных используется SQLite db.sqlite3.
 DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
-    }
+    'default': database_from_env(os.path.join(BASE_DIR, 'db.sqlite3')),
+}
+
+# Реплики для чтения лент: DB_REPLICAS — хосты (для SQLite — файлы)
+# через запятую. View с декоратором core.routers.read_replica читают
+# с реплик; пользователь, который только что что-то изменил, ещё
+# REPLICA_PIN_SECONDS секунд читает с основной базы.
+DATABASES.update(replicas_from_env(DATABASES['default']))
+DATABASE_REPLICAS = [alias for alias in DATABASES if alias != 'default']
+DATABASE_ROUTERS = ['core.routers.ReplicaRouter']
+REPLICA_PIN_SECONDS = 10
+
+# Перед каждым запросом проверять, что постоянное соединение живо.
+DB_CONN_HEALTH_CHECKS = os.environ.get('DB_CONN_HEALTH_CHECKS') == '1'
+
+# PRAGMA для каждого соединения с SQLite: WAL не блокирует чтение во время
+# записи, synchronous=NORMAL в режиме WAL безопасен и не ждёт fsync
+# на каждый коммит, busy_timeout — мс ожидания блокировки вместо ошибки.
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'mmap_size': 256 * 1024 * 1024,
+    'busy_timeout': 20000,
 }
 
 
@@ -145,8 +187,103 @@ CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Превышение бюджета SQL-запросов view: False — предупреждение в лог,
+# True — исключение QueryBudgetExceeded. manage.py test всегда работает
+# в строгом режиме.
+QUERY_BUDGET_STRICT = False
+TEST_RUNNER = 'core.test_runner.StrictQueryBudgetRunner'
+
+# Доля запросов, которые профилирует core.profiling.ProfilingMiddleware:
+# 0 — профилирование выключено, 1 — каждый запрос.
+PROFILING_SAMPLE_RATE = 0
+
+# Лимиты записей для view с декоратором core.throttle.throttle:
+# 'число/период' (s, m, h, d) на пользователя и на IP, например
+# {'post_create': '5/m', 'add_comment': '20/m'}. Пустой словарь — без
+# лимитов. При ADMISSION_DB_LATENCY_MS > 0 и среднем времени SQL-запроса
+# выше порога эти view отвечают 503 с Retry-After ADMISSION_RETRY_AFTER.
+THROTTLE_RATES = {}
+ADMISSION_DB_LATENCY_MS = 0
+ADMISSION_RETRY_AFTER = 5
+
+# Сколько секунд обратный прокси и браузер могут хранить HTML-ленты
+# анонимных пользователей (Cache-Control: public, max-age).
+FEED_CACHE_MAX_AGE = 60
+
+# Кэш целых страниц лент для анонимных пользователей, секунды; 0 —
+# выключен. Ещё ANON_PAGE_CACHE_STALE секунд после истечения устаревшая
+# копия отдаётся, пока один запрос строит новую. Если копии нет вовсе,
+# остальные запросы до ANON_PAGE_CACHE_WAIT секунд ждут её в кэше, а потом
+# строят страницу сами.
+ANON_PAGE_CACHE_TIMEOUT = 30
+ANON_PAGE_CACHE_STALE = 60
+ANON_PAGE_CACHE_WAIT = 2
+
+# Независимые запросы profile и post_detail выполнять одновременно
+# в пуле из PARALLEL_QUERY_WORKERS потоков (см. core.parallel). Имеет
+# смысл только для серверной СУБД.
+PARALLEL_QUERIES = False
+PARALLEL_QUERY_WORKERS = 8
+
+# Пагинация лент: 'pages' — по номеру страницы, 'cursor' — по ключу
+# (pub_date, id) без OFFSET и COUNT(*).
+POSTS_PAGINATION = 'pages'
+
+# Лента подписок: сколько постов хранить в материализованной ленте
+# и начиная с какого числа подписчиков посты автора не раскладываются
+# по лентам при записи, а добираются при чтении. Ленты подписчиков
+# обрезаются пачками по TIMELINE_TRIM_BATCH пользователей.
+TIMELINE_LENGTH = 800
+TIMELINE_FANOUT_LIMIT = 1000
+TIMELINE_TRIM_BATCH = 100
+
+# default — локальный LRU процесса перед общим кэшем 'shared'. Фрагменты
+# лент живут долго и сбрасываются сменой версии, поэтому 'shared' обязан
+# быть общим для всех воркеров: по умолчанию это файлы в CACHE_DIR на
+# одной машине, для нескольких машин — memcached или Redis (у файлового
+# кэша incr не атомарен).
+CACHE_DIR = os.path.join(BASE_DIR, 'cache')
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-    }
+        'BACKEND': 'core.cache.TwoTierCache',
+        'OPTIONS': {
+            'SHARED': 'shared',
+            'MAX_ENTRIES': 1000,
+            'CHECK_INTERVAL': 1,
+        },
+    },
+    'shared': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': CACHE_DIR,
+    },
 }
+
+# Отложенная запись комментариев (posts.comment_queue): фоновый поток
+# пишет их пачками до COMMENT_BATCH_SIZE штук или раз в
+# COMMENT_FLUSH_INTERVAL секунд.
+COMMENT_WRITE_BEHIND = False
+COMMENT_BATCH_SIZE = 200
+COMMENT_FLUSH_INTERVAL = 0.2
+
+# Сессии читаются из кэша и пишутся сквозь него в базу; пользователь
+# запроса USER_CACHE_TIMEOUT секунд берётся из кэша (0 — из базы каждый
+# раз), см. core.auth.
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+USER_CACHE_TIMEOUT = 300
+
+# Хранилище ключей sorl-thumbnail: БД с кэшем 'default' перед ней.
+THUMBNAIL_KVSTORE = 'sorl.thumbnail.kvstores.cached_db_kvstore.KVStore'
+THUMBNAIL_CACHE = 'default'
+
+# Миниатюры для ленты строятся сразу при сохранении поста. При
+# THUMBNAIL_ASYNC = True — в фоне пулом из THUMBNAIL_WORKERS потоков после
+# коммита, а до готовности в ленте показывается заглушка.
+THUMBNAIL_ASYNC = False
+THUMBNAIL_WORKERS = 2
+
+# Загрузка картинок: больше IMAGE_MAX_PIXELS пикселей форма не примет,
+# мастер-копия уменьшается до IMAGE_MAX_SIZE по большей стороне. При
+# IMAGE_KEEP_ORIGINAL = False оригинал удаляется и заменяется мастер-копией.
+IMAGE_MAX_PIXELS = 40_000_000
+IMAGE_MAX_SIZE = 1920
+IMAGE_KEEP_ORIGINAL = True